@@ -0,0 +1,149 @@
+"""
+Erzeugt synthetische Lernsammlungen für Benchmarks.
+
+Aufruf:  python -m benchmarks.generate --subjects 5 --sets 10 --tasks 200 -o gross.json
+"""
+import argparse
+import json
+import os
+import random
+import time
+import uuid
+
+DAY = 86400
+QUALITIES = ['bad', 'ok', 'good', 'perfect']
+STATUSES = ['new', 'bad', 'ok', 'good', 'mastered', 'perfect']
+WORDS = ("Ableitung Integral Matrix Vektor Funktion Grenzwert Reihe Menge Abbildung Beweis "
+         "Gleichung Lösung Term Basis Kern Bild Norm Raum Wert Punkt").split()
+FORMULAS = [r"x^2 + y^2 = r^2", r"\frac{a}{b}", r"\int_0^1 f(x)\,dx", r"\sum_{i=1}^{n} i", r"\sqrt{2}",
+            r"e^{i\pi} + 1 = 0", r"\alpha \le \beta", r"\lim_{n \to \infty} a_n", r"A^{-1}", r"\nabla f"]
+
+
+def _sentence(rng, words, latex_density):
+    """Ein Satz aus Wörtern, in dem mit Wahrscheinlichkeit latex_density Formeln stehen."""
+    parts = []
+    for _ in range(words):
+        if rng.random() < latex_density:
+            parts.append(f"${rng.choice(FORMULAS)}$")
+        else:
+            parts.append(rng.choice(WORDS))
+    return " ".join(parts)
+
+
+def _text(rng, lines, latex_density):
+    return "\n".join(_sentence(rng, rng.randint(6, 14), latex_density) for _ in range(lines))
+
+
+def _history(rng, length, now):
+    """Ein zeitlich geordneter Verlauf mit wachsenden Abständen."""
+    timestamp = now - length * 3 * DAY
+    history = []
+    for _ in range(length):
+        timestamp += rng.uniform(0.5, 5) * DAY
+        history.append({"timestamp": min(timestamp, now), "quality": rng.choice(QUALITIES)})
+    return history
+
+
+def generate_images(directory, count, size=(1600, 1200), seed=0):
+    """Legt 'count' PNG-Bilder an (vorhandene werden wiederverwendet) und gibt ihre Pfade zurück."""
+    from PIL import Image
+    os.makedirs(directory, exist_ok=True)
+    rng = random.Random(seed)
+    paths = []
+    for i in range(count):
+        path = os.path.join(directory, f"bench_{i}.png")
+        if not os.path.exists(path):
+            # Rauschen statt Einfarbigkeit, damit Dekodieren realistisch viel kostet
+            noise = Image.effect_noise(size, rng.uniform(20, 80))
+            img = Image.merge("RGB", (noise, noise.rotate(90, expand=False), noise.transpose(Image.Transpose.FLIP_LEFT_RIGHT)))
+            img.save(path)
+        paths.append(path)
+    return paths
+
+
+def generate_collection(subjects=3, sets=5, tasks=100, subtasks=2, latex_density=0.1,
+                        image_paths=(), images_per_task=0, history=10, legacy_format=False, seed=0, now=None):
+    """
+    Erzeugt eine Sammlung im Format von lernkarten.json.
+    legacy_format=True erzeugt das alte Format mit Einzelbildern (für die Migration).
+    """
+    rng = random.Random(seed)
+    now = time.time() if now is None else now
+    image_paths = list(image_paths)
+    data = {"settings": {"theme": "light"}}
+    if not legacy_format:
+        data["settings"]["data_version"] = 2
+
+    for s in range(subjects):
+        subject_sets = {}
+        for t in range(sets):
+            task_list = []
+            for k in range(tasks):
+                images = [rng.choice(image_paths) for _ in range(images_per_task)] if image_paths else []
+                history_length = rng.randint(0, 2 * history) if history else 0
+                status = rng.choice(STATUSES) if history_length else 'new'
+                task = {
+                    "id": str(uuid.UUID(int=rng.getrandbits(128))),
+                    "name": f"Aufgabe {k + 1}",
+                    "beschreibung": _text(rng, rng.randint(1, 4), latex_density),
+                    "tags": rng.sample(WORDS, rng.randint(0, 3)),
+                    "unteraufgaben": [],
+                    "history": _history(rng, history_length, now),
+                    "sm_data": {"status": status, "consecutive_good": 0,
+                                "next_review_at": now + rng.uniform(-10, 30) * DAY},
+                }
+                for _ in range(subtasks):
+                    subtask = {"frage": _sentence(rng, rng.randint(5, 12), latex_density),
+                               "loesung": _text(rng, rng.randint(1, 6), latex_density)}
+                    solution_images = [rng.choice(image_paths)] if image_paths and rng.random() < 0.3 else []
+                    if legacy_format:
+                        subtask["bild_loesung"] = solution_images[0] if solution_images else ""
+                    else:
+                        subtask["bilder_loesung"] = solution_images
+                    task["unteraufgaben"].append(subtask)
+                if legacy_format:
+                    task["bild_aufgabe"] = images[0] if images else ""
+                else:
+                    task["bilder_aufgabe"] = images
+                task_list.append(task)
+            subject_sets[str(uuid.UUID(int=rng.getrandbits(128)))] = {
+                "name": f"Set {t + 1}", "color": "#E0E0E0", "tasks": task_list}
+        data[str(uuid.UUID(int=rng.getrandbits(128)))] = {"name": f"Fach {s + 1}", "color": "#E0E0E0", "sets": subject_sets}
+    return data
+
+
+def add_arguments(parser):
+    """Gemeinsame Parameter für Generator und Benchmark-Lauf."""
+    parser.add_argument("--subjects", type=int, default=3, help="Anzahl der Fächer")
+    parser.add_argument("--sets", type=int, default=5, help="Lernsets pro Fach")
+    parser.add_argument("--tasks", type=int, default=100, help="Aufgaben pro Set")
+    parser.add_argument("--subtasks", type=int, default=2, help="Teilaufgaben pro Aufgabe")
+    parser.add_argument("--latex-density", type=float, default=0.1, help="Anteil der Wörter, die Formeln sind (0-1)")
+    parser.add_argument("--images", type=int, default=0, help="Anzahl verschiedener Bilder")
+    parser.add_argument("--images-per-task", type=int, default=1, help="Aufgabenbilder pro Aufgabe (wenn --images > 0)")
+    parser.add_argument("--history", type=int, default=10, help="Mittlere Länge des Verlaufs pro Karte")
+    parser.add_argument("--seed", type=int, default=0, help="Startwert des Zufallsgenerators")
+
+
+def collection_from_args(args, image_dir=None, legacy_format=False):
+    image_paths = generate_images(image_dir, args.images, seed=args.seed) if args.images and image_dir else []
+    return generate_collection(args.subjects, args.sets, args.tasks, args.subtasks, args.latex_density,
+                               image_paths, args.images_per_task, args.history, legacy_format, args.seed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Erzeugt eine synthetische Lernsammlung.")
+    add_arguments(parser)
+    parser.add_argument("--image-dir", default="bench_images", help="Ordner für die erzeugten Bilder")
+    parser.add_argument("--legacy", action="store_true", help="Altes Datenformat (vor v2) erzeugen")
+    parser.add_argument("-o", "--output", required=True, help="Zieldatei")
+    args = parser.parse_args()
+
+    data = collection_from_args(args, args.image_dir, args.legacy)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=4, ensure_ascii=False)
+    print(f"{args.subjects * args.sets * args.tasks} Aufgaben nach {args.output} geschrieben.")
+
+
+if __name__ == "__main__":
+    main()
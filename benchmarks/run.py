@@ -0,0 +1,171 @@
+"""
+Benchmark-Suite der Lern-Anwendung. Läuft ohne Display (kein tkinter).
+
+Aufruf:  python -m benchmarks.run [--tasks 500] [--repeat 5] [-o ergebnis.json] [--compare alt.json]
+
+Jeder Benchmark wird 'repeat'-mal ausgeführt; gespeichert werden Minimum,
+Median und Mittelwert in Sekunden sowie die Parameter des Laufs, damit sich
+Ergebnisse verschiedener Stände vergleichen lassen.
+"""
+import argparse
+import contextlib
+import copy
+import io
+import json
+import os
+import platform
+import statistics as stats
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks import generate
+
+# Vorschaugröße der Bilder in der Kartenansicht (ui.card_view.IMAGE_THUMBNAIL_SIZE)
+THUMBNAIL_SIZE = (450, 450)
+
+
+def _timeit(func, repeat, setup=None):
+    """
+    Misst func() 'repeat'-mal; setup() wird vor jeder Messung ungemessen ausgeführt
+    und sein Ergebnis an func übergeben. Ein erster, ungemessener Lauf fängt
+    einmalige Kosten (verzögerte Importe, Caches) ab.
+    """
+    func(setup()) if setup else func()
+    timings = []
+    for _ in range(repeat):
+        arg = setup() if setup else None
+        start = time.perf_counter()
+        func(arg) if setup else func()
+        timings.append(time.perf_counter() - start)
+    return {"min": min(timings), "median": stats.median(timings), "mean": stats.fmean(timings), "runs": len(timings)}
+
+
+def _all_tasks(data):
+    return [task for sid, sdata in data.items() if sid != "settings"
+            for set_data in sdata["sets"].values() for task in set_data["tasks"]]
+
+
+def _first_set(data):
+    subject_id = next(sid for sid in data if sid != "settings")
+    set_id = next(iter(data[subject_id]["sets"]))
+    return subject_id, set_id
+
+
+def run_benchmarks(args, workdir):
+    from lernapp.core.store import DataManager
+    from lernapp.core.migrations import migrate_data
+    from lernapp.core import queue_builder, statistics, layout, render_farm
+    from lernapp.core.index import TaskLocator, TagIndex, DueQueue
+
+    image_dir = os.path.join(workdir, "images")
+    data = generate.collection_from_args(args, image_dir)
+    legacy_data = generate.collection_from_args(args, image_dir, legacy_format=True)
+    tasks = _all_tasks(data)
+    subject_id, set_id = _first_set(data)
+    set_tasks = data[subject_id]["sets"][set_id]["tasks"]
+    repeat = args.repeat
+    results = {}
+
+    def bench(name, func, setup=None, repeat=repeat):
+        results[name] = _timeit(func, repeat, setup)
+        print(f"  {name:<36} {results[name]['median'] * 1000:10.2f} ms")
+
+    # --- Laden und Speichern ---
+    data_manager = DataManager(os.path.join(workdir, "bench.json"))
+    bench("data_manager.save_data", lambda: data_manager.save_data(data))
+    results["data_file_bytes"] = os.path.getsize(data_manager.filename)
+    bench("data_manager.load_data", data_manager.load_data)
+
+    def migrate(legacy):
+        with contextlib.redirect_stdout(io.StringIO()): # Unterdrückt die Fortschrittsmeldung
+            migrate_data(legacy)
+    bench("migrate_data", migrate, setup=lambda: copy.deepcopy(legacy_data))
+
+    # --- Warteschlangen und Indizes ---
+    def without_index(key):
+        # Die Indizes werden in den Settings gespeichert und sonst nur wiederverwendet
+        data["settings"].pop(key, None)
+        return data
+    bench("build_spaced_repetition_queue", lambda: queue_builder.build_spaced_repetition_queue(tasks, 50))
+    bench("tag_index.build", lambda d: TagIndex(d, TaskLocator(d)), setup=lambda: without_index("tag_index"))
+    bench("due_queue.build", lambda d: DueQueue(d, TaskLocator(d)), setup=lambda: without_index("due_queue"))
+    due_queue = DueQueue(data, TaskLocator(data))
+    bench("due_queue.count_due", due_queue.count_due)
+
+    # --- Statistik ---
+    bench("statistics.status_counts", lambda: statistics.status_counts(set_tasks))
+    bench("statistics.quality_history", lambda: statistics.quality_history(set_tasks))
+    bench("statistics.workload_forecast", lambda: statistics.workload_forecast(data, subject_id, set_id, 90))
+
+    # --- Kartenanzeige ---
+    bench("layout.build_task_layout", lambda: [layout.build_task_layout(t) for t in
+                                               (dict(t, layout={}) for t in set_tasks)])
+    formulas = sorted(render_farm.collect_formulas(data))[:args.formulas]
+    if formulas:
+        bench(f"render_latex ({len(formulas)} Formeln)", lambda: [render_farm.render_png(f) for f in formulas], repeat=1)
+
+    image_paths = sorted({p for t in tasks for p in t.get("bilder_aufgabe", [])})[:args.thumbnails]
+    if image_paths:
+        from PIL import Image
+
+        def thumbnails():
+            for path in image_paths:
+                img = Image.open(path)
+                img.thumbnail(THUMBNAIL_SIZE, Image.Resampling.LANCZOS)
+        bench(f"image_thumbnails ({len(image_paths)} Bilder)", thumbnails)
+
+    return results
+
+
+def _git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline):
+    """Gibt das Verhältnis der Mediane zu einem früheren Lauf aus."""
+    print(f"\nVergleich mit {baseline.get('revision') or 'früherem Lauf'} (Median, neu/alt):")
+    for name, result in results["results"].items():
+        old = baseline.get("results", {}).get(name)
+        if isinstance(result, dict) and isinstance(old, dict) and old.get("median"):
+            print(f"  {name:<36} {result['median'] / old['median']:8.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks der Lern-Anwendung mit synthetischen Daten.")
+    generate.add_arguments(parser)
+    parser.set_defaults(images=5)
+    parser.add_argument("--repeat", type=int, default=5, help="Wiederholungen pro Benchmark")
+    parser.add_argument("--formulas", type=int, default=10, help="Anzahl der gerenderten Formeln")
+    parser.add_argument("--thumbnails", type=int, default=5, help="Anzahl der verkleinerten Bilder")
+    parser.add_argument("-o", "--output", default=None, help="Ergebnisse als JSON speichern")
+    parser.add_argument("--compare", default=None, help="Früheres Ergebnis (JSON) zum Vergleich")
+    args = parser.parse_args()
+
+    print(f"{args.subjects * args.sets * args.tasks} Aufgaben, {args.repeat} Wiederholungen")
+    with tempfile.TemporaryDirectory() as workdir:
+        results = {
+            "revision": _git_revision(),
+            "timestamp": time.time(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "parameters": {k: v for k, v in vars(args).items() if k not in ("output", "compare")},
+            "results": run_benchmarks(args, workdir),
+        }
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=4, ensure_ascii=False)
+        print(f"\nErgebnisse nach {args.output} geschrieben.")
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            compare(results, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,20 @@
 # --- Konstanten ---
 DATA_FILE = 'lernkarten.json'
 IMAGE_DIR = 'images'
+RENDER_CACHE_DIR = 'render_cache'
+SESSION_FILE = 'sitzung.json'
+ANSWER_LOG_FILE = 'antworten.log'
+TRACE_FILE = 'trace.json'
+PROFILE_DIR = 'profile'
+PROFILE_SESSION_SUFFIX = '.sitzung.json'
+PROFILE_LOG_SUFFIX = '.antworten.log'
+PROFILE_SYNC_SUFFIX = '.sync.json'
+SYNC_STATE_FILE = 'sync_status.json'
+SYNC_SERVER_FILE = 'sync_server.json'
+BACKUP_DIR = 'backups' # Ordner der Sicherungen, jeweils neben der gesicherten Datei
+SNAPSHOT_COUNT = 10 # So viele Sicherungen je Datei bleiben erhalten
+SNAPSHOT_INTERVAL = 600 # Sekunden zwischen zwei Sicherungen
+EXTERNAL_CHANGE_POLL_MS = 2000 # Prüfintervall auf Änderungen anderer Instanzen
 DEFAULT_COLOR = "#E0E0E0"
 PASTEL_COLORS = {
     "Rose": "#FFADAD", "Orange": "#FFD6A5", "Gelb": "#FDFFB6",
@@ -0,0 +1,2 @@
+# Paket der Lern-Anwendung.
+# Die Oberfläche liegt im 'ui'-Ordner, die headless nutzbare Logik in 'lernapp.core'.
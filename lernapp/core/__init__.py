@@ -0,0 +1,9 @@
+# Headless-Kern der Lern-Anwendung: Datenhaltung, Scheduler, Warteschlangen und Statistik.
+# Kommt ohne tkinter, tkinterdnd2 und matplotlib aus; NumPy wird nur bei Bedarf geladen
+# (batch_scheduler, optimizer).
+from .store import DataManager, Store
+from .migrations import migrate_data, pending_steps
+from .index import TaskLocator, TagIndex, DueQueue
+from .scheduler import get_scheduler, scheduler_for_set, SCHEDULERS, DEFAULT_SCHEDULER
+from .queue_builder import build_spaced_repetition_queue, collect_session_tasks, due_tasks
+from . import statistics
@@ -0,0 +1,200 @@
+"""
+Append-only-Protokoll der Antworten einer Lernsitzung.
+
+Jede Antwort wird als kurze JSON-Zeile angehängt und sofort an das
+Betriebssystem übergeben; fsync erfolgt gebündelt höchstens alle paar
+Sekunden. Stürzt die Anwendung ab, bevor die Sammlung gespeichert wurde,
+werden die protokollierten Antworten beim nächsten Start nachgespielt.
+
+Jede Instanz schreibt in ihre eigene Datei <protokoll>.<instanz> und hält
+darauf eine Sperre (flock), solange sie läuft; ihr Speichern leert nur diese
+Datei. Beim Start werden die Protokolle beendeter Instanzen (Sperre frei)
+nachgespielt und nach dem nächsten Speichern gelöscht. Ohne fcntl (Windows)
+gelten alle fremden Protokolle als verwaist.
+"""
+import glob
+import json
+import os
+import threading
+import uuid
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+import constants
+
+FSYNC_INTERVAL = 2.0
+
+
+def new_instance_id():
+    """Kennung einer laufenden Instanz der Anwendung (für Protokoll und Sitzung)."""
+    return f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+
+def _try_lock(f):
+    """Sperrt eine fremde Protokolldatei, wenn ihre Instanz nicht mehr läuft."""
+    if fcntl is None:
+        return True
+    try:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return True
+    except BlockingIOError:
+        return False
+
+
+class AnswerLog:
+    def __init__(self, filename=constants.ANSWER_LOG_FILE, fsync_interval=FSYNC_INTERVAL, instance_id=None):
+        self.base_filename = filename
+        self.filename = f"{filename}.{instance_id or new_instance_id()}"
+        self.fsync_interval = fsync_interval
+        self._file = None
+        self._timer = None
+        self._lock = threading.Lock()
+        self._adopted = [] # Verwaiste Protokolle anderer Instanzen, gesperrt bis zum Löschen
+
+    def _open(self):
+        while self._file is None:
+            f = open(self.filename, 'a', encoding='utf-8')
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+                # Hat eine startende Instanz die Datei vor dem Sperren als verwaist gelöscht: neu anlegen
+                try:
+                    if os.stat(self.filename).st_ino != os.fstat(f.fileno()).st_ino:
+                        f.close()
+                        continue
+                except FileNotFoundError:
+                    f.close()
+                    continue
+            self._file = f
+        return self._file
+
+    def _leftover_filenames(self):
+        """Das Protokoll älterer Versionen (ohne Instanz) und die anderer Instanzen."""
+        candidates = glob.glob(glob.escape(self.base_filename)) + glob.glob(glob.escape(self.base_filename) + ".*")
+        adopted = {f.name for f in self._adopted}
+        return [path for path in candidates
+                if path != self.filename and path not in adopted and not path.endswith(".tmp")]
+
+    def append(self, subject_id, set_id, task_id, quality, timestamp, scheduled):
+        """Hängt eine Antwort an. scheduled gibt an, ob der Scheduler die Karte aktualisiert hat."""
+        entry = {"s": subject_id, "set": set_id, "id": task_id, "q": quality, "ts": timestamp, "sr": scheduled}
+        with self._lock:
+            f = self._open()
+            f.write(json.dumps(entry, ensure_ascii=False, separators=(',', ':')) + "\n")
+            f.flush()
+            if self._timer is None:
+                # Bündelt fsync für alle Antworten der nächsten Sekunden
+                self._timer = threading.Timer(self.fsync_interval, self.sync)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def sync(self):
+        """Schreibt alle angehängten Antworten dauerhaft auf die Platte."""
+        with self._lock:
+            self._timer = None
+            if self._file is not None:
+                os.fsync(self._file.fileno())
+
+    def clear(self):
+        """
+        Leert das eigene Protokoll, nachdem die Sammlung vollständig gespeichert wurde,
+        und löscht die übernommenen Protokolle beendeter Instanzen.
+        """
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if self._file is not None:
+                self._file.truncate(0)
+            self._release_adopted()
+
+    def _release_adopted(self):
+        for f in self._adopted:
+            try:
+                os.remove(f.name)
+            except OSError:
+                pass
+            f.close()
+        self._adopted = []
+
+    def close(self):
+        """Schließt das Protokoll; ein leeres wird gelöscht, ein volles beim nächsten Start nachgespielt."""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if self._file is not None:
+                self._file.flush()
+                os.fsync(self._file.fileno())
+                empty = os.fstat(self._file.fileno()).st_size == 0
+                self._file.close()
+                self._file = None
+                if empty:
+                    try:
+                        os.remove(self.filename)
+                    except FileNotFoundError:
+                        pass
+            for f in self._adopted:
+                f.close()
+            self._adopted = []
+
+    @staticmethod
+    def _read_entries(filename):
+        try:
+            with open(filename, 'r', encoding='utf-8') as f:
+                lines = f.readlines()
+        except FileNotFoundError:
+            return []
+        entries = []
+        for line in lines:
+            try:
+                entries.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue # abgeschnittene letzte Zeile
+        return entries
+
+    def entries(self):
+        """Liest alle vollständigen Einträge des eigenen Protokolls; eine abgeschnittene letzte Zeile wird ignoriert."""
+        return self._read_entries(self.filename)
+
+    def adopt_leftovers(self):
+        """
+        Übernimmt die Protokolle beendeter Instanzen: Sie bleiben gesperrt, bis clear
+        sie nach dem Speichern löscht. Gibt ihre Einträge zurück.
+        """
+        entries = []
+        for path in self._leftover_filenames():
+            try:
+                f = open(path, 'r', encoding='utf-8')
+            except FileNotFoundError:
+                continue
+            if not _try_lock(f):
+                f.close() # Die Instanz läuft noch
+                continue
+            self._adopted.append(f)
+            entries.extend(self._read_entries(path))
+        return entries
+
+    def replay(self, store):
+        """
+        Spielt protokollierte Antworten (eigene und die beendeter Instanzen) in die
+        Sammlung ein. Antworten, deren Zeitstempel schon im Verlauf der Karte steht,
+        wurden bereits gespeichert und werden übersprungen. Gibt die Anzahl der
+        nachgespielten Antworten zurück; ist sie 0, werden übernommene Protokolle sofort gelöscht.
+        """
+        replayed = 0
+        entries = self.entries() + self.adopt_leftovers()
+        for entry in sorted(entries, key=lambda e: e.get("ts", 0)):
+            task = store.locator.get(entry.get("s"), entry.get("set"), entry.get("id"))
+            if task is None:
+                continue
+            if any(h.get("timestamp") == entry["ts"] for h in task.get("history", [])):
+                continue
+            store.apply_answer(entry["s"], entry["set"], task, entry["q"], entry["ts"], entry.get("sr", False))
+            replayed += 1
+        if not replayed:
+            with self._lock:
+                self._release_adopted()
+        return replayed
@@ -0,0 +1,184 @@
+import time
+
+import numpy as np
+
+import constants
+from . import scheduler
+
+DAY = scheduler.DAY
+STATUS_CODES = ['new', 'bad', 'ok', 'good', 'mastered', 'perfect']
+_STATUS_INDEX = {status: i for i, status in enumerate(STATUS_CODES)}
+# Lernstatus nach einer "guten" Antwort im klassischen Algorithmus
+_CLASSIC_NEXT_ON_GOOD = np.array([_STATUS_INDEX[s] for s in ['good', 'good', 'good', 'mastered', 'good', 'good']])
+
+
+class CardArrays:
+    """Die Lerndaten einer Liste von Karten als NumPy-Arrays (eine Zeile pro Karte)."""
+    def __init__(self, tasks):
+        self.tasks = tasks
+        n = len(tasks)
+        self.status = np.zeros(n, dtype=np.int8)
+        self.last_review = np.full(n, np.nan)
+        self.next_review = np.zeros(n)
+        self.interval = np.full(n, np.nan)
+        self.ease = np.full(n, np.nan)
+        self.reps = np.zeros(n, dtype=np.int32)
+        self.stability = np.full(n, np.nan)
+        self.difficulty = np.full(n, np.nan)
+
+        for i, task in enumerate(tasks):
+            sm_data = task.get('sm_data') or {}
+            history = task.get('history') or []
+            self.status[i] = _STATUS_INDEX.get(sm_data.get('status', 'new'), 0)
+            last = sm_data.get('last_review_at', history[-1].get('timestamp') if history else None)
+            if last is not None: self.last_review[i] = last
+            self.next_review[i] = sm_data.get('next_review_at', 0)
+            if 'interval' in sm_data: self.interval[i] = sm_data['interval']
+            if 'ease' in sm_data: self.ease[i] = sm_data['ease']
+            self.reps[i] = sm_data.get('reps', 0)
+            if 'stability' in sm_data: self.stability[i] = sm_data['stability']
+            if 'difficulty' in sm_data: self.difficulty[i] = sm_data['difficulty']
+
+    def __len__(self):
+        return len(self.tasks)
+
+
+def _classic_intervals(params):
+    intervals = (params or {}).get('intervals', constants.STATUS_INTERVALS)
+    return np.array([intervals.get(status, 30) for status in STATUS_CODES], dtype=float)
+
+
+def _fsrs_interval(stability, fsrs):
+    interval = np.rint(9 * stability * (1 / fsrs.retention - 1))
+    return np.clip(interval, 1, fsrs.maximum_interval)
+
+
+def _current_intervals(cards, name, params):
+    """Berechnet die Intervalle (in Tagen) aller Karten mit dem angegebenen Scheduler."""
+    classic = _classic_intervals(params)[cards.status]
+    if name == 'sm2':
+        intervals = np.where(np.isnan(cards.interval), classic, cards.interval)
+    elif name == 'fsrs':
+        fsrs = scheduler.FSRSScheduler(params)
+        # Karten ohne FSRS-Daten erhalten eine Stabilität passend zu ihrem bisherigen Intervall
+        seed = np.maximum(np.where(np.isnan(cards.interval), classic, cards.interval), fsrs.w[2])
+        cards.stability = np.where(np.isnan(cards.stability), seed, cards.stability)
+        cards.difficulty = np.where(np.isnan(cards.difficulty), fsrs._initial_difficulty(3), cards.difficulty)
+        intervals = _fsrs_interval(cards.stability, fsrs)
+    else:
+        intervals = classic
+    # Schlecht bewertete Karten bleiben sofort fällig
+    return np.where(cards.status == _STATUS_INDEX['bad'], 0.0, intervals)
+
+
+def reschedule(tasks, name=None, params=None, now=None):
+    """
+    Berechnet 'next_review_at' für alle Karten in einem vektorisierten Durchlauf neu,
+    z.B. nach einer Änderung der Scheduler-Parameter. Karten ohne bisherige
+    Wiederholung werden sofort fällig. Gibt die Anzahl der Karten zurück.
+    """
+    if not tasks:
+        return 0
+    now = time.time() if now is None else now
+    cards = CardArrays(tasks)
+    intervals = _current_intervals(cards, name or scheduler.DEFAULT_SCHEDULER, params)
+    reviewed = ~np.isnan(cards.last_review) & (cards.status != _STATUS_INDEX['new'])
+    intervals = np.where(reviewed, intervals, 0.0)
+    due = np.where(reviewed, np.nan_to_num(cards.last_review) + intervals * DAY, now)
+
+    # Nur das Zurückschreiben in die Dictionaries erfolgt noch pro Karte
+    write_fsrs = name == 'fsrs'
+    for i, (task, due_at, interval) in enumerate(zip(tasks, due.tolist(), intervals.tolist())):
+        sm_data = task.setdefault('sm_data', {})
+        sm_data['next_review_at'] = due_at
+        sm_data['interval'] = interval
+        if write_fsrs and reviewed[i]:
+            sm_data['stability'] = round(float(cards.stability[i]), 4)
+            sm_data['difficulty'] = round(float(cards.difficulty[i]), 4)
+    return len(tasks)
+
+
+def forecast(tasks, name=None, params=None, days=30, now=None):
+    """
+    Schätzt die Anzahl der Wiederholungen pro Tag für die nächsten 'days' Tage.
+    Überfällige Karten zählen für heute. Es wird angenommen, dass jede Wiederholung
+    mit "Gut" beantwortet wird, sodass auch Folgewiederholungen im Zeitraum erscheinen.
+    Über 'name'/'params' lassen sich andere Scheduler-Einstellungen durchspielen.
+    """
+    histogram = np.zeros(days, dtype=np.int64)
+    if not tasks:
+        return histogram
+    now = time.time() if now is None else now
+    name = name or scheduler.DEFAULT_SCHEDULER
+    cards = CardArrays(tasks)
+    # Karten ohne FSRS-Daten erhalten wie im Scheduler bei der ersten Wiederholung die Anfangswerte
+    fresh = np.isnan(cards.stability)
+
+    intervals = np.maximum(_current_intervals(cards, name, params), 1.0)
+    due_day = np.maximum(np.floor((cards.next_review - now) / DAY), 0.0)
+    last_day = np.where(np.isnan(cards.last_review), due_day, (cards.last_review - now) / DAY)
+    status, reps = cards.status.copy(), cards.reps.copy()
+    ease = np.where(np.isnan(cards.ease), 2.5, cards.ease)
+    classic = _classic_intervals(params)
+    fsrs = scheduler.FSRSScheduler(params) if name == 'fsrs' else None
+
+    active = due_day < days
+    while active.any():
+        histogram += np.bincount(due_day[active].astype(np.int64), minlength=days)[:days]
+
+        # Simuliert eine "gute" Antwort für alle Karten, die im Zeitraum fällig waren
+        if name == 'sm2':
+            reps = np.where(active, reps + 1, reps)
+            nxt = np.where(reps == 1, 1.0, np.where(reps == 2, 6.0, np.rint(intervals * ease)))
+        elif fsrs is not None:
+            w = fsrs.w
+            # Erinnerungsrate nach der tatsächlich vergangenen Zeit (Überfällige wachsen stärker)
+            r = fsrs.retrievability(np.maximum(due_day - last_day, 0.0), cards.stability)
+            growth = np.exp(w[8]) * (11 - cards.difficulty) * cards.stability ** -w[9] * (np.exp(w[10] * (1 - r)) - 1)
+            stability = np.where(fresh, w[2], cards.stability * (1 + growth))
+            difficulty = np.where(fresh, fsrs._initial_difficulty(3),
+                                  w[7] * fsrs._initial_difficulty(3) + (1 - w[7]) * cards.difficulty)
+            cards.stability = np.where(active, stability, cards.stability)
+            cards.difficulty = np.where(active, difficulty, cards.difficulty)
+            fresh &= ~active
+            nxt = _fsrs_interval(cards.stability, fsrs)
+        else:
+            status = np.where(active, _CLASSIC_NEXT_ON_GOOD[status], status)
+            nxt = classic[status]
+
+        intervals = np.where(active, np.maximum(nxt, 1.0), intervals)
+        last_day = np.where(active, due_day, last_day)
+        due_day = np.where(active, due_day + intervals, due_day)
+        active = due_day < days
+    return histogram
+
+
+def _iter_sets(data, subject_id=None, set_id=None):
+    for sid, subject_data in data.items():
+        if sid == "settings" or not isinstance(subject_data, dict): continue
+        if subject_id is not None and sid != subject_id: continue
+        for set_key, set_data in subject_data.get("sets", {}).items():
+            if set_id is not None and set_key != set_id: continue
+            yield sid, set_key, set_data
+
+
+def reschedule_collection(data, subject_id=None, set_id=None, now=None):
+    """Berechnet die Fälligkeiten eines Sets, eines Fachs oder der ganzen Sammlung neu."""
+    settings = data.get("settings", {})
+    count = 0
+    for sid, _, set_data in _iter_sets(data, subject_id, set_id):
+        name = set_data.get('scheduler', scheduler.DEFAULT_SCHEDULER)
+        params = scheduler.params_for(settings, name, sid)
+        count += reschedule(set_data.get("tasks", []), name, params, now)
+    return count
+
+
+def forecast_collection(data, days=30, subject_id=None, set_id=None, now=None):
+    """Addiert die Prognosen aller betroffenen Sets (jeweils mit ihrem Scheduler)."""
+    settings = data.get("settings", {})
+    total = np.zeros(days, dtype=np.int64)
+    for sid, _, set_data in _iter_sets(data, subject_id, set_id):
+        name = set_data.get('scheduler', scheduler.DEFAULT_SCHEDULER)
+        params = scheduler.params_for(settings, name, sid)
+        total += forecast(set_data.get("tasks", []), name, params, days, now)
+    return total
@@ -0,0 +1,352 @@
+"""
+Portable Bundles: Fächer oder Lernsets mit ihren Bildern als eine ZIP-Datei.
+
+Aufbau eines Bundles:
+  manifest.json                     Fächer und Sets (Name, Farbe, Scheduler, Kartenzahl)
+  sets/<fach-id>/<set-id>.jsonl     eine Aufgabe pro Zeile
+  images/<sha1>.<endung>            jedes referenzierte Bild genau einmal
+
+Export und Import arbeiten streamend: Aufgaben werden einzeln geschrieben
+bzw. gelesen und Bilder blockweise kopiert, der Speicherbedarf hängt also
+nicht von der Größe der Sammlung ab.
+
+Aufruf:  python -m lernapp.core.bundle export mathe.zip --subject "Mathe" [--set "Analysis"] [--without-progress]
+         python -m lernapp.core.bundle import mathe.zip
+"""
+import argparse
+import copy
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+import uuid
+import zipfile
+
+import constants
+from . import layout
+
+BUNDLE_FORMAT = "lernapp-bundle"
+BUNDLE_VERSION = 1
+MANIFEST = "manifest.json"
+CHUNK_SIZE = 1024 * 1024
+BATCH_SIZE = 500
+
+# Bilder sind bereits komprimiert; nur die Aufgaben werden komprimiert gespeichert
+STORED_EXTENSIONS = {".png", ".jpg", ".jpeg", ".gif", ".webp"}
+
+
+def _file_hash(path):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _task_image_fields(task):
+    """Alle Bildlisten einer Aufgabe (Aufgabe und Teilaufgaben), zum Lesen und Ersetzen."""
+    yield task, "bilder_aufgabe"
+    for subtask in task.get("unteraufgaben", []):
+        yield subtask, "bilder_loesung"
+
+
+def _strip_progress(task):
+    task["history"] = []
+    task["sm_data"] = {}
+
+
+def _selected_sets(data, selection):
+    """selection: [(subject_id, set_id oder None für alle Sets des Fachs)]."""
+    by_subject = {}
+    for subject_id, set_id in selection:
+        sets = data[subject_id].get("sets", {})
+        chosen = by_subject.setdefault(subject_id, [])
+        for sid in ([set_id] if set_id else list(sets)):
+            if sid not in chosen:
+                chosen.append(sid)
+    return by_subject
+
+
+class _ImageWriter:
+    """Schreibt Bilder inhaltsbasiert dedupliziert in das Archiv."""
+    def __init__(self, archive):
+        self.archive = archive
+        self.by_path = {} # Originalpfad -> Name im Archiv (oder None, wenn nicht vorhanden)
+        self.written = set()
+
+    def add(self, path):
+        if path in self.by_path:
+            return self.by_path[path]
+        name = None
+        if path and os.path.isfile(path):
+            ext = os.path.splitext(path)[1].lower()
+            name = f"images/{_file_hash(path)}{ext}"
+            if name not in self.written:
+                compress = zipfile.ZIP_STORED if ext in STORED_EXTENSIONS else zipfile.ZIP_DEFLATED
+                info = zipfile.ZipInfo.from_file(path, name)
+                info.compress_type = compress
+                with open(path, 'rb') as src, self.archive.open(info, 'w') as dst:
+                    shutil.copyfileobj(src, dst, CHUNK_SIZE)
+                self.written.add(name)
+        self.by_path[path] = name
+        return name
+
+
+def count_tasks(data, selection):
+    """Anzahl der Aufgaben in den gewählten Fächern/Sets."""
+    return sum(len(data[subject_id]["sets"][set_id].get("tasks", []))
+               for subject_id, set_ids in _selected_sets(data, selection).items() for set_id in set_ids)
+
+
+def _snapshot_task(task):
+    return {key: copy.deepcopy(value) for key, value in task.items() if key != "layout"}
+
+
+def iter_selection(data, selection, batch_size=BATCH_SIZE, snapshot=False):
+    """
+    Liefert die gewählten Sets für write_bundle: je Set ("set", subject_id, fach, set_eintrag)
+    und danach ("tasks", aufgaben) in Batches. Mit snapshot sind die Aufgaben unabhängige
+    Kopien, damit ein Hintergrund-Thread sie schreiben kann, während sich die Sammlung
+    ändert; kopiert wird immer nur der gerade angeforderte Batch.
+    """
+    for subject_id, set_ids in _selected_sets(data, selection).items():
+        for set_id in set_ids:
+            subject = data.get(subject_id)
+            set_data = (subject or {}).get("sets", {}).get(set_id)
+            if set_data is None:
+                continue # Inzwischen gelöscht
+            tasks = set_data.get("tasks", [])
+            set_entry = {"id": set_id, "name": set_data.get("name"), "color": set_data.get("color"),
+                         "tasks_file": f"sets/{subject_id}/{set_id}.jsonl", "tasks": len(tasks)}
+            if "scheduler" in set_data:
+                set_entry["scheduler"] = copy.deepcopy(set_data["scheduler"])
+            yield "set", subject_id, {"name": subject.get("name"), "color": subject.get("color")}, set_entry
+            for i in range(0, len(tasks), batch_size):
+                batch = tasks[i:i + batch_size]
+                yield "tasks", [_snapshot_task(task) for task in batch] if snapshot else batch
+
+
+def write_bundle(filename, items, include_progress=True, total=0, progress=None):
+    """
+    Schreibt die Einträge von iter_selection in ein Bundle. Die Aufgaben eines Sets
+    werden in eine temporäre Datei geschrieben und erst am Ende des Sets übernommen,
+    da ZipFile nur einen offenen Schreibzugriff erlaubt und die Bilder dazwischen
+    geschrieben werden. progress(erledigt, gesamt) nach jeder Aufgabe.
+    Gibt die Anzahl der Aufgaben zurück.
+    """
+    done = 0
+    manifest = {"format": BUNDLE_FORMAT, "version": BUNDLE_VERSION, "include_progress": include_progress, "subjects": []}
+    subject_entries = {}
+
+    with zipfile.ZipFile(filename, 'w', zipfile.ZIP_DEFLATED, allowZip64=True) as archive:
+        images = _ImageWriter(archive)
+        pending = None # (Archivname, temporäre Datei) des aktuellen Sets
+
+        def finish_set():
+            if pending is None:
+                return
+            member, tasks_file = pending
+            tasks_file.seek(0)
+            with archive.open(member, 'w', force_zip64=True) as out:
+                shutil.copyfileobj(tasks_file, out, CHUNK_SIZE)
+            tasks_file.close()
+
+        for item in items:
+            if item[0] == "set":
+                finish_set()
+                _, subject_id, subject, set_entry = item
+                if subject_id not in subject_entries:
+                    subject_entries[subject_id] = {"id": subject_id, **subject, "sets": []}
+                    manifest["subjects"].append(subject_entries[subject_id])
+                subject_entries[subject_id]["sets"].append(set_entry)
+                pending = (set_entry["tasks_file"], tempfile.SpooledTemporaryFile(max_size=16 * CHUNK_SIZE))
+                continue
+            for task in item[1]:
+                # Flache Kopie; nur die Bildlisten und ggf. der Fortschritt werden ersetzt
+                exported = {k: v for k, v in task.items() if k != "layout"}
+                exported["unteraufgaben"] = [dict(s) for s in task.get("unteraufgaben", [])]
+                for owner, key in _task_image_fields(exported):
+                    owner[key] = [name for name in map(images.add, owner.get(key, [])) if name]
+                if not include_progress:
+                    _strip_progress(exported)
+                pending[1].write((json.dumps(exported, ensure_ascii=False) + "\n").encode('utf-8'))
+                done += 1
+                if progress:
+                    progress(done, total)
+        finish_set()
+
+        archive.writestr(MANIFEST, json.dumps(manifest, indent=4, ensure_ascii=False))
+    return done
+
+
+def export_bundle(data, filename, selection, include_progress=True, progress=None):
+    """
+    Exportiert die gewählten Fächer/Sets in ein Bundle (im aufrufenden Thread).
+    progress(erledigt, gesamt) wird nach jeder Aufgabe aufgerufen. Gibt die Anzahl der Aufgaben zurück.
+    """
+    return write_bundle(filename, iter_selection(data, selection), include_progress, count_tasks(data, selection), progress)
+
+
+def read_manifest(archive):
+    try:
+        manifest = json.loads(archive.read(MANIFEST))
+    except KeyError:
+        raise ValueError("Die Datei ist kein Lern-Bundle (manifest.json fehlt).")
+    if manifest.get("format") != BUNDLE_FORMAT or manifest.get("version", 0) > BUNDLE_VERSION:
+        raise ValueError("Das Bundle hat ein unbekanntes Format oder ist zu neu für diese Version.")
+    return manifest
+
+
+def _extract_image(archive, name, extracted):
+    """Entpackt ein Bild einmalig in den Bildordner; gleiche Inhalte werden wiederverwendet."""
+    if name not in extracted:
+        destination = os.path.join(constants.IMAGE_DIR, os.path.basename(name))
+        if not os.path.exists(destination):
+            try:
+                with archive.open(name) as src, open(destination, 'wb') as dst:
+                    shutil.copyfileobj(src, dst, CHUNK_SIZE)
+            except KeyError:
+                destination = None
+        extracted[name] = destination
+    return extracted[name]
+
+
+def read_bundle(filename, batch_size=BATCH_SIZE):
+    """
+    Liest ein Bundle ohne Zugriff auf die Sammlung (auch in einem Hintergrund-Thread)
+    und liefert (fach_eintrag, set_eintrag, aufgaben) in Batches, für leere Sets einmal
+    mit leerer Liste. Bilder werden dabei in den Bildordner entpackt; Aufgaben
+    erhalten neue IDs, damit ein Bundle mehrfach importiert werden kann.
+    """
+    os.makedirs(constants.IMAGE_DIR, exist_ok=True)
+    with zipfile.ZipFile(filename) as archive:
+        manifest = read_manifest(archive)
+        extracted = {}
+        for subject_entry in manifest["subjects"]:
+            for set_entry in subject_entry["sets"]:
+                batch, empty = [], True
+                with archive.open(set_entry["tasks_file"]) as lines:
+                    for line in lines:
+                        if not line.strip():
+                            continue
+                        task = json.loads(line)
+                        task["id"] = str(uuid.uuid4())
+                        for owner, key in _task_image_fields(task):
+                            owner[key] = [path for path in (_extract_image(archive, name, extracted)
+                                                            for name in owner.get(key, [])) if path]
+                        task.setdefault("history", [])
+                        task.setdefault("sm_data", {})
+                        layout.build_task_layout(task)
+                        batch.append(task)
+                        if len(batch) >= batch_size:
+                            yield subject_entry, set_entry, batch
+                            batch, empty = [], False
+                if batch or empty:
+                    yield subject_entry, set_entry, batch
+
+
+class BundleImport:
+    """
+    Übernimmt die Batches von read_bundle in die Sammlung. Sets werden immer neu
+    angelegt. Ohne subject_id wird jedes Fach des Bundles einem gleichnamigen Fach
+    zugeordnet oder neu angelegt; mit subject_id landen alle Sets in diesem Fach.
+    Zwischendurch wird höchstens alle importer.SAVE_INTERVAL Sekunden gespeichert;
+    am Ende muss der Aufrufer store.save() aufrufen.
+    """
+    def __init__(self, store, subject_id=None):
+        self.store = store
+        self.subject_id = subject_id
+        self.imported = 0
+        self._last_save = time.monotonic()
+        self._targets = {} # tasks_file -> (subject_id, set_id)
+
+    def _target(self, subject_entry, set_entry):
+        key = set_entry["tasks_file"]
+        if key not in self._targets:
+            target_subject = self.subject_id or _subject_by_name(self.store, subject_entry)
+            new_set_id = str(uuid.uuid4())
+            new_set = {"name": set_entry.get("name") or "Importiertes Set",
+                       "color": set_entry.get("color") or constants.DEFAULT_COLOR, "tasks": []}
+            if set_entry.get("scheduler"):
+                new_set["scheduler"] = set_entry["scheduler"]
+            self.store.data[target_subject]["sets"][new_set_id] = new_set
+            self._targets[key] = (target_subject, new_set_id)
+        return self._targets[key]
+
+    def commit(self, subject_entry, set_entry, tasks):
+        """Übernimmt einen Batch in den Speicher. Gibt die bisher importierte Anzahl zurück."""
+        from .importer import commit_batch, save_due
+        target_subject, set_id = self._target(subject_entry, set_entry)
+        commit_batch(self.store, target_subject, set_id, tasks) # Vermerkt auch leere Sets als geändert
+        self._last_save = save_due(self.store, self._last_save)
+        self.imported += len(tasks)
+        return self.imported
+
+
+def _subject_by_name(store, subject_entry):
+    name = subject_entry.get("name") or "Importiertes Fach"
+    for sid, sdata in store.subjects():
+        if sdata.get("name") == name:
+            return sid
+    new_id = str(uuid.uuid4())
+    store.data[new_id] = {"name": name, "color": subject_entry.get("color") or constants.DEFAULT_COLOR, "sets": {}}
+    store.mark_changed(new_id)
+    return new_id
+
+
+def import_bundle(store, filename, subject_id=None, progress=None):
+    """
+    Importiert ein Bundle und speichert am Ende (auch nach einem Fehler, damit
+    übernommene Karten und ihre Bilder zusammenbleiben). progress(anzahl).
+    Gibt die Anzahl zurück.
+    """
+    bundle_import = BundleImport(store, subject_id)
+    try:
+        for batch in read_bundle(filename):
+            imported = bundle_import.commit(*batch)
+            if progress:
+                progress(imported)
+    finally:
+        store.save()
+    return bundle_import.imported
+
+
+def main():
+    from .store import Store
+    from . import profiles
+
+    parser = argparse.ArgumentParser(description="Exportiert oder importiert Lern-Bundles.")
+    parser.add_argument("--file", default=constants.DATA_FILE, help="Pfad zur Datendatei")
+    parser.add_argument("--learner", default=None, help="Lernprofil, dessen Fortschritt exportiert bzw. ergänzt wird")
+    commands = parser.add_subparsers(dest="command", required=True)
+    export_parser = commands.add_parser("export", help="Fach oder Set als Bundle exportieren")
+    export_parser.add_argument("bundle", help="Zieldatei (.zip)")
+    export_parser.add_argument("--subject", required=True, help="Name des Fachs")
+    export_parser.add_argument("--set", default=None, help="Name des Sets (ohne: alle Sets des Fachs)")
+    export_parser.add_argument("--without-progress", action="store_true", help="Lernfortschritt nicht mitexportieren")
+    import_parser = commands.add_parser("import", help="Bundle importieren")
+    import_parser.add_argument("bundle", help="Bundle-Datei (.zip)")
+    args = parser.parse_args()
+    profiles.check_cli_learner(parser, args.learner)
+
+    store = Store(args.file, profile=args.learner)
+    if args.command == "export":
+        subject_id = next((sid for sid, sdata in store.subjects() if sdata.get("name") == args.subject), None)
+        if subject_id is None:
+            parser.error(f"Fach '{args.subject}' nicht gefunden.")
+        set_id = None
+        if args.set:
+            set_id = next((sid for sid, sdata in store.data[subject_id]["sets"].items() if sdata.get("name") == args.set), None)
+            if set_id is None:
+                parser.error(f"Set '{args.set}' nicht gefunden.")
+        count = export_bundle(store.data, args.bundle, [(subject_id, set_id)], not args.without_progress)
+        print(f"{count} Karten nach {args.bundle} exportiert ({os.path.getsize(args.bundle) / 2**20:.1f} MiB).")
+    else:
+        count = import_bundle(store, args.bundle)
+        print(f"{count} Karten aus {args.bundle} importiert.")
+
+
+if __name__ == "__main__":
+    main()
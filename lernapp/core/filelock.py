@@ -0,0 +1,56 @@
+"""
+Beratende Dateisperre für die Datendatei, damit mehrere Instanzen der
+Anwendung sich beim Lesen und Schreiben nicht in die Quere kommen.
+
+Gesperrt wird eine eigene Sperrdatei neben der Datendatei (flock), sodass die
+Sperre auch dann gilt, wenn die Datendatei beim Speichern ersetzt wird. Die
+Sperre ist pro Objekt wiedereintrittsfähig: Store.save hält die exklusive
+Sperre über Lesen, Zusammenführen und Schreiben, DataManager sperrt darin
+nicht erneut. Ohne fcntl (Windows) wird nicht gesperrt.
+"""
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+LOCK_SUFFIX = ".lock"
+
+
+class FileLock:
+    def __init__(self, filename):
+        self.filename = filename + LOCK_SUFFIX
+        self._file = None
+        self._depth = 0
+        self._exclusive = False
+        self._lock = threading.RLock()
+
+    @contextmanager
+    def _held(self, exclusive):
+        with self._lock:
+            if self._depth == 0:
+                self._file = open(self.filename, 'a')
+            if fcntl is not None and (self._depth == 0 or (exclusive and not self._exclusive)):
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+                self._exclusive = exclusive
+            self._depth += 1
+            try:
+                yield
+            finally:
+                self._depth -= 1
+                if self._depth == 0:
+                    if fcntl is not None:
+                        fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+                    self._file.close()
+                    self._file = None
+                    self._exclusive = False
+
+    def shared(self):
+        """Sperre zum Lesen: andere Instanzen dürfen gleichzeitig lesen, aber nicht schreiben."""
+        return self._held(False)
+
+    def exclusive(self):
+        """Sperre zum Schreiben: keine andere Instanz liest oder schreibt währenddessen."""
+        return self._held(True)
@@ -0,0 +1,426 @@
+"""
+Streamender Import externer Kartensammlungen (CSV, Markdown, Anki .apkg).
+
+Die Quellen werden Zeile für Zeile bzw. Notiz für Notiz gelesen und nie
+vollständig in den Speicher geladen. Je 'batch_size' Karten werden die Bilder
+parallel in den Bildordner kopiert, die Karten an das Set angehängt und die
+Indizes aktualisiert. Gespeichert wird nicht nach jedem Batch, denn jedes
+Speichern schreibt die ganze, mit dem Import wachsende Datei neu (bei großen
+Decks quadratischer Aufwand), sondern höchstens alle SAVE_INTERVAL Sekunden
+und am Ende. Bricht der Import ab, fehlen also höchstens die Karten der
+letzten SAVE_INTERVAL Sekunden; ein erneuter Import holt sie nach.
+
+Aufruf:  python -m lernapp.core.importer deck.apkg --subject "Mathe" --set "Analysis"
+"""
+import argparse
+import csv
+import html
+import json
+import os
+import re
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+import zipfile
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import constants
+from . import layout
+
+BATCH_SIZE = 500
+SAVE_INTERVAL = 30 # Sekunden zwischen zwei Zwischenständen
+MEDIA_WORKERS = 8
+NAME_LENGTH = 60
+
+# Fehler, die eine beschädigte oder unpassende Quelldatei auslösen kann
+IMPORT_ERRORS = (ValueError, OSError, csv.Error, zipfile.BadZipFile, sqlite3.Error)
+
+# Ein Bild innerhalb eines Archivs (Anki-Medien); wird beim Import direkt entpackt
+ZipMember = namedtuple("ZipMember", "archive_path member name")
+
+CSV_COLUMNS = {
+    "name": ("name", "titel", "title"),
+    "beschreibung": ("beschreibung", "description"),
+    "frage": ("frage", "front", "question", "vorderseite"),
+    "loesung": ("loesung", "lösung", "back", "answer", "rückseite", "antwort"),
+    "tags": ("tags", "tag"),
+    "bilder": ("bild", "bilder", "image", "images"),
+}
+
+
+def _record(name, frage="", loesung="", beschreibung="", tags=(), images=(), solution_images=()):
+    """Eine importierte Karte im Zwischenformat (Bilder noch als Quellverweise)."""
+    return {
+        "name": name or _short_name(frage) or "Importierte Aufgabe",
+        "beschreibung": beschreibung,
+        "tags": list(tags),
+        "bilder_aufgabe": list(images),
+        "unteraufgaben": [{"frage": frage, "loesung": loesung, "bilder_loesung": list(solution_images)}]
+                         if frage or loesung else [],
+    }
+
+
+def _short_name(text):
+    first_line = text.strip().split("\n", 1)[0]
+    return first_line if len(first_line) <= NAME_LENGTH else first_line[:NAME_LENGTH - 1] + "…"
+
+
+def _split_tags(value):
+    separators = r"[,;]" if re.search(r"[,;]", value) else r"\s+"
+    return [tag.strip() for tag in re.split(separators, value) if tag.strip()]
+
+
+# --- CSV ---
+
+def read_csv(path):
+    """
+    Liest eine CSV-Datei. Mit Kopfzeile werden die Spalten über ihre Namen
+    zugeordnet (siehe CSV_COLUMNS), sonst gilt: Frage, Lösung, Tags.
+    Bildpfade sind relativ zur CSV-Datei und durch ';' getrennt.
+    """
+    base_dir = os.path.dirname(os.path.abspath(path))
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        sample = f.read(4096)
+        f.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=",;\t")
+        except csv.Error:
+            dialect = csv.excel
+        reader = csv.reader(f, dialect)
+        first_row = next(reader, None)
+        if first_row is None:
+            return
+        columns = _csv_header(first_row)
+        if columns is None:
+            columns = {"frage": 0, "loesung": 1, "tags": 2}
+            rows = _prepend(first_row, reader)
+        else:
+            rows = reader
+
+        for row in rows:
+            def cell(key):
+                index = columns.get(key)
+                return row[index].strip() if index is not None and index < len(row) else ""
+            if not any(value.strip() for value in row):
+                continue
+            images = [p if os.path.isabs(p) else os.path.join(base_dir, p)
+                      for p in (part.strip() for part in cell("bilder").split(";")) if p]
+            yield _record(cell("name"), cell("frage"), cell("loesung"), cell("beschreibung"),
+                          _split_tags(cell("tags")), images)
+
+
+def _csv_header(row):
+    columns = {}
+    for index, title in enumerate(row):
+        for key, names in CSV_COLUMNS.items():
+            if title.strip().casefold() in names:
+                columns.setdefault(key, index)
+    return columns if "frage" in columns or "name" in columns else None
+
+
+def _prepend(first, iterator):
+    yield first
+    yield from iterator
+
+
+# --- Markdown ---
+
+MD_IMAGE = re.compile(r"!\[[^\]]*\]\(([^)\s]+)\)")
+MD_SOLUTION_SEPARATORS = ("---", "???")
+
+
+def read_markdown(path):
+    """
+    Liest Markdown mit Überschriften:
+      '# Name' beginnt eine Aufgabe, der folgende Text ist die Beschreibung,
+      '## Frage' beginnt eine Teilaufgabe, deren Lösung nach einer Zeile '---' folgt.
+    'Tags: a, b' setzt die Tags, '![...](bild.png)' fügt Bilder hinzu.
+    """
+    base_dir = os.path.dirname(os.path.abspath(path))
+    task = None
+    target = None # Liste der Zeilen, an die gerade angehängt wird
+
+    def finish(task):
+        task["beschreibung"] = "\n".join(task["beschreibung"]).strip()
+        for subtask in task["unteraufgaben"]:
+            subtask["frage"] = "\n".join(subtask["frage"]).strip()
+            subtask["loesung"] = "\n".join(subtask["loesung"]).strip()
+        return task
+
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.rstrip("\n")
+            if line.startswith("# "):
+                if task is not None:
+                    yield finish(task)
+                task = {"name": line[2:].strip(), "beschreibung": [], "tags": [],
+                        "bilder_aufgabe": [], "unteraufgaben": []}
+                target = task["beschreibung"]
+                continue
+            if task is None:
+                continue
+            if line.startswith("## "):
+                subtask = {"frage": [line[3:].strip()], "loesung": [], "bilder_loesung": []}
+                task["unteraufgaben"].append(subtask)
+                target = subtask["frage"]
+            elif line.strip() in MD_SOLUTION_SEPARATORS and task["unteraufgaben"]:
+                target = task["unteraufgaben"][-1]["loesung"]
+            elif line.casefold().startswith("tags:"):
+                task["tags"].extend(_split_tags(line[5:]))
+            else:
+                images = [p if os.path.isabs(p) else os.path.join(base_dir, p) for p in MD_IMAGE.findall(line)]
+                if images:
+                    in_solution = task["unteraufgaben"] and target is task["unteraufgaben"][-1]["loesung"]
+                    (task["unteraufgaben"][-1]["bilder_loesung"] if in_solution else task["bilder_aufgabe"]).extend(images)
+                    line = MD_IMAGE.sub("", line)
+                    if not line.strip():
+                        continue
+                target.append(line)
+    if task is not None:
+        yield finish(task)
+
+
+# --- Anki (.apkg) ---
+
+HTML_IMAGE = re.compile(r"<img[^>]*?src=[\"']?([^\"'>]+)[\"']?[^>]*>", re.IGNORECASE)
+HTML_BREAK = re.compile(r"<br\s*/?>|</(div|p|li)>", re.IGNORECASE)
+HTML_TAG = re.compile(r"<[^>]+>")
+ANKI_SOUND = re.compile(r"\[sound:[^\]]*\]")
+ANKI_LATEX = re.compile(r"\[\$\$?\](.*?)\[/\$\$?\]|\\\((.*?)\\\)|\\\[(.*?)\\\]", re.DOTALL)
+
+
+def anki_field_to_text(field):
+    """Wandelt ein Anki-Feld (HTML) in Text mit $Formeln$ um; gibt (text, bildnamen) zurück."""
+    images = [html.unescape(name) for name in HTML_IMAGE.findall(field)]
+    text = HTML_IMAGE.sub("", field)
+    text = HTML_BREAK.sub("\n", text)
+    text = html.unescape(HTML_TAG.sub("", text))
+    text = ANKI_SOUND.sub("", text)
+    text = ANKI_LATEX.sub(lambda m: f"${next(g for g in m.groups() if g is not None).strip()}$", text)
+    text = re.sub(r"\n{3,}", "\n\n", text.replace("\xa0", " "))
+    return text.strip(), images
+
+
+def read_apkg(path):
+    """
+    Liest ein Anki-Paket. Die Datenbank wird in eine temporäre Datei entpackt
+    und Notiz für Notiz abgefragt; das erste Feld wird zur Frage, die übrigen
+    zur Lösung. Bilder werden erst beim Import aus dem Archiv entpackt.
+    """
+    with zipfile.ZipFile(path) as archive:
+        names = set(archive.namelist())
+        if "collection.anki21b" in names and not {"collection.anki21", "collection.anki2"} & names:
+            raise ValueError("Dieses Anki-Paket verwendet das neue komprimierte Format. "
+                             "Bitte in Anki mit der Option 'Ältere Anki-Versionen unterstützen' exportieren.")
+        db_name = "collection.anki21" if "collection.anki21" in names else "collection.anki2"
+        if db_name not in names:
+            raise ValueError("Keine Anki-Datenbank im Paket gefunden.")
+
+        media = json.loads(archive.read("media")) if "media" in names else {}
+        members = {name: number for number, name in media.items()}
+
+        def to_refs(image_names):
+            return [ZipMember(path, members[n], n) for n in image_names if n in members]
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            db_path = os.path.join(tmp_dir, "collection.db")
+            with archive.open(db_name) as src, open(db_path, 'wb') as dst:
+                shutil.copyfileobj(src, dst)
+
+            connection = sqlite3.connect(db_path)
+            try:
+                for fields, tags in connection.execute("SELECT flds, tags FROM notes ORDER BY id"):
+                    parts = fields.split("\x1f")
+                    question, question_images = anki_field_to_text(parts[0])
+                    answers = [anki_field_to_text(part) for part in parts[1:]]
+                    answer = "\n\n".join(text for text, _ in answers if text)
+                    answer_images = [name for _, imgs in answers for name in imgs]
+                    yield _record("", question, answer, tags=tags.split(),
+                                  images=to_refs(question_images), solution_images=to_refs(answer_images))
+            finally:
+                connection.close()
+
+
+READERS = {".csv": read_csv, ".tsv": read_csv, ".txt": read_csv, ".md": read_markdown,
+           ".markdown": read_markdown, ".apkg": read_apkg}
+
+
+def read_records(path):
+    """Wählt den Leser anhand der Dateiendung."""
+    reader = READERS.get(os.path.splitext(path)[1].lower())
+    if reader is None:
+        raise ValueError(f"Nicht unterstütztes Format: {os.path.basename(path)}")
+    return reader(path)
+
+
+# --- Bilder und Batches ---
+
+def _media_key(ref):
+    return (ref.archive_path, ref.member) if isinstance(ref, ZipMember) else os.path.abspath(ref)
+
+
+class _Archives:
+    """Hält die Archive während des Imports offen; ZipFile erlaubt paralleles Lesen aus Threads."""
+    def __init__(self):
+        self._open = {}
+        self._lock = threading.Lock()
+
+    def get(self, path):
+        with self._lock:
+            if path not in self._open:
+                self._open[path] = zipfile.ZipFile(path)
+            return self._open[path]
+
+    def close(self):
+        for archive in self._open.values():
+            archive.close()
+        self._open.clear()
+
+
+def _store_media(ref, data_manager, archives):
+    """Legt ein Bild im Bildordner ab und gibt den neuen Pfad zurück (None bei Fehlern)."""
+    if not isinstance(ref, ZipMember):
+        return data_manager.copy_image_to_datastore(ref)
+    destination = os.path.join(constants.IMAGE_DIR, f"{uuid.uuid4().hex[:12]}_{os.path.basename(ref.name)}")
+    try:
+        with archives.get(ref.archive_path).open(ref.member) as src, open(destination, 'wb') as dst:
+            shutil.copyfileobj(src, dst)
+        return destination
+    except (KeyError, OSError) as e:
+        print(f"Fehler beim Entpacken des Bildes {ref.name}: {e}")
+        return None
+
+
+def _new_task(record, stored):
+    def paths(refs):
+        return [stored[_media_key(ref)] for ref in refs if stored.get(_media_key(ref))]
+    task = {
+        "id": str(uuid.uuid4()), "name": record["name"], "beschreibung": record["beschreibung"],
+        "tags": record["tags"], "bilder_aufgabe": paths(record["bilder_aufgabe"]),
+        "unteraufgaben": [{"frage": s["frage"], "loesung": s["loesung"], "bilder_loesung": paths(s["bilder_loesung"])}
+                          for s in record["unteraufgaben"]],
+        "history": [], "sm_data": {},
+    }
+    layout.build_task_layout(task)
+    return task
+
+
+def prepare_batches(records, data_manager, batch_size=BATCH_SIZE, workers=MEDIA_WORKERS):
+    """
+    Fasst die Karten zu Batches zusammen und kopiert deren Bilder parallel.
+    Bilder, die mehrere Karten verwenden, werden nur einmal kopiert.
+    """
+    stored = {}
+    archives = _Archives()
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            batch = []
+            for record in records:
+                batch.append(record)
+                if len(batch) >= batch_size:
+                    yield _finish_batch(batch, stored, data_manager, pool, archives)
+                    batch = []
+            if batch:
+                yield _finish_batch(batch, stored, data_manager, pool, archives)
+    finally:
+        archives.close()
+
+
+def _finish_batch(batch, stored, data_manager, pool, archives):
+    refs = {}
+    for record in batch:
+        for ref in record["bilder_aufgabe"] + [r for s in record["unteraufgaben"] for r in s["bilder_loesung"]]:
+            key = _media_key(ref)
+            if key not in stored:
+                refs[key] = ref
+    for key, path in zip(refs, pool.map(lambda ref: _store_media(ref, data_manager, archives), refs.values())):
+        stored[key] = path
+    return [_new_task(record, stored) for record in batch]
+
+
+def commit_batch(store, subject_id, set_id, tasks):
+    """
+    Hängt die Karten an das Set an und aktualisiert die Indizes, nur im Speicher.
+    Speichert nicht: Der Aufrufer muss selbst speichern, zwischendurch mit save_due
+    und am Ende mit store.save() (siehe import_file, bundle.import_bundle).
+    """
+    store.get_set(subject_id, set_id).setdefault("tasks", []).extend(tasks)
+    for task in tasks:
+        store.tag_index.update_task(subject_id, set_id, task["id"], [], task["tags"])
+        store.due_queue.push(subject_id, set_id, task)
+    store.mark_changed(subject_id, set_id)
+
+
+def save_due(store, last_save, save_interval=SAVE_INTERVAL):
+    """Speichert, wenn seit last_save (time.monotonic) save_interval vergangen ist. Gibt den Zeitpunkt zurück."""
+    now = time.monotonic()
+    if now - last_save < save_interval:
+        return last_save
+    store.save()
+    return now
+
+
+def import_file(store, path, subject_id, set_id, batch_size=BATCH_SIZE, workers=MEDIA_WORKERS, progress=None,
+                save_interval=SAVE_INTERVAL):
+    """
+    Importiert eine Datei in ein bestehendes Set. progress(anzahl) nach jedem Batch.
+    Gespeichert wird alle save_interval Sekunden und am Ende (auch nach einem Fehler).
+    """
+    imported = 0
+    last_save = time.monotonic()
+    try:
+        for tasks in prepare_batches(read_records(path), store.data_manager, batch_size, workers):
+            commit_batch(store, subject_id, set_id, tasks)
+            imported += len(tasks)
+            last_save = save_due(store, last_save, save_interval)
+            if progress:
+                progress(imported)
+    finally:
+        store.save()
+    return imported
+
+
+def find_or_create_set(store, subject_name, set_name):
+    """Sucht Fach und Set anhand ihrer Namen und legt sie bei Bedarf an."""
+    subject_id = next((sid for sid, sdata in store.subjects() if sdata.get("name") == subject_name), None)
+    if subject_id is None:
+        subject_id = str(uuid.uuid4())
+        store.data[subject_id] = {"name": subject_name, "color": constants.DEFAULT_COLOR, "sets": {}}
+        store.mark_changed(subject_id)
+    sets = store.data[subject_id]["sets"]
+    set_id = next((sid for sid, sdata in sets.items() if sdata.get("name") == set_name), None)
+    if set_id is None:
+        set_id = str(uuid.uuid4())
+        sets[set_id] = {"name": set_name, "color": constants.DEFAULT_COLOR, "tasks": []}
+    return subject_id, set_id
+
+
+def main():
+    from . import profiles
+    from .store import Store
+
+    parser = argparse.ArgumentParser(description="Importiert CSV-, Markdown- oder Anki-Dateien in ein Lernset.")
+    parser.add_argument("source", help="Quelldatei (.csv, .tsv, .md, .apkg)")
+    parser.add_argument("--subject", required=True, help="Name des Fachs (wird bei Bedarf angelegt)")
+    parser.add_argument("--set", required=True, help="Name des Lernsets (wird bei Bedarf angelegt)")
+    parser.add_argument("--file", default=constants.DATA_FILE, help="Pfad zur Datendatei")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Karten pro Batch")
+    parser.add_argument("--workers", type=int, default=MEDIA_WORKERS, help="Threads zum Kopieren der Bilder")
+    parser.add_argument("--learner", default=None, help="Lernprofil, in dem die neuen Karten eingeplant werden")
+    args = parser.parse_args()
+    profiles.check_cli_learner(parser, args.learner)
+
+    store = Store(args.file, profile=args.learner)
+    subject_id, set_id = find_or_create_set(store, args.subject, args.set)
+    start = time.perf_counter()
+    count = import_file(store, args.source, subject_id, set_id, args.batch_size, args.workers,
+                        progress=lambda n: print(f"  {n} Karten importiert"))
+    print(f"{count} Karten in {time.perf_counter() - start:.1f} s importiert.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,295 @@
+import heapq
+import time
+
+
+class TaskLocator:
+    """
+    Findet Aufgaben anhand von (Fach-ID, Set-ID, Aufgaben-ID), ohne jedes Mal
+    die komplette Aufgabenliste eines Sets zu durchsuchen.
+    """
+    def __init__(self, data):
+        self.data = data
+        # (subject_id, set_id) -> {task_id: Position in der Aufgabenliste}
+        self._positions = {}
+
+    def _task_list(self, subject_id, set_id):
+        subject = self.data.get(subject_id)
+        if not isinstance(subject, dict):
+            return None
+        set_data = subject.get("sets", {}).get(set_id)
+        if not isinstance(set_data, dict):
+            return None
+        return set_data.get("tasks", [])
+
+    def _rebuild(self, key, tasks):
+        positions = {task.get('id'): i for i, task in enumerate(tasks) if isinstance(task, dict)}
+        self._positions[key] = positions
+        return positions
+
+    def get(self, subject_id, set_id, task_id):
+        """Gibt die Aufgabe zurück oder None, falls sie nicht (mehr) existiert."""
+        tasks = self._task_list(subject_id, set_id)
+        if tasks is None:
+            self._positions.pop((subject_id, set_id), None)
+            return None
+
+        key = (subject_id, set_id)
+        positions = self._positions.get(key)
+        if positions is None:
+            positions = self._rebuild(key, tasks)
+
+        # Die gemerkte Position wird geprüft, da Aufgaben gelöscht oder ersetzt werden können.
+        index = positions.get(task_id)
+        if index is not None and index < len(tasks) and tasks[index].get('id') == task_id:
+            return tasks[index]
+
+        index = self._rebuild(key, tasks).get(task_id)
+        return tasks[index] if index is not None else None
+
+    def invalidate(self, subject_id=None, set_id=None):
+        """Verwirft gemerkte Positionen (alle oder nur die eines Sets)."""
+        if subject_id is None:
+            self._positions.clear()
+        else:
+            self._positions.pop((subject_id, set_id), None)
+
+
+def _normalize_tag(tag):
+    return tag.strip().casefold()
+
+
+class TagIndex:
+    """
+    Hält eine Zuordnung Tag -> Aufgaben-IDs, damit fachübergreifende Sitzungen
+    nur die passenden Karten anfassen müssen. Der Index wird in den Settings
+    gespeichert und vom Editor beim Speichern aktuell gehalten.
+    """
+    def __init__(self, data, locator=None):
+        self.data = data
+        self.locator = locator or TaskLocator(data)
+        settings = data.setdefault("settings", {})
+        if "tag_index" not in settings:
+            settings["tag_index"] = self._build()
+        # {tag: {task_id: [subject_id, set_id]}}
+        self.index = settings["tag_index"]
+
+    def _build(self):
+        """Erstellt den Index einmalig durch einen vollständigen Durchlauf."""
+        index = {}
+        for subject_id, subject_data in self.data.items():
+            if subject_id == "settings" or not isinstance(subject_data, dict):
+                continue
+            for set_id, set_data in subject_data.get("sets", {}).items():
+                if not isinstance(set_data, dict): continue
+                for task in set_data.get("tasks", []):
+                    if not isinstance(task, dict) or not task.get('id'): continue
+                    for tag in task.get('tags', []):
+                        index.setdefault(_normalize_tag(tag), {})[task['id']] = [subject_id, set_id]
+        return index
+
+    def update_task(self, subject_id, set_id, task_id, old_tags, new_tags):
+        """Überträgt geänderte Tags einer Aufgabe in den Index."""
+        old_keys = {_normalize_tag(t) for t in old_tags or []}
+        new_keys = {_normalize_tag(t) for t in new_tags or []}
+        for key in old_keys - new_keys:
+            self._discard(key, task_id)
+        for key in new_keys:
+            self.index.setdefault(key, {})[task_id] = [subject_id, set_id]
+
+    def remove_task(self, task_id, tags):
+        """Entfernt eine gelöschte Aufgabe aus dem Index."""
+        for tag in tags or []:
+            self._discard(_normalize_tag(tag), task_id)
+
+    def _discard(self, key, task_id):
+        entries = self.index.get(key)
+        if entries is None:
+            return
+        entries.pop(task_id, None)
+        if not entries:
+            del self.index[key]
+
+    def all_tags(self):
+        """Gibt alle bekannten Tags sortiert zurück."""
+        return sorted(self.index)
+
+    def find_tasks(self, query):
+        """
+        Liefert (subject_id, set_id, task) für alle Aufgaben, die mindestens einen der
+        (mit Komma getrennten) Tags der Anfrage tragen. Der Aufwand hängt nur von der
+        Anzahl der Treffer ab.
+        """
+        keys = {_normalize_tag(t) for t in query.split(',') if t.strip()}
+        seen, result = set(), []
+        for key in keys:
+            entries = self.index.get(key, {})
+            for task_id, (subject_id, set_id) in list(entries.items()):
+                if task_id in seen: continue
+                task = self.locator.get(subject_id, set_id, task_id)
+                # Veraltete Einträge (gelöschte Aufgaben, entfernte Tags) werden nebenbei bereinigt
+                if task is None or key not in {_normalize_tag(t) for t in task.get('tags', [])}:
+                    self._discard(key, task_id)
+                    continue
+                seen.add(task_id)
+                result.append((subject_id, set_id, task))
+        return result
+
+
+class DueQueue:
+    """
+    Eine globale, fach- und setübergreifende Warteschlange aller Karten, sortiert
+    nach ihrem Fälligkeitsdatum. Sie ist als Min-Heap aus
+    [next_review_at, task_id, subject_id, set_id] in den Settings gespeichert,
+    sodass die nächsten fälligen Karten ohne Durchlauf aller Aufgaben gefunden werden.
+
+    Veraltete Einträge werden nicht sofort aus dem Heap entfernt ("lazy deletion").
+    Gültig ist je Karte nur der zuletzt eingetragene Eintrag (siehe self.current);
+    ältere werden beim Zählen und Abrufen übergangen und verworfen, sobald der
+    Heap mehr als doppelt so groß wie nötig ist (compact). Gelöschte Karten werden
+    dagegen sofort entfernt (discard), damit sie nicht mitgespeichert werden.
+    """
+    def __init__(self, data, locator=None):
+        self.data = data
+        self.locator = locator or TaskLocator(data)
+        settings = data.setdefault("settings", {})
+        if "due_queue" not in settings:
+            settings["due_queue"] = self._build()
+        self.heap = settings["due_queue"]
+        # task_id -> (next_review_at, subject_id, set_id) des gültigen Eintrags
+        self.current = {}
+        self._index_heap()
+
+    def _build(self):
+        """Erstellt den Heap einmalig durch einen vollständigen Durchlauf."""
+        heap = []
+        for subject_id, subject_data in self.data.items():
+            if subject_id == "settings" or not isinstance(subject_data, dict):
+                continue
+            for set_id, set_data in subject_data.get("sets", {}).items():
+                if not isinstance(set_data, dict): continue
+                for task in set_data.get("tasks", []):
+                    if not isinstance(task, dict) or not task.get('id'): continue
+                    due = task.get('sm_data', {}).get('next_review_at', 0)
+                    heap.append([due, task['id'], subject_id, set_id])
+        heapq.heapify(heap)
+        return heap
+
+    def _index_heap(self):
+        """
+        Bestimmt den gültigen Eintrag je Karte. Gibt es (in älteren Dateien) mehrere,
+        entscheidet die aktuelle Fälligkeit der Karte; danach wird der Heap verdichtet.
+        """
+        candidates = {}
+        for due, task_id, subject_id, set_id in self.heap:
+            candidates.setdefault(task_id, set()).add((due, subject_id, set_id))
+        duplicates = False
+        for task_id, entries in candidates.items():
+            if len(entries) == 1:
+                self.current[task_id] = next(iter(entries))
+                continue
+            duplicates = True
+            for due, subject_id, set_id in entries:
+                task = self.locator.get(subject_id, set_id, task_id)
+                if task is not None:
+                    self.current[task_id] = (task.get('sm_data', {}).get('next_review_at', 0), subject_id, set_id)
+                    break
+        if duplicates or len(self.heap) != len(self.current):
+            self.compact()
+
+    def _is_current(self, entry):
+        return self.current.get(entry[1]) == (entry[0], entry[2], entry[3])
+
+    def compact(self, prune_missing=False):
+        """
+        Verwirft alle überholten Einträge (in place, da der Heap in den Settings liegt).
+        Mit prune_missing fallen auch Karten heraus, die es nicht mehr gibt.
+        """
+        if prune_missing:
+            for task_id, (due, subject_id, set_id) in list(self.current.items()):
+                if self.locator.get(subject_id, set_id, task_id) is None:
+                    del self.current[task_id]
+        seen = set()
+        live = []
+        for entry in self.heap:
+            if self._is_current(entry) and entry[1] not in seen:
+                seen.add(entry[1])
+                live.append(entry)
+        for task_id, (due, subject_id, set_id) in self.current.items():
+            if task_id not in seen:
+                live.append([due, task_id, subject_id, set_id])
+        heapq.heapify(live)
+        self.heap[:] = live
+
+    def push(self, subject_id, set_id, task):
+        """Trägt das (neue) Fälligkeitsdatum einer Karte ein."""
+        if not task.get('id'):
+            return
+        due = task.get('sm_data', {}).get('next_review_at', 0)
+        if self.current.get(task['id']) == (due, subject_id, set_id):
+            return
+        self.current[task['id']] = (due, subject_id, set_id)
+        heapq.heappush(self.heap, [due, task['id'], subject_id, set_id])
+        if len(self.heap) > 2 * len(self.current) + 64:
+            self.compact()
+
+    def push_all(self, subject_id, set_id, tasks):
+        """Trägt mehrere Karten eines Sets ein, z.B. nach dem Zurücksetzen des Fortschritts."""
+        for task in tasks:
+            self.push(subject_id, set_id, task)
+
+    def discard(self, task_id):
+        """Nimmt eine gelöschte Karte aus der Warteschlange."""
+        self.discard_all([task_id])
+
+    def discard_all(self, task_ids):
+        """Nimmt gelöschte Karten aus der Warteschlange; der Heap wird einmal verdichtet."""
+        removed = [self.current.pop(task_id) for task_id in task_ids if task_id in self.current]
+        if removed:
+            self.compact()
+
+    def count_due(self, now=None):
+        """
+        Zählt die Karten, die bis 'now' fällig sind. Es werden nur die Heap-Knoten
+        besucht, die selbst fällig sind; überholte Einträge zählen nicht mit.
+        """
+        now = time.time() if now is None else now
+        count, stack = 0, [0] if self.heap else []
+        while stack:
+            i = stack.pop()
+            if self.heap[i][0] > now: continue
+            if self._is_current(self.heap[i]):
+                count += 1
+            stack.extend(c for c in (2 * i + 1, 2 * i + 2) if c < len(self.heap))
+        return count
+
+    def pull_due(self, limit=None, now=None):
+        """
+        Liefert bis zu 'limit' fällige Karten als (subject_id, set_id, task), die am
+        längsten überfälligen zuerst. Die Einträge bleiben im Heap, bis die Karte
+        ein neues Fälligkeitsdatum erhält.
+        """
+        now = time.time() if now is None else now
+        result, keep = [], []
+        while self.heap and self.heap[0][0] <= now and (limit is None or len(result) < limit):
+            entry = heapq.heappop(self.heap)
+            due, task_id, subject_id, set_id = entry
+            if not self._is_current(entry):
+                continue # Überholter Eintrag
+            task = self.locator.get(subject_id, set_id, task_id)
+            if task is None:
+                self.current.pop(task_id, None) # Eintrag ist bereits aus dem Heap genommen
+                continue
+            current_due = task.get('sm_data', {}).get('next_review_at', 0)
+            if current_due != due:
+                # Fälligkeit hat sich ohne push geändert: neu einsortieren; ist die Karte
+                # noch fällig, holt die Schleife sie an der richtigen Stelle wieder heraus.
+                # Direkt per heappush statt push, denn push kann den Heap verdichten,
+                # während 'keep' noch außerhalb liegt; der Heap wird dabei nicht größer
+                self.current[task_id] = (current_due, subject_id, set_id)
+                heapq.heappush(self.heap, [current_due, task_id, subject_id, set_id])
+                continue
+            keep.append(entry)
+            result.append((subject_id, set_id, task))
+        for entry in keep:
+            heapq.heappush(self.heap, entry)
+        return result
@@ -0,0 +1,304 @@
+"""
+Datensicherheit: atomares Schreiben, rollierende Sicherungen mit Prüfsumme,
+Wiederherstellung und eine Prüfung der geladenen Sammlung.
+
+Gespeichert wird in eine temporäre Datei, die nach fsync per os.replace an
+die Stelle der Datendatei tritt; ein Absturz oder eine volle Platte
+hinterlässt also entweder den alten oder den neuen, nie einen halben Stand.
+Die SHA-256-Prüfsumme entsteht beim Schreiben und liegt in <datei>.sha256.
+Höchstens alle SNAPSHOT_INTERVAL Sekunden wird der gerade geschriebene Stand
+als Sicherung im Ordner BACKUP_DIR neben der Datendatei abgelegt (als Hardlink,
+da die Datei danach nie mehr verändert, sondern nur ersetzt wird); die
+SNAPSHOT_COUNT neuesten bleiben. Weil der Ordner zur Datei gehört, kommen sich
+gleichnamige Dateien in verschiedenen Verzeichnissen nicht in die Quere.
+
+Ist die Datendatei beim Laden nicht lesbar, wird sie beiseitegelegt und die
+neueste Sicherung mit passender Prüfsumme zurückgespielt. Antworten seit dem
+letzten Speichern stellt danach das Antwortprotokoll wieder her.
+
+Aufruf:  python -m lernapp.core.integrity [--file lernkarten.json]
+"""
+import argparse
+import glob
+import hashlib
+import json
+import os
+import shutil
+import time
+
+import constants
+
+CHECKSUM_SUFFIX = ".sha256"
+
+
+class DataCorruptedError(ValueError):
+    """Die Datendatei ist unlesbar und es gibt keine intakte Sicherung."""
+
+
+class _HashingWriter:
+    """Schreibt Text als UTF-8 und berechnet dabei die Prüfsumme."""
+    def __init__(self, f):
+        self.f = f
+        self.digest = hashlib.sha256()
+
+    def write(self, text):
+        data = text.encode('utf-8')
+        self.digest.update(data)
+        self.f.write(data)
+
+
+def _fsync_directory(path):
+    try:
+        fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    except OSError:
+        return # z.B. unter Windows
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def file_checksum(filename):
+    digest = hashlib.sha256()
+    with open(filename, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def read_checksum(filename):
+    try:
+        with open(filename + CHECKSUM_SUFFIX, 'r', encoding='ascii') as f:
+            return f.read().strip()
+    except (OSError, UnicodeDecodeError):
+        return None
+
+
+def _write_checksum(filename, checksum):
+    tmp_filename = f"{filename}{CHECKSUM_SUFFIX}.tmp"
+    with open(tmp_filename, 'w', encoding='ascii') as f:
+        f.write(checksum + "\n")
+    os.replace(tmp_filename, filename + CHECKSUM_SUFFIX)
+
+
+def backup_dir_for(filename):
+    """Ordner der Sicherungen einer Datei: BACKUP_DIR im Verzeichnis der Datei."""
+    return os.path.join(os.path.dirname(os.path.abspath(filename)), constants.BACKUP_DIR)
+
+
+def write_json_atomic(filename, data, indent=4, separators=None, snapshot=True, backup_dir=None):
+    """
+    Schreibt data als JSON atomar nach filename und legt bei Bedarf eine Sicherung
+    in backup_dir an (Standard: backup_dir_for(filename)). Gibt die Prüfsumme zurück.
+    """
+    tmp_filename = f"{filename}.tmp"
+    try:
+        with open(tmp_filename, 'wb') as f:
+            writer = _HashingWriter(f)
+            json.dump(data, writer, indent=indent, separators=separators, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_filename, filename)
+    except BaseException:
+        # Die bisherige Datei bleibt unverändert; nur der halbe Entwurf wird verworfen
+        try:
+            os.remove(tmp_filename)
+        except OSError:
+            pass
+        raise
+    _fsync_directory(filename)
+    checksum = writer.digest.hexdigest()
+    _write_checksum(filename, checksum)
+    if snapshot:
+        take_snapshot(filename, checksum, directory=backup_dir)
+    return checksum
+
+
+def _snapshot_pattern(filename, directory):
+    # Nur genau der Zeitstempel, damit z.B. "anna" nicht die Sicherungen von "anna-2" findet
+    stem, ext = os.path.splitext(os.path.basename(filename))
+    return os.path.join(glob.escape(directory), f"{glob.escape(stem)}-{'[0-9]' * 8}-{'[0-9]' * 6}{glob.escape(ext)}")
+
+
+def list_snapshots(filename, directory=None):
+    """Sicherungen einer Datei, die älteste zuerst (der Name enthält den Zeitpunkt)."""
+    directory = directory or backup_dir_for(filename)
+    return sorted(glob.glob(_snapshot_pattern(filename, directory)))
+
+
+def take_snapshot(filename, checksum=None, directory=None,
+                  keep=constants.SNAPSHOT_COUNT, min_interval=constants.SNAPSHOT_INTERVAL, now=None):
+    """Legt eine Sicherung des aktuellen Stands an, wenn die letzte alt genug ist. Gibt ihren Pfad zurück oder None."""
+    now = time.time() if now is None else now
+    directory = directory or backup_dir_for(filename)
+    snapshots = list_snapshots(filename, directory)
+    if snapshots and now - os.path.getmtime(snapshots[-1]) < min_interval:
+        return None
+    os.makedirs(directory, exist_ok=True)
+    stem, ext = os.path.splitext(os.path.basename(filename))
+    snapshot = os.path.join(directory, f"{stem}-{time.strftime('%Y%m%d-%H%M%S', time.localtime(now))}{ext}")
+    if os.path.exists(snapshot):
+        return None
+    try:
+        os.link(filename, snapshot)
+    except OSError:
+        shutil.copy2(filename, snapshot) # Dateisystem ohne Hardlinks
+    _write_checksum(snapshot, checksum or file_checksum(snapshot))
+    for old in list_snapshots(filename, directory)[:-keep]:
+        for path in (old, old + CHECKSUM_SUFFIX):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+    return snapshot
+
+
+def _load_snapshot(snapshot):
+    """Lädt eine Sicherung, wenn ihre Prüfsumme stimmt; sonst None."""
+    if read_checksum(snapshot) != file_checksum(snapshot):
+        return None
+    try:
+        with open(snapshot, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def load_json(filename, directory=None):
+    """
+    Lädt eine JSON-Datendatei. Ist sie beschädigt, wird sie als <datei>.defekt-<zeit>
+    beiseitegelegt und die neueste intakte Sicherung zurückgespielt.
+    Gibt (daten, wiederhergestellt_aus oder None) zurück; FileNotFoundError wird
+    durchgereicht. Ohne intakte Sicherung: DataCorruptedError, die Datei bleibt unangetastet.
+    """
+    try:
+        with open(filename, 'r', encoding='utf-8') as f:
+            return json.load(f), None
+    except ValueError as e: # JSONDecodeError und UnicodeDecodeError
+        error = e
+
+    directory = directory or backup_dir_for(filename)
+    for snapshot in reversed(list_snapshots(filename, directory)):
+        data = _load_snapshot(snapshot)
+        if data is None:
+            continue
+        corrupt = f"{filename}.defekt-{time.strftime('%Y%m%d-%H%M%S')}"
+        os.replace(filename, corrupt)
+        tmp_filename = f"{filename}.tmp"
+        shutil.copy2(snapshot, tmp_filename)
+        os.replace(tmp_filename, filename)
+        _write_checksum(filename, read_checksum(snapshot))
+        print(f"Datendatei beschädigt ({error}); wiederhergestellt aus {snapshot}, "
+              f"die beschädigte Datei liegt unter {corrupt}.")
+        return data, snapshot
+    raise DataCorruptedError(f"Die Datendatei {filename} ist beschädigt ({error}) und es gibt keine intakte Sicherung "
+                             f"in {directory}. Die Datei wurde nicht verändert.")
+
+
+# --- Prüfung der Inhalte ---
+
+NUMERIC_SM_KEYS = ("next_review_at", "last_review_at", "consecutive_good", "interval", "ease", "reps",
+                   "stability", "difficulty")
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and value == value
+
+
+def check_sm_data(sm_data):
+    """Beschreibungen der Fehler in den Lerndaten einer Karte (leer, wenn alles stimmt)."""
+    if not isinstance(sm_data, dict):
+        return [f"sm_data ist kein Objekt ({type(sm_data).__name__})"]
+    problems = []
+    status = sm_data.get("status")
+    if status is not None and status not in constants.STATUS_INTERVALS:
+        problems.append(f"unbekannter Status '{status}'")
+    for key in NUMERIC_SM_KEYS:
+        if key in sm_data and sm_data[key] is not None and not _is_number(sm_data[key]):
+            problems.append(f"{key} ist keine Zahl ({sm_data[key]!r})")
+    return problems
+
+
+def verify(data, check_images=True):
+    """
+    Prüft die geladene Sammlung und gibt Auffälligkeiten als (art, ort, beschreibung)
+    zurück: fehlende Bilder, fehlerhafte Lerndaten und Verläufe, doppelte IDs.
+    """
+    issues, seen_ids, image_cache = [], set(), {}
+    for subject_id, subject in data.items():
+        if subject_id == "settings":
+            continue
+        if not isinstance(subject, dict):
+            issues.append(("struktur", subject_id, "Fach ist kein Objekt"))
+            continue
+        for set_id, set_data in subject.get("sets", {}).items():
+            if not isinstance(set_data, dict):
+                issues.append(("struktur", f"{subject.get('name')}/{set_id}", "Set ist kein Objekt"))
+                continue
+            for position, task in enumerate(set_data.get("tasks", [])):
+                where = f"{subject.get('name')}/{set_data.get('name')} #{position + 1}"
+                if not isinstance(task, dict):
+                    issues.append(("struktur", where, "Aufgabe ist kein Objekt"))
+                    continue
+                task_id = task.get("id")
+                if not task_id:
+                    issues.append(("id", where, "Aufgabe ohne ID"))
+                elif task_id in seen_ids:
+                    issues.append(("id", where, f"doppelte Aufgaben-ID {task_id}"))
+                seen_ids.add(task_id)
+                for problem in check_sm_data(task.get("sm_data", {})):
+                    issues.append(("sm_data", where, problem))
+                history = task.get("history", [])
+                if not isinstance(history, list) or any(not isinstance(h, dict) or not _is_number(h.get("timestamp"))
+                                                        for h in history):
+                    issues.append(("verlauf", where, "fehlerhafte Verlaufseinträge"))
+                if check_images:
+                    images = list(task.get("bilder_aufgabe", []))
+                    for subtask in task.get("unteraufgaben", []):
+                        if isinstance(subtask, dict):
+                            images.extend(subtask.get("bilder_loesung", []))
+                    for path in images:
+                        if not path:
+                            continue # Leere Einträge stehen für "kein Bild"
+                        if path not in image_cache:
+                            image_cache[path] = os.path.isfile(path)
+                        if not image_cache[path]:
+                            issues.append(("bild", where, f"Bild fehlt: {path}"))
+    return issues
+
+
+def summarize(issues, limit=10):
+    """Kurzer Bericht für die Konsole."""
+    if not issues:
+        return "Datenprüfung: keine Auffälligkeiten."
+    counts = {}
+    for kind, _, _ in issues:
+        counts[kind] = counts.get(kind, 0) + 1
+    lines = [f"Datenprüfung: {len(issues)} Auffälligkeiten ("
+             + ", ".join(f"{kind}: {n}" for kind, n in sorted(counts.items())) + ")"]
+    lines.extend(f"  {where}: {message}" for _, where, message in issues[:limit])
+    if len(issues) > limit:
+        lines.append(f"  ... und {len(issues) - limit} weitere")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prüft die Datendatei und listet ihre Sicherungen auf.")
+    parser.add_argument("--file", default=constants.DATA_FILE, help="Pfad zur Datendatei")
+    parser.add_argument("--all", action="store_true", help="Alle Auffälligkeiten ausgeben")
+    args = parser.parse_args()
+
+    checksum = read_checksum(args.file)
+    if checksum is None:
+        print("Keine Prüfsumme gespeichert.")
+    elif checksum != file_checksum(args.file):
+        print("Warnung: Die Prüfsumme passt nicht zum Inhalt (Datei außerhalb der Anwendung geändert?).")
+    data, _ = load_json(args.file)
+    issues = verify(data)
+    print(summarize(issues, limit=len(issues) if args.all else 10))
+    snapshots = list_snapshots(args.file)
+    print(f"{len(snapshots)} Sicherungen in {backup_dir_for(args.file)}" + (f", neueste: {snapshots[-1]}" if snapshots else ""))
+
+
+if __name__ == "__main__":
+    main()
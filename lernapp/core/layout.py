@@ -0,0 +1,73 @@
+"""
+Vorab zerlegtes Layout der Kartentexte.
+
+Ein Text wird einmal (beim Speichern) in Zeilen aus Text- und Formel-Läufen
+zerlegt und an der Aufgabe unter 'layout' abgelegt, geschlüsselt nach einem
+Hash des Textes. Die Anzeige läuft danach nur noch über die fertigen Läufe.
+
+Layout eines Textes:  [[["t", "Text "], ["f", "x^2"]], [["t", "zweite Zeile"]]]
+"""
+import hashlib
+import re
+
+TEXT = "t"
+FORMULA = "f"
+_FORMULA_SPLIT = re.compile(r'(\$.*?\$)')
+
+
+def content_hash(text):
+    return hashlib.sha1((text or "").encode('utf-8')).hexdigest()[:16]
+
+
+def parse_layout(text):
+    """Zerlegt einen Text in Zeilen aus Text- und Formel-Läufen ($...$)."""
+    lines = []
+    # Formeln reichen nie über einen Zeilenumbruch hinaus
+    for line in (text or "").split('\n'):
+        runs = []
+        for part in _FORMULA_SPLIT.split(line):
+            if len(part) > 1 and part.startswith('$') and part.endswith('$'):
+                runs.append([FORMULA, part[1:-1]])
+            elif part:
+                runs.append([TEXT, part])
+        lines.append(runs)
+    return lines
+
+
+def task_texts(task):
+    """Alle angezeigten Texte einer Karte: Beschreibung, Fragen und Lösungen."""
+    texts = [task.get('beschreibung', '')]
+    for subtask in task.get('unteraufgaben', []):
+        texts.extend((subtask.get('frage', ''), subtask.get('loesung', '')))
+    return texts
+
+
+def build_task_layout(task):
+    """Erzeugt den Layout-Cache einer Karte neu; veraltete Einträge werden verworfen."""
+    old_cache = task.get('layout') or {}
+    cache = {}
+    for text in task_texts(task):
+        key = content_hash(text)
+        if key not in cache:
+            cache[key] = old_cache.get(key) or parse_layout(text)
+    task['layout'] = cache
+    return cache
+
+
+def layout_for(task, text):
+    """
+    Liefert das Layout eines Textes der Karte. Fehlt es (z.B. bei Karten, die vor
+    dem Cache gespeichert wurden), wird es einmal erzeugt und an der Karte abgelegt.
+    """
+    key = content_hash(text)
+    cache = task.setdefault('layout', {})
+    lines = cache.get(key)
+    if lines is None:
+        lines = cache[key] = parse_layout(text)
+    return lines
+
+
+def formulas_in(task):
+    """Alle Formeln einer Karte aus dem Layout-Cache."""
+    return [value for text in task_texts(task) for line in layout_for(task, text)
+            for kind, value in line if kind == FORMULA]
@@ -0,0 +1,107 @@
+"""
+Speicherdiagnose für lange Sitzungen.
+
+Zählt lebende Objekte ausgewählter Typen nach Besitzer, vergleicht
+tracemalloc-Snapshots mit dem ersten Snapshot und meldet Zähler, die über
+mehrere Messungen hinweg nur wachsen (Verdacht auf ein Leck).
+"""
+import gc
+import time
+import tracemalloc
+from collections import Counter, deque
+
+TRACEMALLOC_FRAMES = 5
+GROWTH_WINDOW = 5
+
+
+def _owner_name(obj, ignore=(), depth=3):
+    """
+    Name der Klasse, die obj (direkt oder über Listen/Dicts) referenziert.
+    ignore enthält die ids von Containern, die nur die Diagnose selbst hält.
+    Nur für die Diagnose gedacht: gc.get_referrers ist langsam.
+    """
+    frontier = [obj]
+    seen = {id(obj), id(frontier), *ignore}
+    for _ in range(depth):
+        next_frontier = []
+        seen.add(id(next_frontier))
+        for item in frontier:
+            for referrer in gc.get_referrers(item):
+                if id(referrer) in seen:
+                    continue
+                seen.add(id(referrer))
+                if isinstance(referrer, (dict, list, tuple, set, deque)):
+                    next_frontier.append(referrer)
+                elif hasattr(referrer, "__dict__") and not isinstance(referrer, type) and not callable(referrer):
+                    return type(referrer).__name__
+        frontier = next_frontier
+    return "?"
+
+
+def count_instances(type_names, by_owner=False):
+    """
+    Zählt lebende Objekte, deren Klassenname in type_names steht. Mit
+    by_owner=True wird zusätzlich nach besitzender Klasse aufgeschlüsselt
+    ('PhotoImage@CardView'). Die Typen werden über den Namen erkannt, damit die
+    Diagnose keine Module (PIL, matplotlib) lädt.
+    """
+    counts = Counter()
+    matches = [obj for obj in gc.get_objects() if type(obj).__name__ in type_names]
+    for obj in matches:
+        name = type(obj).__name__
+        counts[f"{name}@{_owner_name(obj, ignore=(id(matches),))}" if by_owner else name] += 1
+    return counts
+
+
+class MemoryMonitor:
+    """Sammelt Messreihen von Zählern und den tracemalloc-Verlauf."""
+    def __init__(self, window=GROWTH_WINDOW):
+        self.window = window
+        self.samples = deque(maxlen=window + 1)
+        self._baseline = None
+
+    def start_tracemalloc(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+        self._baseline = tracemalloc.take_snapshot()
+
+    def sample(self, counts):
+        """Speichert eine Messung (dict Name -> Anzahl) und gibt die wachsenden Zähler zurück."""
+        self.samples.append((time.time(), dict(counts)))
+        return self.growing()
+
+    def growing(self):
+        """Zähler, die in jeder der letzten 'window' Messungen gestiegen sind."""
+        if len(self.samples) <= self.window:
+            return {}
+        series = [counts for _, counts in self.samples]
+        growing = {}
+        for name in series[-1]:
+            values = [counts.get(name, 0) for counts in series]
+            if all(b > a for a, b in zip(values, values[1:])):
+                growing[name] = (values[0], values[-1])
+        return growing
+
+    def top_allocations(self, limit=10):
+        """Größter Speicherzuwachs seit start_tracemalloc(), nach Quelltextzeile."""
+        if self._baseline is None or not tracemalloc.is_tracing():
+            return []
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ))
+        return snapshot.compare_to(self._baseline, "lineno")[:limit]
+
+    def report(self, counts, limit=10):
+        """Textbericht einer Messung mit markierten wachsenden Zählern."""
+        growing = self.sample(counts)
+        current, peak = tracemalloc.get_traced_memory() if tracemalloc.is_tracing() else (0, 0)
+        lines = [f"--- Speicherdiagnose {time.strftime('%H:%M:%S')}: "
+                 f"{current / 2**20:.1f} MiB (Spitze {peak / 2**20:.1f} MiB) ---"]
+        for name, count in sorted(counts.items()):
+            marker = f"  <-- wächst ({growing[name][0]} -> {growing[name][1]})" if name in growing else ""
+            lines.append(f"  {name:<44}{count:>7}{marker}")
+        for stat in self.top_allocations(limit):
+            lines.append(f"  {stat.size_diff / 1024:+10.1f} KiB  {stat.traceback[0]}")
+        return "\n".join(lines)
@@ -0,0 +1,142 @@
+"""
+Versionierte Datenmigrationen.
+
+Jeder Migrationsschritt hebt die Sammlung von einer Schemaversion auf die
+nächste (settings["data_version"]). Die Schritte laufen der Reihe nach und
+Set für Set direkt auf den geladenen Daten, ohne Kopie der ganzen Sammlung.
+Zwischendurch wird höchstens alle CHECKPOINT_INTERVAL Sekunden gespeichert;
+welche Sets der laufende Schritt schon erledigt hat, steht dabei in
+settings["migration"]. Wird die Migration unterbrochen, setzt der nächste
+Start bei den übrigen Sets fort.
+
+Neue Schritte werden mit @migration(version, beschreibung) registriert und
+erhalten (subject_id, set_id, set_data); sie müssen wiederholbar sein, da ein
+Set nach einem Absturz zwischen zwei Zwischenständen erneut bearbeitet wird.
+
+Aufruf:  python -m lernapp.core.migrations [--file lernkarten.json] [--check]
+"""
+import argparse
+import time
+from collections import namedtuple
+
+import constants
+
+CHECKPOINT_INTERVAL = 5.0 # Sekunden zwischen zwei Zwischenständen
+LEGACY_VERSION = 1 # Sammlungen ohne data_version
+
+Migration = namedtuple("Migration", "version description migrate_set")
+MIGRATIONS = []
+
+
+def migration(version, description):
+    """Registriert einen Migrationsschritt auf die Schemaversion version."""
+    def register(migrate_set):
+        MIGRATIONS.append(Migration(version, description, migrate_set))
+        MIGRATIONS.sort(key=lambda step: step.version)
+        return migrate_set
+    return register
+
+
+@migration(2, "Bilderlisten statt Einzelbilder")
+def _images_as_lists(subject_id, set_id, set_data):
+    for task in set_data.get("tasks", []):
+        if not isinstance(task, dict): continue
+        if 'bilder_aufgabe' not in task and 'bild_aufgabe' in task:
+            single_image = task.pop('bild_aufgabe', None)
+            task['bilder_aufgabe'] = [single_image] if single_image else []
+        for subtask in task.get("unteraufgaben", []):
+            if not isinstance(subtask, dict): continue
+            if 'bilder_loesung' not in subtask and 'bild_loesung' in subtask:
+                single_image = subtask.pop('bild_loesung')
+                subtask['bilder_loesung'] = [single_image] if single_image else []
+
+
+def current_version():
+    return MIGRATIONS[-1].version if MIGRATIONS else LEGACY_VERSION
+
+
+def data_version(data):
+    return data.get("settings", {}).get("data_version", LEGACY_VERSION)
+
+
+def _sets(data):
+    for subject_id, subject_data in data.items():
+        if subject_id == "settings" or not isinstance(subject_data, dict):
+            continue
+        for set_id, set_data in subject_data.get("sets", {}).items():
+            if isinstance(set_data, dict):
+                yield subject_id, set_id, set_data
+
+
+def pending_steps(data):
+    """Die noch auszuführenden Schritte in ihrer Reihenfolge."""
+    version = data_version(data)
+    return [step for step in MIGRATIONS if step.version > version]
+
+
+def migrate_data(data, progress=None, checkpoint=None, checkpoint_interval=CHECKPOINT_INTERVAL):
+    """
+    Führt alle ausstehenden Schritte auf data aus (in place). progress(erledigt, gesamt)
+    zählt Sets über alle Schritte; checkpoint(data) speichert einen Zwischenstand und
+    wird auch nach jedem Schritt aufgerufen. Gibt die Anzahl der Schritte zurück.
+    """
+    steps = pending_steps(data)
+    if not steps:
+        return 0
+    settings = data.setdefault("settings", {})
+    set_keys = [(subject_id, set_id) for subject_id, set_id, _ in _sets(data)]
+    total, done = len(steps) * len(set_keys), 0
+    last_checkpoint = time.monotonic()
+
+    for step in steps:
+        print(f"Datenmigration auf Version {step.version}: {step.description}")
+        state = settings.get("migration")
+        if not state or state.get("version") != step.version:
+            state = settings["migration"] = {"version": step.version, "done": []}
+        finished = {tuple(key) for key in state["done"]}
+        for subject_id, set_id in set_keys:
+            if (subject_id, set_id) not in finished:
+                step.migrate_set(subject_id, set_id, data[subject_id]["sets"][set_id])
+                state["done"].append([subject_id, set_id])
+                if checkpoint and time.monotonic() - last_checkpoint >= checkpoint_interval:
+                    checkpoint(data)
+                    last_checkpoint = time.monotonic()
+            done += 1
+            if progress:
+                progress(done, total)
+        settings["data_version"] = step.version
+        del settings["migration"]
+        if checkpoint:
+            checkpoint(data)
+            last_checkpoint = time.monotonic()
+    return len(steps)
+
+
+def main():
+    from . import profiles
+    from .store import Store
+
+    parser = argparse.ArgumentParser(description="Führt ausstehende Datenmigrationen vorab aus.")
+    parser.add_argument("--file", default=constants.DATA_FILE, help="Pfad zur Datendatei")
+    parser.add_argument("--check", action="store_true", help="Nur anzeigen, welche Schritte ausstehen")
+    parser.add_argument("--learner", default=None, help="Lernprofil, dessen Fortschritt mitgespeichert wird")
+    args = parser.parse_args()
+
+    if args.check:
+        from .integrity import load_json
+        data, _ = load_json(args.file)
+        steps = pending_steps(data)
+        print(f"Schemaversion {data_version(data)}, aktuell {current_version()}.")
+        for step in steps:
+            print(f"  ausstehend: Version {step.version} ({step.description})")
+        return
+
+    def report(done, total):
+        print(f"\r{done}/{total} Sets", end="", flush=True)
+    profiles.check_cli_learner(parser, args.learner)
+    store = Store(args.file, profile=args.learner, migration_progress=report)
+    print(f"\nSchemaversion {data_version(store.data)}.")
+
+
+if __name__ == "__main__":
+    main()
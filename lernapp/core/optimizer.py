@@ -0,0 +1,231 @@
+"""
+Offline-Optimierer für die Lernintervalle.
+
+Passt aus den gespeicherten Bewertungen ('history') eine Vergessenskurve pro
+Lernstatus an und leitet daraus Intervalle für eine Ziel-Erinnerungsrate ab.
+Die Auswertung der Verläufe wird auf einen Prozess-Pool verteilt.
+
+Aufruf:  python -m lernapp.core.optimizer [--per-subject] [--retention 0.9] [--dry-run]
+"""
+import argparse
+import os
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import constants
+from . import scheduler
+
+DAY = scheduler.DAY
+# Wiederholungen in kürzerem Abstand (z.B. innerhalb einer Sitzung) werden nicht ausgewertet
+MIN_ELAPSED_DAYS = 0.5
+MIN_SAMPLES = 30
+RETENTION_TARGETS = [0.75, 0.8, 0.85, 0.9, 0.95]
+
+# Buckets: Lernstatus nach der vorherigen Wiederholung sowie die allererste Bewertung
+STATUS_BUCKETS = ['bad', 'ok', 'good', 'mastered', 'perfect']
+FIRST_BUCKETS = ['bad', 'ok', 'good', 'perfect']
+_BUCKET_INDEX = {status: i for i, status in enumerate(STATUS_BUCKETS)}
+_NUM_BUCKETS = len(STATUS_BUCKETS) + len(FIRST_BUCKETS)
+
+# Logarithmische Klassen für den Abstand zwischen zwei Wiederholungen (in Tagen)
+_BIN_EDGES = np.geomspace(MIN_ELAPSED_DAYS, 3650, 49)
+_BIN_CENTERS = np.sqrt(_BIN_EDGES[:-1] * _BIN_EDGES[1:])
+_STABILITY_GRID = np.geomspace(0.05, 3650, 400)
+
+
+def _classic_status(previous_status, quality):
+    if quality == 'good' and previous_status == 'good':
+        return 'mastered'
+    return quality
+
+
+def _count_reviews(histories):
+    """
+    Wertet eine Liste von Verläufen aus (läuft im Worker-Prozess). Liefert ein Array
+    [Bucket, Abstandsklasse, (Wiederholungen, erinnert)], das sich über Worker addieren lässt.
+    """
+    elapsed, buckets, recalled = [], [], []
+    for history in histories:
+        status, previous_ts, first = None, None, True
+        for entry in sorted(history, key=lambda e: e.get('timestamp', 0)):
+            quality, ts = entry.get('quality'), entry.get('timestamp')
+            if quality not in scheduler.FSRSScheduler.RATINGS or ts is None:
+                continue
+            if previous_ts is not None:
+                days = (ts - previous_ts) / DAY
+                if days >= MIN_ELAPSED_DAYS:
+                    hit = quality != 'bad'
+                    elapsed.append(days); buckets.append(_BUCKET_INDEX[status]); recalled.append(hit)
+                    if first:
+                        elapsed.append(days); buckets.append(len(STATUS_BUCKETS) + FIRST_BUCKETS.index(first_quality)); recalled.append(hit)
+                first = False
+            else:
+                first_quality = quality
+            status = _classic_status(status, quality)
+            previous_ts = ts
+
+    counts = np.zeros((_NUM_BUCKETS, len(_BIN_CENTERS), 2))
+    if elapsed:
+        bins = np.clip(np.searchsorted(_BIN_EDGES, np.asarray(elapsed), side='right') - 1, 0, len(_BIN_CENTERS) - 1)
+        buckets = np.asarray(buckets)
+        np.add.at(counts, (buckets, bins, 0), 1)
+        np.add.at(counts, (buckets, bins, 1), np.asarray(recalled, dtype=float))
+    return counts
+
+
+def _fit_stability(counts):
+    """Maximum-Likelihood-Schätzung der Stabilität für die Vergessenskurve (1 + t/9S)^-1."""
+    total, hits = counts[:, 0], counts[:, 1]
+    if total.sum() < MIN_SAMPLES:
+        return None
+    r = (1 + _BIN_CENTERS[:, None] / (9 * _STABILITY_GRID[None, :])) ** -1
+    r = np.clip(r, 1e-6, 1 - 1e-6)
+    log_likelihood = (hits[:, None] * np.log(r) + (total - hits)[:, None] * np.log(1 - r)).sum(axis=0)
+    return float(_STABILITY_GRID[np.argmax(log_likelihood)])
+
+
+def _interval_for(stability, retention):
+    return max(1, round(9 * stability * (1 / retention - 1)))
+
+
+def _fit_scope(counts, status_counts, target_retention):
+    """Leitet aus den summierten Zählern Parameter und Zielkonflikte für einen Bereich ab."""
+    stability = {status: _fit_stability(counts[i]) for i, status in enumerate(STATUS_BUCKETS)}
+    first_stability = {q: _fit_stability(counts[len(STATUS_BUCKETS) + i]) for i, q in enumerate(FIRST_BUCKETS)}
+
+    def intervals_for(retention):
+        intervals = dict(constants.STATUS_INTERVALS)
+        for status, s in stability.items():
+            if s is not None and status != 'bad': # Schlechte Karten bleiben sofort fällig
+                intervals[status] = _interval_for(s, retention)
+        return intervals
+
+    tradeoffs = []
+    for retention in sorted(set(RETENTION_TARGETS + [target_retention])):
+        intervals = intervals_for(retention)
+        reviews_per_day = sum(n / max(intervals.get(status, 30), 1) for status, n in status_counts.items())
+        tradeoffs.append({"retention": retention, "intervals": intervals, "reviews_per_day": round(reviews_per_day, 1)})
+
+    weights = list(scheduler.FSRSScheduler.DEFAULT_WEIGHTS)
+    for i, quality in enumerate(FIRST_BUCKETS):
+        if first_stability[quality] is not None:
+            weights[i] = round(first_stability[quality], 4)
+
+    return {
+        "reviews": int(counts[:len(STATUS_BUCKETS), :, 0].sum()),
+        "stability": stability,
+        "params": {
+            "classic": {"intervals": intervals_for(target_retention)},
+            "fsrs": {"weights": weights, "retention": target_retention},
+        },
+        "tradeoffs": tradeoffs,
+    }
+
+
+def _collect(data, per_subject):
+    """Sammelt Verläufe und Statuszähler je Bereich (Fach oder gesamte Sammlung)."""
+    histories, status_counts = {}, {}
+    for subject_id, subject_data in data.items():
+        if subject_id == "settings" or not isinstance(subject_data, dict): continue
+        scope = subject_id if per_subject else "user"
+        for set_data in subject_data.get("sets", {}).values():
+            for task in set_data.get("tasks", []):
+                if task.get('history'):
+                    histories.setdefault(scope, []).append(task['history'])
+                status = task.get('sm_data', {}).get('status', 'new')
+                status_counts.setdefault(scope, Counter())[status] += 1
+    return histories, status_counts
+
+
+def optimise(data, per_subject=False, target_retention=0.9, workers=None):
+    """
+    Passt die Parameter für die gesamte Sammlung ("user") oder je Fach an.
+    Gibt einen Bericht {Bereich: Ergebnis} zurück, ohne die Daten zu verändern.
+    """
+    histories, status_counts = _collect(data, per_subject)
+    workers = workers or os.cpu_count() or 1
+
+    # Verläufe in Pakete aufteilen; jedes Paket wird in einem eigenen Prozess ausgewertet
+    jobs = []
+    for scope, scope_histories in histories.items():
+        size = max(1, -(-len(scope_histories) // (workers * 4)))
+        jobs.extend((scope, scope_histories[i:i + size]) for i in range(0, len(scope_histories), size))
+
+    total_entries = sum(len(h) for hs in histories.values() for h in hs)
+    counts = {scope: np.zeros((_NUM_BUCKETS, len(_BIN_CENTERS), 2)) for scope in histories}
+    if workers > 1 and total_entries > 20000:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for (scope, _), result in zip(jobs, pool.map(_count_reviews, [chunk for _, chunk in jobs])):
+                counts[scope] += result
+    else:
+        for scope, chunk in jobs:
+            counts[scope] += _count_reviews(chunk)
+
+    return {scope: _fit_scope(counts[scope], status_counts.get(scope, Counter()), target_retention)
+            for scope in counts}
+
+
+def apply_report(data, report):
+    """Schreibt die angepassten Parameter in die Settings."""
+    settings = data.setdefault("settings", {})
+    for scope, result in report.items():
+        if scope == "user":
+            settings.setdefault("scheduler_params", {}).update(result["params"])
+        else:
+            settings.setdefault("subject_scheduler_params", {}).setdefault(scope, {}).update(result["params"])
+
+
+def format_report(data, report):
+    """Formatiert den Bericht mit den Zielkonflikten Erinnerungsrate vs. Aufwand."""
+    lines = []
+    for scope, result in report.items():
+        name = "Gesamte Sammlung" if scope == "user" else data.get(scope, {}).get("name", scope)
+        lines.append(f"== {name} ({result['reviews']} ausgewertete Wiederholungen)")
+        fitted = {s: round(v, 2) for s, v in result["stability"].items() if v is not None}
+        lines.append(f"   Stabilität in Tagen: {fitted or 'zu wenige Daten'}")
+        for row in result["tradeoffs"]:
+            intervals = ", ".join(f"{s}={row['intervals'][s]}" for s in STATUS_BUCKETS)
+            lines.append(f"   Ziel {row['retention']:.0%}: {row['reviews_per_day']:>7} Wdh./Tag  ({intervals})")
+    return "\n".join(lines)
+
+
+def main():
+    from .store import Store
+    from .index import DueQueue
+    from . import batch_scheduler, profiles
+
+    parser = argparse.ArgumentParser(description="Passt die Lernintervalle an den Lernverlauf an.")
+    parser.add_argument("--file", default=constants.DATA_FILE, help="Pfad zur Datendatei")
+    parser.add_argument("--per-subject", action="store_true", help="Parameter je Fach statt für die gesamte Sammlung anpassen")
+    parser.add_argument("--retention", type=float, default=0.9, help="Ziel-Erinnerungsrate (0-1)")
+    parser.add_argument("--workers", type=int, default=None, help="Anzahl der Worker-Prozesse")
+    parser.add_argument("--dry-run", action="store_true", help="Nur den Bericht ausgeben, nichts speichern")
+    parser.add_argument("--learner", default=None, help="Lernprofil, dessen Verlauf ausgewertet wird")
+    args = parser.parse_args()
+    profiles.check_cli_learner(parser, args.learner)
+
+    # Über den Store, damit Verlauf und Parameter eines Profils gelesen und dort gespeichert werden
+    store = Store(args.file, profile=args.learner)
+    data = store.data
+
+    start = time.perf_counter()
+    report = optimise(data, args.per_subject, args.retention, args.workers)
+    print(format_report(data, report))
+    print(f"Optimierung in {time.perf_counter() - start:.2f} s abgeschlossen.")
+
+    if not args.dry_run:
+        apply_report(data, report)
+        batch_scheduler.reschedule_collection(data)
+        # Die globale Warteschlange mit den neuen Fälligkeiten neu aufbauen
+        data.get("settings", {}).pop("due_queue", None)
+        store.due_queue = DueQueue(data, store.locator)
+        store.mark_changed()
+        store.save()
+        print("Parameter gespeichert.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""
+Lernprofile: mehrere Lernende auf denselben Karteninhalten.
+
+Die Datendatei enthält dann nur noch die Inhalte; der Lernfortschritt jedes
+Profils (sm_data und Verlauf je Karte) liegt kompakt in einer eigenen Datei
+im Ordner PROFILE_DIR, zusammen mit den Einstellungen, die pro Person gelten
+(Warteschlange, Theme, angepasste Scheduler-Parameter). Beim Laden wird der
+Fortschritt in die Karten eingetragen, sodass der übrige Code unverändert mit
+task['sm_data'] und task['history'] arbeitet; beim Speichern wird er wieder
+herausgelöst. Ohne Profile bleibt alles wie bisher in der Datendatei.
+"""
+import json
+import os
+import re
+
+import constants
+from . import integrity
+
+PROFILE_VERSION = 1
+PROGRESS_KEYS = ("sm_data", "history")
+# Einstellungen, die jeder Lernende für sich hat
+PROFILE_SETTINGS = ("due_queue", "theme", "scheduler_params", "subject_scheduler_params")
+
+
+PROFILE_NAME = re.compile(r"\w[\w \-]{0,63}")
+
+
+def _slug(name):
+    return re.sub(r"[^\w\-]+", "_", name.strip()).strip("_") or "profil"
+
+
+def profile_path(name, suffix=".json", directory=constants.PROFILE_DIR):
+    """Datei eines Profils; suffix wählt Fortschritt, Antwortprotokoll oder Sitzung."""
+    return os.path.join(directory, _slug(name) + suffix)
+
+
+def list_profiles(directory=constants.PROFILE_DIR):
+    """Namen aller Profile, alphabetisch. Eine leere Liste bedeutet: keine Profile."""
+    names = []
+    try:
+        entries = os.listdir(directory)
+    except FileNotFoundError:
+        return []
+    for entry in entries:
+        if not entry.endswith(".json") or entry.endswith((constants.PROFILE_SESSION_SUFFIX, constants.PROFILE_SYNC_SUFFIX)):
+            continue
+        try:
+            with open(os.path.join(directory, entry), 'r', encoding='utf-8') as f:
+                names.append(json.load(f).get("name") or entry[:-5])
+        except (OSError, json.JSONDecodeError, AttributeError):
+            continue
+    return sorted(names, key=str.lower)
+
+
+def check_cli_learner(parser, learner, directory=constants.PROFILE_DIR):
+    """
+    Für Kommandozeilenwerkzeuge: Gibt es Profile, liegt der Fortschritt nicht mehr in
+    der Datendatei und ohne --learner würde ohne Verlauf gearbeitet.
+    """
+    names = list_profiles(directory)
+    if learner is None and names:
+        parser.error(f"Es gibt Lernprofile ({', '.join(names)}); bitte eines mit --learner angeben.")
+    if learner is not None and learner not in names:
+        parser.error(f"Das Lernprofil '{learner}' existiert nicht.")
+
+
+def _tasks(data):
+    for subject_id, subject_data in data.items():
+        if subject_id == "settings" or not isinstance(subject_data, dict):
+            continue
+        for set_data in subject_data.get("sets", {}).values():
+            if isinstance(set_data, dict):
+                yield from (t for t in set_data.get("tasks", []) if isinstance(t, dict))
+
+
+def _pack_history(history):
+    """Verlauf als [[zeitstempel, bewertung], ...] statt Dicts mit Schlüsselnamen."""
+    return [[entry.get("timestamp"), entry.get("quality")] for entry in history]
+
+
+def _unpack_history(packed):
+    return [{"timestamp": ts, "quality": quality} for ts, quality in packed]
+
+
+def extract_progress(data):
+    """Fortschritt aller Karten als {task_id: [sm_data, verlauf]}; Karten ohne Fortschritt fehlen."""
+    progress = {}
+    for task in _tasks(data):
+        sm_data, history = task.get("sm_data") or {}, task.get("history") or []
+        if task.get("id") and (sm_data or history):
+            progress[task["id"]] = [sm_data, _pack_history(history)]
+    return progress
+
+
+def apply_progress(data, progress):
+    """Trägt den Fortschritt eines Profils in die Karten ein (Karten ohne Eintrag gelten als neu)."""
+    for task in _tasks(data):
+        sm_data, history = progress.get(task.get("id"), ({}, []))
+        task["sm_data"] = sm_data
+        task["history"] = _unpack_history(history)
+
+
+def content_only(data):
+    """
+    Sicht auf die Sammlung ohne Fortschritt und ohne persönliche Einstellungen.
+    Es werden nur die Dicts von Fächern, Sets und Aufgaben flach kopiert.
+    """
+    content = {}
+    for key, value in data.items():
+        if key == "settings":
+            content[key] = {k: v for k, v in value.items() if k not in PROFILE_SETTINGS}
+        elif isinstance(value, dict):
+            sets = {}
+            for set_id, set_data in value.get("sets", {}).items():
+                tasks = [{k: v for k, v in task.items() if k not in PROGRESS_KEYS} for task in set_data.get("tasks", [])]
+                sets[set_id] = dict(set_data, tasks=tasks)
+            content[key] = dict(value, sets=sets)
+        else:
+            content[key] = value
+    return content
+
+
+def save_profile(name, data, directory=constants.PROFILE_DIR):
+    """Schreibt Fortschritt und persönliche Einstellungen eines Profils kompakt und atomar."""
+    os.makedirs(directory, exist_ok=True)
+    settings = data.get("settings", {})
+    profile = {
+        "version": PROFILE_VERSION,
+        "name": name,
+        "settings": {key: settings[key] for key in PROFILE_SETTINGS if key in settings},
+        "progress": extract_progress(data),
+    }
+    integrity.write_json_atomic(profile_path(name, directory=directory), profile, indent=None, separators=(',', ':'))
+
+
+def create_profile(name, data=None, directory=constants.PROFILE_DIR):
+    """
+    Legt ein Profil an. Mit data übernimmt es deren Fortschritt (beim ersten
+    Profil der bisherige Fortschritt der Datendatei), sonst beginnt es neu.
+    """
+    if not name.strip():
+        raise ValueError("Der Profilname darf nicht leer sein.")
+    if not PROFILE_NAME.fullmatch(name.strip()):
+        raise ValueError("Der Profilname darf nur Buchstaben, Ziffern, Leerzeichen, '-' und '_' enthalten "
+                         "(höchstens 64 Zeichen).")
+    if os.path.exists(profile_path(name, directory=directory)):
+        raise ValueError(f"Das Profil '{name}' existiert bereits.")
+    save_profile(name.strip(), data if data is not None else {}, directory)
+
+
+def load_profile(name, data, directory=constants.PROFILE_DIR):
+    """
+    Lädt ein Profil in die Sammlung: Fortschritt in die Karten, persönliche
+    Einstellungen in die Settings. Ein neues Profil beginnt ohne Fortschritt.
+    """
+    try:
+        profile, _ = integrity.load_json(profile_path(name, directory=directory))
+    except FileNotFoundError:
+        profile = {}
+    settings = data.setdefault("settings", {})
+    for key in PROFILE_SETTINGS:
+        settings.pop(key, None)
+    settings.update(profile.get("settings", {}))
+    apply_progress(data, profile.get("progress", {}))
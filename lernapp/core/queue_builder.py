@@ -0,0 +1,44 @@
+import time
+
+import constants
+from . import scheduler
+
+
+def ensure_sm_data(tasks, now=None):
+    """Stellt sicher, dass alle Karten die notwendigen Lerndaten haben."""
+    now = time.time() if now is None else now
+    for task in tasks:
+        sm_data = task.setdefault('sm_data', {})
+        sm_data.setdefault('status', 'new')
+        sm_data.setdefault('next_review_at', now)
+        sm_data.setdefault('consecutive_good', 0)
+
+
+def due_tasks(tasks, now=None):
+    """Liefert alle fälligen Karten; gemeisterte Karten kommen nach Ablauf ihres Intervalls wieder."""
+    now = time.time() if now is None else now
+    ensure_sm_data(tasks, now)
+    return [t for t in tasks if scheduler.is_due(t, now)]
+
+
+def build_spaced_repetition_queue(tasks, session_size=None, now=None):
+    """Erstellt eine priorisierte Liste nur mit fälligen Karten."""
+    due = due_tasks(tasks, now)
+
+    # Sortiert fällige Karten nach ihrem Status (neue/schlechte zuerst), dann nach Fälligkeit
+    due.sort(key=lambda t: (constants.STATUS_INTERVALS.get(t['sm_data']['status'], 0), t['sm_data']['next_review_at']))
+
+    # Begrenzt die Sitzungsgröße, falls angegeben
+    return due[:session_size] if session_size else due
+
+
+def collect_session_tasks(store, subject_id=None, set_id=None, tag_query=None, review_due=False, session_size=None):
+    """
+    Liefert die Karten einer Lernsitzung als Liste von (subject_id, set_id, task):
+    aus der globalen Warteschlange, aus einer Tag-Anfrage oder aus einem Lernset.
+    """
+    if review_due:
+        return store.due_queue.pull_due(session_size)
+    if tag_query:
+        return store.tag_index.find_tasks(tag_query)
+    return [(subject_id, set_id, task) for task in store.get_tasks(subject_id, set_id)]
@@ -0,0 +1,235 @@
+"""
+Prozess-Pool zum Rendern von LaTeX-Formeln.
+
+matplotlib rendert rein CPU-gebunden und ist wegen des globalen Zustands nicht
+threadsicher. Die Formeln werden deshalb in Worker-Prozessen zu PNG-Bytes
+gerendert. Gleiche Formeln mit gleichem Stil werden nur einmal gerendert
+(Speicher-Cache, Cache-Verzeichnis auf der Platte und laufende Aufträge).
+
+Aufruf:  python -m lernapp.core.render_farm [--file lernkarten.json] [--workers N]
+"""
+import argparse
+import hashlib
+import io
+import multiprocessing
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+
+import constants
+
+FORMULA_PATTERN = re.compile(r'\$(.*?)\$')
+DEFAULT_STYLE = {"fontsize": 12, "dpi": 300, "fg": "black", "bg": "white"}
+
+
+def _normalize_formula(formula):
+    """Ersetzungen für eine bessere Kompatibilität mit mathtext."""
+    return formula.replace('\\le', '\\leq').replace('\\ge', '\\geq').replace('\\implies', '\\Rightarrow').replace('\\text', '\\mathrm')
+
+
+def render_png(formula, fontsize=12, dpi=300, fg='black', bg='white'):
+    """Rendert eine Formel zu PNG-Bytes. Gibt None zurück, wenn die Formel ungültig ist."""
+    # Eine direkt erzeugte Figure gehört nicht zu pyplot und muss nicht geschlossen werden
+    from matplotlib.figure import Figure
+    try:
+        fig = Figure(figsize=(4, 1), dpi=dpi, facecolor=bg)
+        fig.text(0, 0, f"${_normalize_formula(formula)}$", usetex=False, fontsize=fontsize, color=fg)
+        buf = io.BytesIO()
+        fig.savefig(buf, format='png', transparent=False, bbox_inches='tight', pad_inches=0.05, facecolor=bg)
+        return buf.getvalue()
+    except Exception as e:
+        print(f"Fehler beim Rendern von LaTeX: {formula}\n{e}")
+        return None
+
+
+def _render_job(job):
+    """Worker-Funktion für den Pool: (formula, style) -> PNG-Bytes oder None."""
+    formula, style = job
+    return render_png(formula, **dict(style))
+
+
+def style_for(fg, bg, fontsize=DEFAULT_STYLE["fontsize"], dpi=DEFAULT_STYLE["dpi"]):
+    """Erzeugt einen hashbaren Stil-Schlüssel für einen Auftrag."""
+    return (("bg", bg), ("dpi", dpi), ("fg", fg), ("fontsize", fontsize))
+
+
+def theme_style(theme_name):
+    """Stil einer Formel auf dem Hintergrund des angegebenen Themes."""
+    colors = constants.THEMES[theme_name]
+    return style_for(colors["fg"], colors["bg"])
+
+
+def cache_key(formula, style):
+    return hashlib.sha1(repr((formula, style)).encode('utf-8')).hexdigest()
+
+
+def extract_formulas(text):
+    """Liefert alle Formeln ($...$) eines Textes."""
+    return FORMULA_PATTERN.findall(text or "")
+
+
+def collect_formulas(data):
+    """Sammelt alle verschiedenen Formeln der gesamten Sammlung (fachübergreifend dedupliziert)."""
+    formulas = set()
+    for subject_id, subject_data in data.items():
+        if subject_id == "settings" or not isinstance(subject_data, dict):
+            continue
+        for set_data in subject_data.get("sets", {}).values():
+            for task in set_data.get("tasks", []):
+                formulas.update(extract_formulas(task.get("beschreibung")))
+                for subtask in task.get("unteraufgaben", []):
+                    formulas.update(extract_formulas(subtask.get("frage")))
+                    formulas.update(extract_formulas(subtask.get("loesung")))
+    formulas.discard("")
+    return formulas
+
+
+class RenderFarm:
+    """
+    Rendert (formula, style)-Aufträge in einem Prozess-Pool und liefert PNG-Bytes.
+    Ergebnisse werden im Speicher (LRU) und optional im cache_dir abgelegt.
+    """
+    def __init__(self, workers=None, cache_dir=constants.RENDER_CACHE_DIR, cache_size=512):
+        self.workers = workers or os.cpu_count() or 1
+        self.cache_dir = cache_dir
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._pending = {}
+        self._pool = None
+        # Die Callbacks der Futures laufen in einem Thread des Pools
+        self._lock = threading.Lock()
+        if cache_dir and not os.path.exists(cache_dir):
+            os.makedirs(cache_dir)
+
+    def _get_pool(self):
+        if self._pool is None:
+            # "spawn" statt fork: Die Tk-Anwendung hat Threads, deren Sperren ein Fork mitkopieren würde
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._pool
+
+    def _cache_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.png")
+
+    def _remember(self, key, png):
+        with self._lock:
+            self._cache[key] = png
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _lookup(self, key):
+        """Sucht ein Ergebnis im Speicher und anschließend auf der Platte."""
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return True, self._cache[key]
+        if self.cache_dir:
+            try:
+                with open(self._cache_path(key), 'rb') as f:
+                    png = f.read()
+                self._remember(key, png)
+                return True, png
+            except OSError:
+                pass
+        return False, None
+
+    def _store(self, key, png):
+        self._remember(key, png)
+        if self.cache_dir and png:
+            try:
+                with open(self._cache_path(key), 'wb') as f:
+                    f.write(png)
+            except OSError as e:
+                print(f"Formel konnte nicht zwischengespeichert werden: {e}")
+
+    def submit(self, formula, style=None):
+        """Plant einen Auftrag ein und gibt ein Future mit den PNG-Bytes zurück."""
+        style = style or style_for(DEFAULT_STYLE["fg"], DEFAULT_STYLE["bg"])
+        key = cache_key(formula, style)
+        found, png = self._lookup(key)
+        if found:
+            future = Future()
+            future.set_result(png)
+            return future
+        with self._lock:
+            if key in self._pending:
+                return self._pending[key]
+            future = self._get_pool().submit(_render_job, (formula, style))
+            self._pending[key] = future
+
+        def _done(f, key=key):
+            if not f.cancelled() and f.exception() is None:
+                self._store(key, f.result())
+            with self._lock:
+                self._pending.pop(key, None)
+        future.add_done_callback(_done)
+        return future
+
+    def render(self, formula, style=None):
+        """Rendert eine einzelne Formel und wartet auf das Ergebnis."""
+        return self.submit(formula, style).result()
+
+    def render_many(self, formulas, styles, progress=None):
+        """
+        Rendert alle Kombinationen aus Formeln und Stilen mit voller Auslastung des
+        Pools. Bereits vorhandene Ergebnisse werden übersprungen. Gibt die Anzahl
+        der neu gerenderten und der fehlerhaften Formeln zurück.
+        """
+        jobs, keys = [], []
+        for style in styles:
+            for formula in formulas:
+                key = cache_key(formula, style)
+                if not self._lookup(key)[0]:
+                    jobs.append((formula, style))
+                    keys.append(key)
+
+        failed = 0
+        chunksize = max(1, len(jobs) // (self.workers * 8))
+        for done, (key, png) in enumerate(zip(keys, self._get_pool().map(_render_job, jobs, chunksize=chunksize)), 1):
+            self._store(key, png)
+            failed += png is None
+            if progress:
+                progress(done, len(jobs))
+        return len(jobs), failed
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+def main():
+    from .store import DataManager
+
+    parser = argparse.ArgumentParser(description="Rendert alle Formeln der Sammlung vorab in den Cache.")
+    parser.add_argument("--file", default=constants.DATA_FILE, help="Pfad zur Datendatei")
+    parser.add_argument("--workers", type=int, default=None, help="Anzahl der Worker-Prozesse")
+    parser.add_argument("--theme", choices=list(constants.THEMES) + ["all"], default="all",
+                        help="Theme, für das gerendert wird")
+    args = parser.parse_args()
+
+    data = DataManager(args.file).load_data()
+    formulas = sorted(collect_formulas(data))
+    themes = list(constants.THEMES) if args.theme == "all" else [args.theme]
+    styles = [theme_style(name) for name in themes]
+
+    farm = RenderFarm(workers=args.workers)
+    print(f"{len(formulas)} verschiedene Formeln, {len(styles)} Stil(e), {farm.workers} Worker")
+    start = time.perf_counter()
+
+    def progress(done, total):
+        if done == total or done % 100 == 0:
+            print(f"  {done}/{total}")
+
+    try:
+        rendered, failed = farm.render_many(formulas, styles, progress)
+    finally:
+        farm.shutdown()
+    print(f"{rendered} Formeln in {time.perf_counter() - start:.1f} s gerendert, {failed} fehlerhaft.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+import math
+import time
+
+import constants
+
+DAY = 86400
+
+# Wiederholungen innerhalb der laufenden Sitzung
+REPEAT_SOON = 'soon'   # Karte kommt nach zwei anderen Karten erneut
+REPEAT_LATER = 'later' # Karte kommt am Ende der Sitzung erneut
+
+
+def is_due(task, now=None):
+    """Prüft, ob eine Karte fällig ist. Auch gemeisterte Karten werden wieder fällig."""
+    now = time.time() if now is None else now
+    return task.get('sm_data', {}).get('next_review_at', 0) <= now
+
+
+def status_for_interval(quality, interval_days):
+    """Leitet den angezeigten Lernstatus aus Bewertung und Intervall ab."""
+    if quality in ('bad', 'ok', 'perfect'):
+        return quality
+    return 'mastered' if interval_days >= 21 else 'good'
+
+
+class Scheduler:
+    """
+    Basisklasse für Lernalgorithmen. Ein Scheduler aktualisiert die Lerndaten
+    ('sm_data') einer Karte nach einer Bewertung und bestimmt, ob die Karte in
+    der laufenden Sitzung wiederholt werden soll.
+    """
+    name = None
+    label = None
+
+    def __init__(self, params=None):
+        self.params = params or {}
+
+    def review(self, sm_data, quality, now=None):
+        """
+        Aktualisiert 'sm_data' für die Bewertung 'quality' (bad/ok/good/perfect)
+        und gibt REPEAT_SOON, REPEAT_LATER oder None zurück.
+        """
+        now = time.time() if now is None else now
+        previous_status = sm_data.get('status', 'new')
+        interval_days, repeat = self._schedule(sm_data, quality, now)
+        sm_data['status'] = self._status(previous_status, quality, interval_days)
+        sm_data['interval'] = interval_days
+        sm_data['last_review_at'] = now
+        sm_data['next_review_at'] = now + interval_days * DAY
+        return repeat
+
+    def _status(self, previous_status, quality, interval_days):
+        return status_for_interval(quality, interval_days)
+
+    def _schedule(self, sm_data, quality, now):
+        raise NotImplementedError
+
+
+class ClassicScheduler(Scheduler):
+    """Der ursprüngliche Algorithmus mit festen Intervallen je Lernstatus."""
+    name = 'classic'
+    label = "Klassisch (feste Intervalle)"
+
+    def _status(self, previous_status, quality, interval_days):
+        if quality == 'good' and previous_status == 'good':
+            return 'mastered'
+        return quality
+
+    def _schedule(self, sm_data, quality, now):
+        previous_status = sm_data.get('status', 'new')
+        if quality == 'bad':
+            sm_data['consecutive_good'] = 0
+            repeat = REPEAT_SOON
+        elif quality == 'ok':
+            sm_data['consecutive_good'] = 0
+            repeat = REPEAT_LATER
+        elif quality == 'good':
+            repeat = None if previous_status == 'good' else REPEAT_LATER
+        else:
+            repeat = None
+
+        status = self._status(previous_status, quality, 0)
+        intervals = self.params.get('intervals', constants.STATUS_INTERVALS)
+        return intervals.get(status, 30), repeat
+
+
+class SM2Scheduler(Scheduler):
+    """SM-2 mit Ease-Faktor pro Karte (SuperMemo 2)."""
+    name = 'sm2'
+    label = "SM-2 (Ease-Faktor)"
+
+    QUALITY_GRADES = {'bad': 1, 'ok': 3, 'good': 4, 'perfect': 5}
+
+    def _schedule(self, sm_data, quality, now):
+        grade = self.QUALITY_GRADES[quality]
+        ease = sm_data.get('ease', self.params.get('initial_ease', 2.5))
+        reps = sm_data.get('reps', 0)
+        interval = sm_data.get('interval', 0)
+
+        ease = max(1.3, ease + 0.1 - (5 - grade) * (0.08 + (5 - grade) * 0.02))
+        if grade < 3:
+            reps, interval = 0, 0
+        else:
+            reps += 1
+            if reps == 1:
+                interval = 1
+            elif reps == 2:
+                interval = 6
+            else:
+                interval = round(max(interval, 1) * ease)
+
+        sm_data['ease'] = round(ease, 3)
+        sm_data['reps'] = reps
+        return interval, REPEAT_SOON if grade < 3 else None
+
+
+class FSRSScheduler(Scheduler):
+    """
+    Ein an FSRS angelehnter Algorithmus, der pro Karte Stabilität (in Tagen) und
+    Schwierigkeit (1-10) führt und das Intervall für eine Zielerinnerungsrate wählt.
+    """
+    name = 'fsrs'
+    label = "FSRS (Stabilität/Schwierigkeit)"
+
+    RATINGS = {'bad': 1, 'ok': 2, 'good': 3, 'perfect': 4}
+    DEFAULT_WEIGHTS = [0.4872, 1.4003, 3.7145, 13.8206, 5.1618, 1.2298, 0.8975, 0.031, 1.6474,
+                       0.1367, 1.0461, 2.1072, 0.0793, 0.3246, 1.587, 0.2272, 2.8755]
+
+    def __init__(self, params=None):
+        super().__init__(params)
+        self.w = self.params.get('weights', self.DEFAULT_WEIGHTS)
+        self.retention = self.params.get('retention', 0.9)
+        self.maximum_interval = self.params.get('maximum_interval', 365)
+
+    def _initial_difficulty(self, rating):
+        return min(10.0, max(1.0, self.w[4] - (rating - 3) * self.w[5]))
+
+    def retrievability(self, elapsed_days, stability):
+        return (1 + elapsed_days / (9 * stability)) ** -1
+
+    def next_interval(self, stability):
+        interval = 9 * stability * (1 / self.retention - 1)
+        return min(self.maximum_interval, max(1, round(interval)))
+
+    def _schedule(self, sm_data, quality, now):
+        w, rating = self.w, self.RATINGS[quality]
+        stability = sm_data.get('stability')
+        difficulty = sm_data.get('difficulty')
+
+        if stability is None or difficulty is None:
+            stability = w[rating - 1]
+            difficulty = self._initial_difficulty(rating)
+        else:
+            elapsed = max(0.0, (now - sm_data.get('last_review_at', now)) / DAY)
+            r = self.retrievability(elapsed, stability)
+            if rating == 1:
+                stability = w[11] * difficulty ** -w[12] * ((stability + 1) ** w[13] - 1) * math.exp(w[14] * (1 - r))
+            else:
+                hard_penalty = w[15] if rating == 2 else 1
+                easy_bonus = w[16] if rating == 4 else 1
+                stability *= 1 + (math.exp(w[8]) * (11 - difficulty) * stability ** -w[9]
+                                  * (math.exp(w[10] * (1 - r)) - 1) * hard_penalty * easy_bonus)
+            difficulty -= w[6] * (rating - 3)
+            # Mean Reversion zur Anfangsschwierigkeit einer "guten" Karte
+            difficulty = w[7] * self._initial_difficulty(3) + (1 - w[7]) * difficulty
+            difficulty = min(10.0, max(1.0, difficulty))
+
+        sm_data['stability'] = round(stability, 4)
+        sm_data['difficulty'] = round(difficulty, 4)
+        if rating == 1:
+            return 0, REPEAT_SOON
+        return self.next_interval(stability), None
+
+
+SCHEDULERS = {cls.name: cls for cls in (ClassicScheduler, SM2Scheduler, FSRSScheduler)}
+DEFAULT_SCHEDULER = ClassicScheduler.name
+
+
+def get_scheduler(name=None, params=None):
+    """Erzeugt den Scheduler mit dem angegebenen Namen (Standard: klassisch)."""
+    return SCHEDULERS.get(name or DEFAULT_SCHEDULER, ClassicScheduler)(params)
+
+
+def params_for(settings, name, subject_id=None):
+    """
+    Liefert die gespeicherten Parameter eines Schedulers. Fachbezogene Parameter
+    (z.B. vom Optimierer angepasst) haben Vorrang vor den allgemeinen.
+    """
+    settings, name = settings or {}, name or DEFAULT_SCHEDULER
+    if subject_id is not None:
+        subject_params = settings.get('subject_scheduler_params', {}).get(subject_id, {})
+        if name in subject_params:
+            return subject_params[name]
+    return settings.get('scheduler_params', {}).get(name)
+
+
+def scheduler_for_set(set_data, settings=None, subject_id=None):
+    """Liefert den für ein Lernset gewählten Scheduler inkl. gespeicherter Parameter."""
+    name = set_data.get('scheduler', DEFAULT_SCHEDULER)
+    return get_scheduler(name, params_for(settings, name, subject_id))
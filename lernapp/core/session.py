@@ -0,0 +1,84 @@
+"""
+Checkpoints einer laufenden Lernsitzung.
+
+Gespeichert werden nur IDs: alle Karten der Sitzung mit Fach und Set, die
+Reihenfolge der Warteschlange (inklusive der Wiederholungen innerhalb der
+Sitzung) und die aktuelle Karte. Beim Fortsetzen werden die Karten über den
+TaskLocator direkt gefunden, ohne die Sets erneut zu durchsuchen oder die
+Warteschlange neu zu berechnen.
+"""
+import json
+import os
+import time
+
+import constants
+
+CHECKPOINT_VERSION = 1
+
+
+def build_checkpoint(options, located_tasks, queue_ids, current_id, instance_id=None):
+    """
+    Erzeugt einen Checkpoint. options enthält die Parameter der Sitzung
+    (mode, subject_id, set_id, tag_query, review_due, session_size),
+    located_tasks die Karten als (subject_id, set_id, task_id), instance_id
+    die Instanz, die die Sitzung führt (siehe clear_checkpoint).
+    """
+    return {
+        "version": CHECKPOINT_VERSION,
+        "instance": instance_id,
+        "saved_at": time.time(),
+        "options": options,
+        "tasks": [list(entry) for entry in located_tasks],
+        "queue": list(queue_ids),
+        "current": current_id,
+    }
+
+
+def save_checkpoint(checkpoint, filename=constants.SESSION_FILE):
+    """Schreibt den Checkpoint kompakt über eine temporäre Datei (nie halb geschrieben)."""
+    tmp_filename = f"{filename}.tmp"
+    with open(tmp_filename, 'w', encoding='utf-8') as f:
+        json.dump(checkpoint, f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(tmp_filename, filename)
+
+
+def load_checkpoint(filename=constants.SESSION_FILE):
+    """Lädt den Checkpoint oder gibt None zurück, wenn keiner (gültiger) existiert."""
+    try:
+        with open(filename, 'r', encoding='utf-8') as f:
+            checkpoint = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    if not isinstance(checkpoint, dict) or checkpoint.get("version") != CHECKPOINT_VERSION:
+        return None
+    return checkpoint
+
+
+def clear_checkpoint(filename=constants.SESSION_FILE, instance_id=None):
+    """
+    Löscht den Checkpoint. Mit instance_id nur, wenn er von dieser Instanz stammt,
+    damit das Ende einer Sitzung nicht die unterbrochene Sitzung einer anderen löscht.
+    """
+    if instance_id is not None:
+        checkpoint = load_checkpoint(filename)
+        if checkpoint is not None and checkpoint.get("instance") not in (None, instance_id):
+            return
+    try:
+        os.remove(filename)
+    except FileNotFoundError:
+        pass
+
+
+def restore_checkpoint(store, checkpoint):
+    """
+    Löst die IDs eines Checkpoints wieder in Karten auf. Gibt
+    (located_tasks, queue, current_task) zurück; gelöschte Karten werden ausgelassen.
+    """
+    located, by_id = [], {}
+    for subject_id, set_id, task_id in checkpoint.get("tasks", []):
+        task = store.locator.get(subject_id, set_id, task_id)
+        if task is not None:
+            located.append((subject_id, set_id, task))
+            by_id[task_id] = task
+    queue = [by_id[task_id] for task_id in checkpoint.get("queue", []) if task_id in by_id]
+    return located, queue, by_id.get(checkpoint.get("current"))
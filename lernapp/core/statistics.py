@@ -0,0 +1,28 @@
+from collections import Counter
+
+from . import scheduler
+
+QUALITY_SCORES = {'bad': 0, 'ok': 1, 'good': 2, 'perfect': 3}
+
+
+def status_counts(tasks):
+    """Zählt die Karten je Lernstatus."""
+    return Counter(t.get('sm_data', {}).get('status', 'new') for t in tasks)
+
+
+def quality_history(tasks):
+    """Liefert alle Bewertungen der Karten chronologisch als Punktwerte (0-3)."""
+    history_data = []
+    for task in tasks:
+        history_data.extend(task.get('history', []))
+    history_data.sort(key=lambda x: x.get('timestamp', 0))
+    return [QUALITY_SCORES.get(d.get('quality'), 0) for d in history_data]
+
+
+def workload_forecast(data, subject_id, set_id, days=30):
+    """Prognostiziert die Wiederholungen pro Tag für ein Set mit dessen Scheduler."""
+    from . import batch_scheduler # NumPy wird nur hier benötigt
+    set_data = data[subject_id]["sets"][set_id]
+    name = set_data.get("scheduler")
+    params = scheduler.params_for(data.get("settings"), name, subject_id)
+    return batch_scheduler.forecast(set_data.get("tasks", []), name, params, days=days)
@@ -0,0 +1,496 @@
+import json
+import os
+import time
+import shutil
+import copy
+import uuid
+import math
+from types import SimpleNamespace
+
+# Importiert die Konstanten aus der constants.py Datei
+import constants
+from constants import IMAGE_DIR
+from .index import TaskLocator, TagIndex, DueQueue, _normalize_tag
+from .answer_log import AnswerLog, new_instance_id
+from .filelock import FileLock
+from . import scheduler, profiles, sync, integrity, migrations
+
+# Settings, die jede Instanz selbst pflegt und die beim Zusammenführen nicht übernommen werden
+INSTANCE_SETTINGS = ("due_queue", "tag_index")
+
+class DataManager:
+    """Verwaltet das Laden und Speichern der JSON-Daten sowie das Kopieren von Bildern."""
+    def __init__(self, filename):
+        self.filename = filename
+        # Schützt die Datendatei vor gleichzeitigem Schreiben mehrerer Instanzen
+        self.lock = FileLock(filename)
+        # Sicherungen liegen neben der Datendatei, nicht im aktuellen Arbeitsverzeichnis
+        self.backup_dir = integrity.backup_dir_for(filename)
+        self.recovered_from = None # Sicherung, aus der beim Laden wiederhergestellt wurde
+        # Stellt sicher, dass der Bild-Ordner existiert
+        if not os.path.exists(IMAGE_DIR):
+            os.makedirs(IMAGE_DIR)
+
+    def load_data(self):
+        """
+        Lädt die Daten aus der JSON-Datei. Nur wenn sie nicht existiert, beginnt die
+        Sammlung leer; eine beschädigte Datei wird aus der letzten Sicherung
+        wiederhergestellt (sonst integrity.DataCorruptedError).
+        """
+        try:
+            with self.lock.shared():
+                data, recovered_from = integrity.load_json(self.filename, self.backup_dir)
+        except FileNotFoundError:
+            return {}
+        if recovered_from:
+            self.recovered_from = recovered_from
+        return data
+
+    def save_data(self, data):
+        """Speichert die übergebenen Daten atomar (Schreiben und Umbenennen) und legt ggf. eine Sicherung an."""
+        with self.lock.exclusive():
+            integrity.write_json_atomic(self.filename, data, backup_dir=self.backup_dir)
+
+    def copy_image_to_datastore(self, image_path):
+        """
+        Kopiert eine Bilddatei in den IMAGE_DIR Ordner der Anwendung
+        und gibt den neuen Pfad zurück. Verhindert doppeltes Kopieren.
+        """
+        if not image_path or not os.path.exists(image_path):
+            return None
+
+        # Verhindert das erneute Kopieren, wenn das Bild bereits im Datenspeicher ist
+        if os.path.dirname(os.path.abspath(image_path)) == os.path.abspath(IMAGE_DIR):
+            return image_path
+
+        filename = os.path.basename(image_path)
+        # Eindeutiger Dateiname, auch wenn parallel gleichnamige Bilder kopiert werden (Import)
+        unique_filename = f"{uuid.uuid4().hex[:12]}_{filename}"
+        destination_path = os.path.join(IMAGE_DIR, unique_filename)
+        try:
+            shutil.copy(image_path, destination_path)
+            return destination_path
+        except Exception as e:
+            print(f"Fehler beim Kopieren des Bildes: {e}")
+            return None
+
+
+def clone_task(task, include_progress=True):
+    """
+    Kopie einer Aufgabe mit neuer ID (copy-on-write). Text, Teilaufgaben, Tags,
+    Bildpfade und Layout-Cache werden nicht kopiert, sondern geteilt: Der Editor
+    und die Sammelaktionen ersetzen diese Werte beim Ändern, statt sie zu
+    verändern. Nur der Lernfortschritt, der sich getrennt weiterentwickelt, wird
+    kopiert bzw. ohne include_progress neu begonnen.
+    Die Teilung besteht nur im Speicher: Gespeichert wird jede Kopie vollständig,
+    die Datendatei wächst also um die kopierten Inhalte, und nach dem Neuladen
+    sind Original und Kopie unabhängige Objekte.
+    """
+    clone = dict(task)
+    clone['id'] = str(uuid.uuid4())
+    if include_progress:
+        clone['history'] = [dict(entry) for entry in task.get('history', [])]
+        clone['sm_data'] = copy.deepcopy(task.get('sm_data', {}))
+    else:
+        clone['history'] = []
+        clone['sm_data'] = {}
+    return clone
+
+
+class Store:
+    """
+    Headless-Zugriff auf die Lernsammlung: Laden, Migrieren und Speichern der Daten
+    sowie die Indizes und die Lernlogik, die von der Oberfläche und von
+    Skripten gemeinsam genutzt werden. Benötigt weder tkinter noch matplotlib.
+    """
+    def __init__(self, filename=constants.DATA_FILE, answer_log_filename=constants.ANSWER_LOG_FILE, profile=None,
+                 migration_progress=None):
+        # Mit einem Profil liegen Fortschritt, Antwortprotokoll und Sitzung in dessen Dateien
+        self.profile = profile
+        self.instance_id = new_instance_id()
+        self.session_file = constants.SESSION_FILE
+        if profile is not None:
+            answer_log_filename = profiles.profile_path(profile, constants.PROFILE_LOG_SUFFIX)
+            self.session_file = profiles.profile_path(profile, constants.PROFILE_SESSION_SUFFIX)
+
+        self.data_manager = DataManager(filename)
+        with self.data_manager.lock.shared():
+            self._disk_state = self._stat_disk()
+            self.data = self._read_disk()
+
+        # Hebt ältere Sammlungen Set für Set auf die aktuelle Schemaversion (fortsetzbar, siehe migrations)
+        if migrations.pending_steps(self.data):
+            if self.subjects():
+                migrations.migrate_data(self.data, migration_progress, checkpoint=lambda data: self._write_locked())
+                print("Datenmigration abgeschlossen und gespeichert.")
+            else:
+                self.settings["data_version"] = migrations.current_version()
+        self._dirty = None
+        self._remember_saved_state()
+
+        # Nur vermerkt; ausgegeben wird beim Start der Oberfläche bzw. von python -m lernapp.core.integrity
+        self.integrity_issues = integrity.verify(self.data)
+
+        # Indizes für fachübergreifende Sitzungen
+        self.locator = TaskLocator(self.data)
+        self.tag_index = TagIndex(self.data, self.locator)
+        self.due_queue = DueQueue(self.data, self.locator)
+
+        # Antworten einer abgestürzten Sitzung nachspielen
+        self.answer_log = AnswerLog(answer_log_filename, instance_id=self.instance_id)
+        replayed = self.answer_log.replay(self)
+        if replayed:
+            print(f"{replayed} Antworten aus dem Protokoll wiederhergestellt.")
+            self.save()
+
+    @property
+    def settings(self):
+        return self.data.setdefault("settings", {})
+
+    def _read_disk(self):
+        """Liest die Sammlung so, wie sie gespeichert ist (mit dem Fortschritt des Profils)."""
+        data = self.data_manager.load_data()
+        if self.profile is not None:
+            profiles.load_profile(self.profile, data)
+        return data
+
+    def _stat_disk(self):
+        """Änderungszeit und Größe der Datendatei (und der Profildatei) zum Erkennen fremder Änderungen."""
+        filenames = [self.data_manager.filename]
+        if self.profile is not None:
+            filenames.append(profiles.profile_path(self.profile))
+        state = []
+        for filename in filenames:
+            try:
+                stat = os.stat(filename)
+                state.append((stat.st_mtime_ns, stat.st_size))
+            except FileNotFoundError:
+                state.append(None)
+        return state
+
+    @staticmethod
+    def _settings_digests(data):
+        return {key: sync._digest(value) for key, value in data.get("settings", {}).items() if key not in INSTANCE_SETTINGS}
+
+    def mark_changed(self, subject_id=None, set_id=None, task_id=None):
+        """
+        Vermerkt eine Änderung im Speicher für das nächste Speichern: eine Aufgabe,
+        ein Set (samt Aufgaben), ein Fach oder ohne Angaben die ganze Sammlung.
+        """
+        if subject_id is None:
+            self._dirty = None
+        elif self._dirty is not None:
+            self._dirty.add((subject_id, set_id, task_id))
+
+    def _remember_saved_state(self, data=None):
+        """
+        Merkt sich Fingerabdrücke des gespeicherten Stands als Basis für das Zusammenführen.
+        Nach dem Speichern werden nur die als geändert vermerkten Einträge neu berechnet.
+        """
+        if data is None and self._dirty is not None:
+            self._refresh_fingerprints(self._dirty)
+        else:
+            self._saved_fingerprints = sync.fingerprints(self.data if data is None else data)
+        if data is None:
+            self._dirty = set()
+        self._saved_settings = self._settings_digests(self.data if data is None else data)
+
+    def _refresh_fingerprints(self, dirty):
+        """Aktualisiert die Fingerabdrücke geänderter Einträge; verschwundene fallen heraus."""
+        current, missing = {}, set()
+        for subject_id, set_id, task_id in dirty:
+            subject = self.data.get(subject_id)
+            set_data = subject.get("sets", {}).get(set_id) if isinstance(subject, dict) else None
+            if task_id is not None:
+                task = self.locator.get(subject_id, set_id, task_id)
+                missing.add(f"task:{task_id}")
+                entries = [sync.task_entry(subject_id, set_id, task)] if task is not None else []
+            elif set_id is not None:
+                missing.add(f"set:{set_id}")
+                entries = []
+                if isinstance(set_data, dict):
+                    entries.append(sync.set_entry(subject_id, set_id, set_data))
+                    entries.extend(sync.task_entry(subject_id, set_id, task) for task in set_data.get("tasks", [])
+                                   if isinstance(task, dict) and task.get("id"))
+            else:
+                missing.add(f"subject:{subject_id}")
+                entries = [sync.subject_entry(subject_id, subject)] if isinstance(subject, dict) else []
+            current.update((key, fingerprint) for key, fingerprint, _ in entries)
+        # Verschobene Aufgaben fehlen an der alten Stelle, stehen aber im Zielset
+        for key in missing - current.keys():
+            self._saved_fingerprints.pop(key, None)
+        self._saved_fingerprints.update(current)
+
+    def external_changes_pending(self):
+        """Hat eine andere Instanz seit dem letzten Laden oder Speichern geschrieben?"""
+        return self._stat_disk() != self._disk_state
+
+    def merge_external_changes(self):
+        """
+        Übernimmt Änderungen, die eine andere Instanz gespeichert hat, inkrementell in
+        den Speicher, statt alles neu zu laden. Gibt die Anzahl der Änderungen zurück.
+        """
+        if not self.external_changes_pending():
+            return 0
+        with self.data_manager.lock.shared():
+            disk_state = self._stat_disk()
+            disk = self._read_disk()
+        return self._merge_disk(disk, disk_state)
+
+    def _merge_disk(self, disk, disk_state):
+        """
+        Führt den gespeicherten Stand einer anderen Instanz mit dem Speicher zusammen.
+        Die Unterschiede zwischen dem zuletzt gesehenen und dem jetzt gespeicherten
+        Stand werden wie beim Synchronisieren als Änderungen übernommen: Was hier seit
+        dem letzten Speichern ebenfalls geändert wurde, behält den hiesigen Stand;
+        Verläufe werden vereinigt, bei den Lerndaten gewinnt die jüngste Wiederholung.
+        """
+        saved = self._saved_fingerprints
+        current = sync.fingerprints(self.data)
+        changed_here = {key: math.inf for key in set(current) | set(saved)
+                        if current.get(key, [None])[0] != saved.get(key, [None])[0]}
+        changes = sync.local_changes(disk, SimpleNamespace(fingerprints=saved))
+        merger = sync.Merger(self, SimpleNamespace(stamps=changed_here), portable=False)
+        for change in changes:
+            merger.apply(change)
+
+        current_settings = self._settings_digests(self.data)
+        for key, digest in self._settings_digests(disk).items():
+            if digest != self._saved_settings.get(key) and current_settings.get(key) == self._saved_settings.get(key):
+                self.settings[key] = disk["settings"][key]
+
+        self._remember_saved_state(disk)
+        self._disk_state = disk_state
+        return len(changes)
+
+    def save(self):
+        """
+        Schreibt die gesamte Sammlung in die Datendatei; das Antwortprotokoll ist damit übernommen.
+        Mit Profil werden Inhalte und Fortschritt getrennt gespeichert. Hat eine andere
+        Instanz inzwischen gespeichert, werden deren Änderungen zuerst übernommen, statt
+        sie zu überschreiben.
+        """
+        with self.data_manager.lock.exclusive():
+            if self.external_changes_pending():
+                self._merge_disk(self._read_disk(), self._stat_disk())
+            self._write()
+        self._remember_saved_state()
+        self.answer_log.clear()
+
+    def _write(self):
+        """Schreibt Inhalte und ggf. den Fortschritt des Profils; der Aufrufer hält die Sperre."""
+        if self.profile is None:
+            self.data_manager.save_data(self.data)
+        else:
+            self.data_manager.save_data(profiles.content_only(self.data))
+            profiles.save_profile(self.profile, self.data)
+        self._disk_state = self._stat_disk()
+
+    def _write_locked(self):
+        """Zwischenstand ohne Zusammenführen, z.B. während einer Migration."""
+        with self.data_manager.lock.exclusive():
+            self._write()
+
+    def create_profile(self, name):
+        """
+        Legt ein Lernprofil an. Das erste Profil übernimmt den bisherigen Fortschritt
+        der Datendatei, weitere Profile beginnen ohne Fortschritt.
+        """
+        first = self.profile is None and not profiles.list_profiles()
+        profiles.create_profile(name, self.data if first else None)
+
+    def subjects(self):
+        """Liefert (subject_id, subject_data) für alle Fächer."""
+        return [(sid, sdata) for sid, sdata in self.data.items() if sid != "settings" and isinstance(sdata, dict)]
+
+    def get_set(self, subject_id, set_id):
+        return self.data[subject_id]["sets"][set_id]
+
+    def get_tasks(self, subject_id, set_id):
+        return self.get_set(subject_id, set_id).get("tasks", [])
+
+    def scheduler_for(self, subject_id, set_id):
+        """Liefert den Scheduler eines Lernsets."""
+        return scheduler.scheduler_for_set(self.get_set(subject_id, set_id), self.settings, subject_id)
+
+    def record_performance(self, task, quality, now=None):
+        """Speichert eine Bewertung im Verlauf der Karte (für die Statistik)."""
+        history_entry = {"timestamp": time.time() if now is None else now, "quality": quality}
+        task.setdefault('history', []).append(history_entry)
+
+    def schedule_answer(self, subject_id, set_id, task, quality, now=None):
+        """
+        Aktualisiert die Lerndaten einer Karte mit dem Scheduler ihres Sets und trägt
+        die neue Fälligkeit in die globale Warteschlange ein. Gibt zurück, ob die
+        Karte in der laufenden Sitzung wiederholt werden soll.
+        """
+        sm_data = task.setdefault('sm_data', {'status': 'new', 'consecutive_good': 0})
+        repeat = self.scheduler_for(subject_id, set_id).review(sm_data, quality, now)
+        self.due_queue.push(subject_id, set_id, task)
+        return repeat
+
+    def apply_answer(self, subject_id, set_id, task, quality, now, scheduled):
+        """Trägt eine Antwort in den Verlauf ein und aktualisiert bei scheduled die Lerndaten."""
+        self.record_performance(task, quality, now)
+        self.mark_changed(subject_id, set_id, task.get('id'))
+        if scheduled:
+            return self.schedule_answer(subject_id, set_id, task, quality, now)
+        return None
+
+    def record_answer(self, subject_id, set_id, task, quality, scheduled=True, now=None):
+        """
+        Verbucht eine Antwort im Speicher und hängt sie an das Antwortprotokoll an,
+        ohne die ganze Sammlung zu speichern. Gibt den Wiederholungswunsch des
+        Schedulers zurück (oder None, wenn nicht geplant wurde).
+        """
+        now = time.time() if now is None else now
+        repeat = self.apply_answer(subject_id, set_id, task, quality, now, scheduled)
+        self.answer_log.append(subject_id, set_id, task.get('id'), quality, now, scheduled)
+        return repeat
+
+    def reset_set_progress(self, subject_id, set_id, now=None):
+        """Setzt Verlauf und Lerndaten aller Karten eines Sets zurück."""
+        now = time.time() if now is None else now
+        tasks = self.get_tasks(subject_id, set_id)
+        for task in tasks:
+            task['history'] = []
+            # Verwirft auch die kartenbezogenen Parameter der Scheduler (Ease, Stabilität, ...)
+            task['sm_data'] = {'status': 'new', 'next_review_at': now, 'consecutive_good': 0}
+        self.due_queue.push_all(subject_id, set_id, tasks)
+        self.mark_changed(subject_id, set_id)
+        return len(tasks)
+
+    # --- Sammelaktionen: ändern nur den Speicher, der Aufrufer speichert einmal ---
+
+    def _split_tasks(self, subject_id, set_id, task_ids):
+        """Teilt die Aufgaben eines Sets in (ausgewählte, übrige), jeweils in ihrer Reihenfolge."""
+        task_ids = set(task_ids)
+        selected, rest = [], []
+        for task in self.get_tasks(subject_id, set_id):
+            (selected if task.get('id') in task_ids else rest).append(task)
+        return selected, rest
+
+    def move_tasks(self, subject_id, set_id, task_ids, target_subject_id, target_set_id):
+        """Verschiebt Aufgaben samt Lernfortschritt in ein anderes Set. Gibt die Anzahl zurück."""
+        if (subject_id, set_id) == (target_subject_id, target_set_id):
+            return 0
+        target_tasks = self.get_set(target_subject_id, target_set_id).setdefault("tasks", [])
+        moved, rest = self._split_tasks(subject_id, set_id, task_ids)
+        self.get_set(subject_id, set_id)["tasks"] = rest
+        target_tasks.extend(moved)
+        for task in moved:
+            self.tag_index.update_task(target_subject_id, target_set_id, task['id'], [], task.get('tags', []))
+        # Alte Einträge der Warteschlange verfallen beim Abrufen (lazy deletion)
+        self.due_queue.push_all(target_subject_id, target_set_id, moved)
+        self.locator.invalidate(subject_id, set_id)
+        self.mark_changed(target_subject_id, target_set_id)
+        return len(moved)
+
+    def copy_tasks(self, subject_id, set_id, task_ids, target_subject_id, target_set_id):
+        """Kopiert Aufgaben (mit neuen IDs und eigenem Lernfortschritt) in ein Set."""
+        selected, _ = self._split_tasks(subject_id, set_id, task_ids)
+        copies = [clone_task(task) for task in selected]
+        self.get_set(target_subject_id, target_set_id).setdefault("tasks", []).extend(copies)
+        for task in copies:
+            self.tag_index.update_task(target_subject_id, target_set_id, task['id'], [], task.get('tags', []))
+        self.due_queue.push_all(target_subject_id, target_set_id, copies)
+        self.mark_changed(target_subject_id, target_set_id)
+        return len(copies)
+
+    def update_tags(self, subject_id, set_id, task_ids, add=(), remove=()):
+        """Fügt Tags hinzu bzw. entfernt sie (ohne Beachtung der Groß-/Kleinschreibung)."""
+        remove_keys = {_normalize_tag(t) for t in remove}
+        selected, _ = self._split_tasks(subject_id, set_id, task_ids)
+        for task in selected:
+            old_tags = task.get('tags', [])
+            new_tags = [t for t in old_tags if _normalize_tag(t) not in remove_keys]
+            present = {_normalize_tag(t) for t in new_tags}
+            for tag in add:
+                if _normalize_tag(tag) not in present:
+                    new_tags.append(tag.strip())
+                    present.add(_normalize_tag(tag))
+            task['tags'] = new_tags
+            self.tag_index.update_task(subject_id, set_id, task['id'], old_tags, new_tags)
+            self.mark_changed(subject_id, set_id, task['id'])
+        return len(selected)
+
+    def reset_tasks_progress(self, subject_id, set_id, task_ids, now=None):
+        """Setzt Verlauf und Lerndaten ausgewählter Karten zurück."""
+        now = time.time() if now is None else now
+        selected, _ = self._split_tasks(subject_id, set_id, task_ids)
+        for task in selected:
+            task['history'] = []
+            task['sm_data'] = {'status': 'new', 'next_review_at': now, 'consecutive_good': 0}
+            self.mark_changed(subject_id, set_id, task['id'])
+        self.due_queue.push_all(subject_id, set_id, selected)
+        return len(selected)
+
+    def delete_tasks(self, subject_id, set_id, task_ids):
+        """Löscht Aufgaben endgültig. Gibt die Anzahl zurück."""
+        deleted, rest = self._split_tasks(subject_id, set_id, task_ids)
+        self.get_set(subject_id, set_id)["tasks"] = rest
+        self._forget_tasks(subject_id, set_id, deleted)
+        return len(deleted)
+
+    def delete_set(self, subject_id, set_id):
+        """Löscht ein Set mit allen Aufgaben."""
+        set_data = self.data[subject_id]["sets"].pop(set_id)
+        self._forget_tasks(subject_id, set_id, set_data.get("tasks", []))
+        self.mark_changed(subject_id, set_id)
+
+    def delete_subject(self, subject_id):
+        """Löscht ein Fach mit allen Sets und Aufgaben."""
+        for set_id in list(self.data[subject_id].get("sets", {})):
+            self.delete_set(subject_id, set_id)
+        del self.data[subject_id]
+        self.mark_changed(subject_id)
+
+    def _forget_tasks(self, subject_id, set_id, tasks):
+        """Nimmt gelöschte Aufgaben aus den Indizes und der Warteschlange."""
+        tasks = [task for task in tasks if isinstance(task, dict) and task.get('id')]
+        for task in tasks:
+            self.tag_index.remove_task(task['id'], task.get('tags', []))
+            self.mark_changed(subject_id, set_id, task['id'])
+        self.due_queue.discard_all(task['id'] for task in tasks)
+        self.locator.invalidate(subject_id, set_id)
+
+    def duplicate_set(self, subject_id, set_id, target_subject_id=None, name=None, include_progress=True):
+        """
+        Legt eine Kopie eines Sets an (im selben oder in einem anderen Fach) und gibt
+        die neue Set-ID zurück. Inhalte und Bilder werden im Speicher geteilt, in der
+        Datendatei aber vollständig abgelegt, siehe clone_task.
+        """
+        target_subject_id = target_subject_id or subject_id
+        source = self.get_set(subject_id, set_id)
+        new_set = {key: value for key, value in source.items() if key != "tasks"}
+        new_set["name"] = name or f"{source.get('name', 'Set')} (Kopie)"
+        new_set["tasks"] = [clone_task(task, include_progress) for task in source.get("tasks", [])]
+        new_set_id = str(uuid.uuid4())
+        self.data[target_subject_id]["sets"][new_set_id] = new_set
+        for task in new_set["tasks"]:
+            self.tag_index.update_task(target_subject_id, new_set_id, task['id'], [], task.get('tags', []))
+        self.due_queue.push_all(target_subject_id, new_set_id, new_set["tasks"])
+        self.mark_changed(target_subject_id, new_set_id)
+        return new_set_id
+
+    def duplicate_subject(self, subject_id, name=None, include_progress=True):
+        """Legt eine Kopie eines Fachs mit allen Sets an und gibt die neue Fach-ID zurück."""
+        source = self.data[subject_id]
+        new_subject_id = str(uuid.uuid4())
+        new_subject = {key: value for key, value in source.items() if key != "sets"}
+        new_subject["name"] = name or f"{source.get('name', 'Fach')} (Kopie)"
+        new_subject["sets"] = {}
+        self.data[new_subject_id] = new_subject
+        self.mark_changed(new_subject_id)
+        for set_id, set_data in source.get("sets", {}).items():
+            self.duplicate_set(subject_id, set_id, new_subject_id, set_data.get("name"), include_progress)
+        return new_subject_id
+
+    def change_scheduler(self, subject_id, set_id, scheduler_name):
+        """Wählt den Lernalgorithmus für ein Set und berechnet alle Fälligkeiten neu."""
+        from . import batch_scheduler # NumPy wird nur hier benötigt
+        set_data = self.get_set(subject_id, set_id)
+        set_data["scheduler"] = scheduler_name
+        batch_scheduler.reschedule_collection(self.data, subject_id, set_id)
+        self.due_queue.push_all(subject_id, set_id, set_data.get("tasks", []))
+        self.mark_changed(subject_id, set_id)
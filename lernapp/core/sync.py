@@ -0,0 +1,533 @@
+"""
+Synchronisation mehrerer Installationen über einen kleinen lokalen HTTP-Dienst.
+
+Jede Installation (Replica) merkt sich in einer Statusdatei Fingerabdrücke
+aller Fächer, Sets und Aufgaben vom Stand der letzten Synchronisation. Beim
+Synchronisieren werden nur die Abweichungen als Änderungen verschickt:
+geänderte Inhalte, angehängte Verlaufseinträge und neue Lerndaten; Bilder
+werden über ihren SHA-1-Hash referenziert und nur übertragen, wenn die
+Gegenseite sie noch nicht hat. Jede Änderung trägt ihre Herkunft und eine
+fortlaufende Nummer; der Versionsvektor {replica: letzte nummer} gibt an,
+was eine Seite schon kennt. Der Server führt ein Änderungsprotokoll und
+schickt einem Client genau die Änderungen, die dessen Vektor noch nicht
+enthält. Die Datenmenge hängt also von den Änderungen ab, nicht von der
+Größe der Sammlung. Der Dienst selbst liegt in sync_server.
+
+Konfliktregeln:
+  Inhalte, Sets, Fächer:  die zuletzt synchronisierte Änderung gewinnt
+  Verlauf:                Einträge beider Seiten werden vereinigt
+  sm_data:                die Lerndaten der jüngsten Wiederholung gewinnen
+
+Fortschritt gehört einem Lernprofil: Fortschrittsänderungen tragen den Namen
+des Profils (learner, ohne Profil None), der Server führt ihn je Profil
+getrennt und schickt ihn nur an Installationen mit demselben Profil. Inhalte
+gehen an alle.
+
+Aufruf:  python -m lernapp.core.sync serve [--host 0.0.0.0] [--port 8765] [--file sync_server.json]
+         python -m lernapp.core.sync sync http://rechner:8765 [--file lernkarten.json]
+"""
+import argparse
+import copy
+import hashlib
+import json
+import os
+import re
+import time
+import uuid
+
+import constants
+from . import layout, profiles
+
+SYNC_VERSION = 1
+DEFAULT_PORT = 8765
+TIMEOUT = 30
+# Felder einer Aufgabe, die nicht als Inhalt gelten (Fortschritt bzw. lokal berechnet)
+LOCAL_KEYS = ("history", "sm_data", "layout")
+IMAGE_NAME = re.compile(r"^[0-9a-f]{40}(\.[A-Za-z0-9]{1,8})?$")
+
+
+def _digest(value):
+    return hashlib.sha1(json.dumps(value, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()[:16]
+
+
+def _last_review(history):
+    return max((entry.get("timestamp") or 0 for entry in history), default=0)
+
+
+def _image_fields(task):
+    """Wie bundle._task_image_fields, aber nur vorhandene Bildlisten."""
+    if "bilder_aufgabe" in task:
+        yield task, "bilder_aufgabe"
+    for subtask in task.get("unteraufgaben", []):
+        if "bilder_loesung" in subtask:
+            yield subtask, "bilder_loesung"
+
+
+def state_file(store):
+    """Statusdatei der Synchronisation; mit Profil hat jedes Profil seine eigene."""
+    if store.profile is not None:
+        return profiles.profile_path(store.profile, constants.PROFILE_SYNC_SUFFIX)
+    return constants.SYNC_STATE_FILE
+
+
+class SyncState:
+    """Stand der letzten Synchronisation einer Installation (bzw. des Servers)."""
+    def __init__(self, filename):
+        self.filename = filename
+        try:
+            with open(filename, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            state = {}
+        self.replica = state.get("replica") or str(uuid.uuid4())
+        self.counter = state.get("counter", 0)
+        self.vector = state.get("vector", {})
+        # "task:<id>" -> [inhalt, lerndaten, verlaufslänge]; "set:<id>"/"subject:<id>" -> [inhalt]
+        self.fingerprints = state.get("fingerprints", {})
+        # Zeitpunkt der letzten übernommenen Änderung je Eintrag (letzte Änderung gewinnt)
+        self.stamps = state.get("stamps", {})
+
+    def save(self):
+        state = {"replica": self.replica, "counter": self.counter, "vector": self.vector,
+                 "fingerprints": self.fingerprints, "stamps": self.stamps}
+        tmp_filename = f"{self.filename}.tmp"
+        with open(tmp_filename, 'w', encoding='utf-8') as f:
+            json.dump(state, f, separators=(',', ':'))
+        os.replace(tmp_filename, self.filename)
+
+
+def subject_entry(subject_id, subject):
+    meta = {k: v for k, v in subject.items() if k != "sets"}
+    return f"subject:{subject_id}", [_digest(meta)], {"kind": "subject", "id": subject_id, "data": meta}
+
+
+def set_entry(subject_id, set_id, set_data):
+    meta = {k: v for k, v in set_data.items() if k != "tasks"}
+    return f"set:{set_id}", [_digest(meta)], {"kind": "set", "id": set_id, "subject": subject_id, "data": meta}
+
+
+def task_entry(subject_id, set_id, task):
+    content = {k: v for k, v in task.items() if k not in LOCAL_KEYS}
+    fingerprint = [_digest([subject_id, set_id, content]), _digest(task.get("sm_data", {})), len(task.get("history", []))]
+    return f"task:{task['id']}", fingerprint, {"kind": "task", "id": task["id"], "subject": subject_id,
+                                               "set": set_id, "data": content, "task": task}
+
+
+def _walk(data):
+    """Liefert (schlüssel, fingerabdruck, änderung) für alle Fächer, Sets und Aufgaben."""
+    for subject_id, subject in data.items():
+        if subject_id == "settings" or not isinstance(subject, dict):
+            continue
+        yield subject_entry(subject_id, subject)
+        for set_id, set_data in subject.get("sets", {}).items():
+            if not isinstance(set_data, dict): continue
+            yield set_entry(subject_id, set_id, set_data)
+            for task in set_data.get("tasks", []):
+                if not isinstance(task, dict) or not task.get("id"): continue
+                yield task_entry(subject_id, set_id, task)
+
+
+def fingerprints(data):
+    return {key: fingerprint for key, fingerprint, _ in _walk(data)}
+
+
+def local_changes(data, state, now=None, learner=None):
+    """
+    Vergleicht die Sammlung mit dem Stand der letzten Synchronisation und gibt die
+    Änderungen zurück (Bildpfade noch lokal, siehe _portable). Fortschrittsänderungen
+    tragen das Lernprofil learner.
+    """
+    now = time.time() if now is None else now
+    changes, seen, deleted = [], set(), {"task": [], "set": [], "subject": []}
+    for key, fingerprint, change in _walk(data):
+        seen.add(key)
+        old = state.fingerprints.get(key)
+        task = change.pop("task", None)
+        if old is None or old[0] != fingerprint[0]:
+            changes.append(change)
+        if task is None or (old is not None and old[1:] == fingerprint[1:]):
+            continue
+        history = task.get("history", [])
+        progress = {"kind": "progress", "id": task["id"], "learner": learner, "sm_data": task.get("sm_data", {}),
+                    "reviewed_at": _last_review(history)}
+        if old is not None and len(history) < old[2]:
+            # Verlauf wurde gekürzt (Fortschritt zurückgesetzt): ersetzt statt ergänzt
+            progress.update(reset=True, reviewed_at=now, history=profiles._pack_history(history))
+        else:
+            progress["history"] = profiles._pack_history(history[old[2] if old else 0:])
+        changes.append(progress)
+    for key in state.fingerprints:
+        if key not in seen:
+            kind, _, item_id = key.partition(":")
+            deleted[kind].append({"kind": kind, "id": item_id, "deleted": True})
+    # Aufgaben vor ihren Sets, Sets vor ihren Fächern löschen
+    return changes + deleted["task"] + deleted["set"] + deleted["subject"]
+
+
+def _portable(change, images):
+    """Ersetzt lokale Bildpfade einer Aufgabenänderung durch Hash-Namen; images: pfad -> name."""
+    from .bundle import _file_hash
+    content = dict(change["data"])
+    if "unteraufgaben" in content:
+        content["unteraufgaben"] = [dict(s) for s in content["unteraufgaben"]]
+    for owner, key in _image_fields(content):
+        names = []
+        for path in owner[key]:
+            if path not in images:
+                images[path] = (_file_hash(path) + os.path.splitext(path)[1].lower()) if path and os.path.isfile(path) else None
+            if images[path]:
+                names.append(images[path])
+        owner[key] = names
+    return dict(change, data=content)
+
+
+def image_names(change):
+    """Hash-Namen aller Bilder einer (portablen) Aufgabenänderung."""
+    if change.get("kind") != "task" or change.get("deleted"):
+        return []
+    return [name for owner, key in _image_fields(change["data"]) for name in owner[key]]
+
+
+def image_path(name):
+    if not IMAGE_NAME.match(name):
+        raise ValueError(f"Ungültiger Bildname: {name}")
+    return os.path.join(constants.IMAGE_DIR, name)
+
+
+class Merger:
+    """
+    Übernimmt Änderungen einer anderen Replica in eine Sammlung (Client und Server).
+    Mit portable=False stehen in Aufgabenänderungen lokale Bildpfade statt Hash-Namen
+    (Abgleich mit einer anderen Instanz auf demselben Rechner, siehe Store).
+    """
+    def __init__(self, store, state, portable=True):
+        self.store = store
+        self.state = state
+        self.portable = portable
+        self._where = None # task_id -> (subject_id, set_id)
+        self._handlers = {"subject": self._apply_subject, "set": self._apply_set, "task": self._apply_task,
+                          "progress": self._apply_progress}
+
+    def _task_locations(self):
+        if self._where is None:
+            self._where = {}
+            for subject_id, subject in self.store.subjects():
+                for set_id, set_data in subject.get("sets", {}).items():
+                    for task in set_data.get("tasks", []):
+                        self._where[task.get("id")] = (subject_id, set_id)
+        return self._where
+
+    def _find_set(self, set_id):
+        for subject_id, subject in self.store.subjects():
+            if set_id in subject.get("sets", {}):
+                return subject_id
+        return None
+
+    def _find_task(self, task_id):
+        location = self._task_locations().get(task_id)
+        if location is None:
+            return None, None
+        task = self.store.locator.get(*location, task_id)
+        return location, task
+
+    def _newer(self, key, change):
+        """Letzte Änderung gewinnt; bei Gleichstand die zuletzt übernommene."""
+        if change.get("t", 0) < self.state.stamps.get(key, 0):
+            return False
+        self.state.stamps[key] = change.get("t", 0)
+        return True
+
+    def check(self, changes):
+        """Weist Änderungen unbekannter Art ab, bevor etwas übernommen wird."""
+        for change in changes:
+            if change.get("kind") not in self._handlers:
+                raise ValueError(f"Unbekannte Art von Änderung: {change.get('kind')!r}")
+
+    def apply(self, change):
+        self.check([change])
+        self._handlers[change["kind"]](change)
+
+    def _apply_subject(self, change):
+        if not self._newer(f"subject:{change['id']}", change):
+            return
+        data = self.store.data
+        if change.get("deleted"):
+            subject = data.pop(change["id"], None)
+            for set_id, set_data in (subject or {}).get("sets", {}).items():
+                self._drop_set(change["id"], set_id, set_data)
+            return
+        subject = data.setdefault(change["id"], {"sets": {}})
+        for key in [k for k in subject if k != "sets"]:
+            del subject[key]
+        subject.update(change["data"])
+
+    def _apply_set(self, change):
+        if not self._newer(f"set:{change['id']}", change):
+            return
+        current_subject = self._find_set(change["id"])
+        if change.get("deleted"):
+            if current_subject is not None:
+                set_data = self.store.data[current_subject]["sets"].pop(change["id"])
+                self._drop_set(current_subject, change["id"], set_data)
+            return
+        target = self.store.data.get(change["subject"])
+        if target is None:
+            return # Fach wurde inzwischen gelöscht
+        if current_subject is None:
+            target["sets"][change["id"]] = dict(change["data"], tasks=[])
+            return
+        set_data = self.store.data[current_subject]["sets"].pop(change["id"])
+        for key in [k for k in set_data if k != "tasks"]:
+            del set_data[key]
+        set_data.update(change["data"])
+        target["sets"][change["id"]] = set_data
+        if current_subject != change["subject"]:
+            for task in set_data.get("tasks", []):
+                self._task_locations()[task.get("id")] = (change["subject"], change["id"])
+            self.store.due_queue.push_all(change["subject"], change["id"], set_data.get("tasks", []))
+            self.store.locator.invalidate()
+
+    def _drop_set(self, subject_id, set_id, set_data):
+        for task in set_data.get("tasks", []):
+            self.store.tag_index.remove_task(task.get("id"), task.get("tags", []))
+            self._task_locations().pop(task.get("id"), None)
+        self.store.due_queue.discard_all(task.get("id") for task in set_data.get("tasks", []))
+        self.store.locator.invalidate(subject_id, set_id)
+
+    def _apply_task(self, change):
+        task_id = change["id"]
+        if not self._newer(f"task:{task_id}", change):
+            return
+        location, task = self._find_task(task_id)
+        store = self.store
+        if change.get("deleted"):
+            if task is not None:
+                tasks = store.get_tasks(*location)
+                tasks.remove(task)
+                store.tag_index.remove_task(task_id, task.get("tags", []))
+                store.due_queue.discard(task_id)
+                store.locator.invalidate(*location)
+                del self._task_locations()[task_id]
+            return
+
+        target = (change["subject"], change["set"])
+        try:
+            target_tasks = store.get_set(*target).setdefault("tasks", [])
+        except KeyError:
+            return # Set wurde inzwischen gelöscht
+        content = dict(change["data"])
+        if self.portable:
+            if "unteraufgaben" in content:
+                content["unteraufgaben"] = [dict(s) for s in content["unteraufgaben"]]
+            for owner, key in _image_fields(content):
+                owner[key] = [image_path(name) for name in owner[key]]
+
+        old_tags = []
+        if task is None:
+            task = {"history": [], "sm_data": {}}
+            target_tasks.append(task)
+        else:
+            old_tags = task.get("tags", [])
+            if location != target:
+                store.get_tasks(*location).remove(task)
+                store.tag_index.remove_task(task_id, old_tags)
+                store.locator.invalidate(*location)
+                target_tasks.append(task)
+                old_tags = []
+            # Inhalt ersetzen, Lernfortschritt behalten; das Dict bleibt dasselbe Objekt
+            for key in [k for k in task if k not in LOCAL_KEYS]:
+                del task[key]
+        task.update(content)
+        self._task_locations()[task_id] = target
+        layout.build_task_layout(task)
+        store.tag_index.update_task(*target, task_id, old_tags, task.get("tags", []))
+        store.due_queue.push(*target, task)
+
+    def _apply_progress(self, change):
+        location, task = self._find_task(change["id"])
+        if task is None:
+            return
+        if merge_progress(task, change):
+            self.store.due_queue.push(*location, task)
+
+
+def merge_progress(task, change):
+    """
+    Übernimmt eine Fortschrittsänderung in task (oder ein Dict mit "history" und
+    "sm_data"). Gibt False zurück, wenn sie älter als der hiesige Stand ist.
+    """
+    local_review = _last_review(task.get("history", []))
+    incoming = profiles._unpack_history(change.get("history", []))
+    if change.get("reset"):
+        if change["reviewed_at"] < local_review:
+            return False
+        # Nur Wiederholungen nach dem Zurücksetzen bleiben erhalten
+        history = [h for h in task.get("history", []) if (h.get("timestamp") or 0) > change["reviewed_at"]]
+    else:
+        history = list(task.get("history", []))
+    known = {(h.get("timestamp"), h.get("quality")) for h in history}
+    history.extend(h for h in incoming if (h["timestamp"], h["quality"]) not in known)
+    history.sort(key=lambda h: h.get("timestamp") or 0)
+    task["history"] = history
+    if change["reviewed_at"] >= local_review:
+        task["sm_data"] = change.get("sm_data", {})
+    return True
+
+
+def _request(url, payload=None, body=None, method=None, timeout=TIMEOUT):
+    import urllib.request # erst beim Abgleich, nicht schon mit dem Store laden
+    headers = {}
+    if payload is not None:
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        headers["Content-Type"] = "application/json"
+    request = urllib.request.Request(url, data=body, headers=headers, method=method)
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        content = response.read()
+        if response.headers.get_content_type() == "application/json":
+            return json.loads(content)
+        return content
+
+
+class SyncRound:
+    """
+    Ein Abgleich in drei Schritten, damit die Netzwerkzugriffe nicht die Oberfläche
+    blockieren: collect und apply greifen auf den Store zu und laufen im Tk-Thread,
+    exchange arbeitet nur auf den vorab kopierten Änderungen und darf in einem
+    Hintergrund-Thread laufen.
+    """
+    def __init__(self, store, url, state=None):
+        self.store = store
+        self.url = url.rstrip("/")
+        self.state = state or SyncState(state_file(store))
+        self.learner = store.profile
+        self.changes = []
+        self.response = None
+        self._basis = {}
+
+    def collect(self):
+        """Eigene Änderungen seit der letzten Synchronisation als unabhängige Kopie (Tk-Thread)."""
+        state = self.state
+        self._basis = fingerprints(self.store.data)
+        self.changes = copy.deepcopy(local_changes(self.store.data, state, learner=self.learner))
+        # Die Nummern werden vor dem Senden vergeben, damit sie nie doppelt verwendet werden
+        first = state.counter + 1
+        state.counter += len(self.changes)
+        state.save()
+        now = time.time()
+        for n, change in enumerate(self.changes, first):
+            change.update(o=state.replica, n=n, t=now)
+        return len(self.changes)
+
+    def exchange(self, progress=None):
+        """Bilder und Änderungen austauschen; berührt den Store nicht (Hintergrund-Thread möglich)."""
+        url, state = self.url, self.state
+        report = progress or (lambda done, total: None)
+        images = {}
+        changes = [_portable(c, images) if c["kind"] == "task" and not c.get("deleted") else c for c in self.changes]
+
+        # 1. Bilder hochladen, die der Server noch nicht kennt
+        report(1, 4)
+        names = {name for name in images.values() if name}
+        missing = set(_request(f"{url}/images/missing", {"names": sorted(names)})["missing"]) if names else set()
+        for path, name in images.items():
+            if name in missing:
+                with open(path, 'rb') as f:
+                    _request(f"{url}/images/{name}", body=f.read(), method="PUT")
+                missing.discard(name)
+
+        # 2. Eigene Änderungen senden, fremde empfangen
+        report(2, 4)
+        response = _request(f"{url}/sync", {"version": SYNC_VERSION, "replica": state.replica,
+                                            "learner": self.learner, "vector": state.vector,
+                                            "changes": changes})
+        for change in changes:
+            if change["kind"] != "progress":
+                state.stamps[f"{change['kind']}:{change['id']}"] = change["t"]
+
+        # 3. Fehlende Bilder laden
+        report(3, 4)
+        os.makedirs(constants.IMAGE_DIR, exist_ok=True)
+        for name in {name for change in response["changes"] for name in image_names(change)}:
+            path = image_path(name)
+            if not os.path.exists(path):
+                _write_atomic(path, _request(f"{url}/images/{name}"))
+        self.response = response
+        return len(response["changes"])
+
+    def apply(self):
+        """Empfangene Änderungen übernehmen und speichern (Tk-Thread). Gibt (gesendete, empfangene) zurück."""
+        store, state, response = self.store, self.state, self.response
+        # Was seit collect hier geändert wurde, wurde nicht gesendet und bleibt für den nächsten Abgleich offen
+        before = fingerprints(store.data)
+        edited = {key for key in set(self._basis) | set(before) if self._basis.get(key) != before.get(key)}
+        merger = Merger(store, state)
+        for change in response["changes"]:
+            # Ein älterer Server schickt den Fortschritt aller Profile
+            if change.get("kind") == "progress" and change.get("learner") != self.learner:
+                continue
+            merger.apply(change)
+        state.vector = {o: n for o, n in response["vector"].items() if o != state.replica}
+
+        store.mark_changed()
+        store.save()
+        state.fingerprints = {key: fp for key, fp in fingerprints(store.data).items() if key not in edited}
+        state.fingerprints.update({key: self._basis[key] for key in edited if key in self._basis})
+        state.save()
+        return len(self.changes), len(response["changes"])
+
+
+def sync(store, url, state=None, progress=None):
+    """
+    Gleicht die Sammlung mit dem Server unter url ab und speichert sie (alle Schritte
+    im aufrufenden Thread). progress(schritt, schritte) meldet den Fortschritt.
+    Gibt (gesendete, empfangene) Änderungen zurück.
+    """
+    report = progress or (lambda done, total: None)
+    sync_round = SyncRound(store, url, state)
+    report(0, 4)
+    sync_round.collect()
+    sync_round.exchange(report)
+    result = sync_round.apply()
+    report(4, 4)
+    return result
+
+
+def _write_atomic(path, content):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+
+def main():
+    from .store import Store
+
+    parser = argparse.ArgumentParser(description="Synchronisiert Lernsammlungen über einen lokalen HTTP-Dienst.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    serve_parser = commands.add_parser("serve", help="Sync-Dienst starten")
+    serve_parser.add_argument("--host", default="127.0.0.1", help="Adresse (0.0.0.0 für alle Rechner im Netz)")
+    serve_parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    serve_parser.add_argument("--file", default=constants.SYNC_SERVER_FILE, help="Sammlung des Servers")
+    sync_parser = commands.add_parser("sync", help="Diese Installation mit einem Server abgleichen")
+    sync_parser.add_argument("url", help="z.B. http://rechner:8765")
+    sync_parser.add_argument("--file", default=constants.DATA_FILE, help="Pfad zur Datendatei")
+    sync_parser.add_argument("--learner", default=None, help="Lernprofil")
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        from .sync_server import SyncServer
+        server = SyncServer((args.host, args.port), args.file)
+        print(f"Sync-Dienst läuft auf http://{args.host}:{args.port} (Strg+C beendet)")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+    else:
+        profiles.check_cli_learner(sync_parser, args.learner)
+        store = Store(args.file, profile=args.learner)
+        sent, received = sync(store, args.url)
+        print(f"{sent} Änderungen gesendet, {received} empfangen.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""
+Der Sync-Dienst (siehe sync): eine eigene Sammlung, in die alle Änderungen der
+Clients einfließen, und ein Änderungsprotokoll, aus dem jeder Client genau die
+Änderungen erhält, die sein Versionsvektor noch nicht enthält. Den Fortschritt
+der Lernprofile führt der Server getrennt je Profil (<datei>.progress.json);
+in die Sammlung selbst fließt nur der Fortschritt von Installationen ohne Profil.
+
+Liegt getrennt von sync, damit der Store beim Start kein http.server lädt.
+Aufruf:  python -m lernapp.core.sync serve [--host 0.0.0.0] [--port 8765]
+"""
+import hashlib
+import json
+import os
+import threading
+from bisect import bisect_right
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import constants
+from . import integrity, profiles
+from .sync import SYNC_VERSION, Merger, SyncState, _write_atomic, image_path, merge_progress
+
+
+class SyncServer(ThreadingHTTPServer):
+    """
+    Sync-Dienst: hält eine eigene Sammlung, in die alle Änderungen einfließen,
+    und ein Änderungsprotokoll (eine JSON-Zeile je Änderung) für die Clients.
+    """
+    daemon_threads = True
+
+    def __init__(self, address, filename=constants.SYNC_SERVER_FILE):
+        from .store import Store
+        super().__init__(address, _SyncHandler)
+        base = os.path.splitext(filename)[0]
+        self.lock = threading.Lock()
+        self.store = Store(filename, answer_log_filename=f"{base}.antworten.log")
+        self.state = SyncState(f"{base}.status.json")
+        self.log_filename = f"{base}.changes.jsonl"
+        # Fortschritt je Lernprofil: {learner: {task_id: [sm_data, verlauf]}}
+        self.progress_filename = f"{base}.progress.json"
+        try:
+            self.progress, _ = integrity.load_json(self.progress_filename)
+        except FileNotFoundError:
+            self.progress = {}
+        self.log = []
+        self._numbers = {}   # replica -> aufsteigende Nummern ihrer Änderungen
+        self._positions = {} # replica -> Position dieser Änderungen im Protokoll
+        try:
+            with open(self.log_filename, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        self._remember(json.loads(line))
+                    except json.JSONDecodeError:
+                        continue # abgeschnittene letzte Zeile
+        except FileNotFoundError:
+            pass
+
+    def _remember(self, change):
+        self._numbers.setdefault(change["o"], []).append(change["n"])
+        self._positions.setdefault(change["o"], []).append(len(self.log))
+        self.log.append(change)
+        self.state.vector[change["o"]] = change["n"]
+
+    def changes_since(self, vector, exclude, learner=None):
+        """
+        Alle Änderungen, die der Vektor nicht enthält, in Protokollreihenfolge;
+        Fortschritt nur, wenn er zum Lernprofil learner gehört.
+        """
+        start = len(self.log)
+        for origin, numbers in self._numbers.items():
+            if origin == exclude:
+                continue
+            i = bisect_right(numbers, vector.get(origin, 0))
+            if i < len(numbers):
+                start = min(start, self._positions[origin][i])
+        return [c for c in self.log[start:] if c["o"] != exclude and c["n"] > vector.get(c["o"], 0)
+                and (c["kind"] != "progress" or c.get("learner") == learner)]
+
+    def _apply_learner_progress(self, merger, change):
+        """Fortschritt eines Profils in dessen eigenen Stand statt in die Sammlung."""
+        if change["id"] not in merger._task_locations():
+            return
+        progress = self.progress.setdefault(change["learner"], {})
+        sm_data, history = progress.get(change["id"], ({}, []))
+        task = {"sm_data": sm_data, "history": profiles._unpack_history(history)}
+        if merge_progress(task, change):
+            progress[change["id"]] = [task["sm_data"], profiles._pack_history(task["history"])]
+
+    def handle_sync(self, request):
+        if request.get("version", 0) > SYNC_VERSION:
+            raise ValueError("Der Client verwendet eine neuere Protokollversion.")
+        replica = request["replica"]
+        with self.lock:
+            seen = self.state.vector.get(replica, 0)
+            accepted = [c for c in request.get("changes", []) if c["n"] > seen]
+            if accepted:
+                merger = Merger(self.store, self.state)
+                merger.check(accepted)
+                with open(self.log_filename, 'a', encoding='utf-8') as log:
+                    for change in accepted:
+                        if change["kind"] == "progress" and change.get("learner") is not None:
+                            self._apply_learner_progress(merger, change)
+                        else:
+                            merger.apply(change)
+                        self._remember(change)
+                        log.write(json.dumps(change, ensure_ascii=False, separators=(',', ':')) + "\n")
+                self.store.mark_changed()
+                self.store.save()
+                if any(change["kind"] == "progress" and change.get("learner") is not None for change in accepted):
+                    integrity.write_json_atomic(self.progress_filename, self.progress, indent=None,
+                                                separators=(',', ':'))
+                self.state.save()
+            return {"changes": self.changes_since(request.get("vector", {}), replica, request.get("learner")),
+                    "vector": dict(self.state.vector)}
+
+
+class _SyncHandler(BaseHTTPRequestHandler):
+    def _send(self, status, content=b"", content_type="application/json"):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def _send_json(self, value):
+        self._send(200, json.dumps(value, ensure_ascii=False).encode('utf-8'))
+
+    def _body(self):
+        return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+    def _image_path(self):
+        try:
+            return image_path(self.path.rsplit("/", 1)[-1]) if self.path.startswith("/images/") else None
+        except ValueError:
+            return None
+
+    def do_GET(self):
+        path = self._image_path()
+        if path is None or not os.path.isfile(path):
+            return self._send(404, content_type="text/plain")
+        with open(path, 'rb') as f:
+            self._send(200, f.read(), "application/octet-stream")
+
+    def do_PUT(self):
+        path = self._image_path()
+        content = self._body()
+        if path is None:
+            return self._send(404, content_type="text/plain")
+        # Der Name ist der Hash des Inhalts; passt er nicht, wird das Bild abgelehnt
+        if hashlib.sha1(content).hexdigest() != os.path.basename(path)[:40]:
+            return self._send(400, content_type="text/plain")
+        os.makedirs(constants.IMAGE_DIR, exist_ok=True)
+        _write_atomic(path, content)
+        self._send(204, content_type="text/plain")
+
+    def do_POST(self):
+        try:
+            request = json.loads(self._body())
+            if self.path == "/images/missing":
+                return self._send_json({"missing": [n for n in request["names"] if not os.path.exists(image_path(n))]})
+            if self.path == "/sync":
+                return self._send_json(self.server.handle_sync(request))
+        except (ValueError, KeyError, TypeError) as e:
+            return self._send(400, str(e).encode('utf-8'), "text/plain")
+        self._send(404, content_type="text/plain")
+
+    def log_message(self, format, *args):
+        pass
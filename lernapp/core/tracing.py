@@ -0,0 +1,125 @@
+"""
+Optionale Zeitmessung (Spans) für die Oberfläche und den Kern.
+
+Ist die Messung nicht eingeschaltet, werden keine Funktionen umhüllt und es
+entstehen keine Kosten. Mit enable() und instrument() werden ausgewählte
+Methoden in Spans gehüllt; die gesammelten Ereignisse lassen sich als
+Chrome-Trace (chrome://tracing, Perfetto) exportieren.
+"""
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+
+MAX_EVENTS = 20000
+
+_enabled = False
+_events = deque(maxlen=MAX_EVENTS)
+_origin = time.perf_counter()
+
+
+def enable():
+    global _enabled
+    _enabled = True
+
+
+def is_enabled():
+    return _enabled
+
+
+def _now_us():
+    return (time.perf_counter() - _origin) * 1e6
+
+
+def record(name, start_us, duration_us, category="span", args=None):
+    """Speichert ein abgeschlossenes Ereignis im Format des Chrome-Trace."""
+    event = {"name": name, "cat": category, "ph": "X", "ts": start_us, "dur": duration_us,
+             "pid": os.getpid(), "tid": threading.get_ident()}
+    if args:
+        event["args"] = args
+    _events.append(event)
+
+
+class span:
+    """Kontextmanager für einen Messabschnitt: with tracing.span("speichern"): ..."""
+    def __init__(self, name, category="span"):
+        self.name, self.category = name, category
+
+    def __enter__(self):
+        self.start = _now_us() if _enabled else None
+        return self
+
+    def __exit__(self, *exc):
+        if self.start is not None:
+            record(self.name, self.start, _now_us() - self.start, self.category)
+        return False
+
+
+def instrument(owner, attribute, name=None, category="span"):
+    """Umhüllt owner.attribute (Methode oder Modulfunktion) mit einem Span."""
+    original = getattr(owner, attribute)
+    if getattr(original, "_traced", False):
+        return
+    label = name or f"{getattr(owner, '__name__', owner)}.{attribute}"
+
+    @functools.wraps(original)
+    def wrapper(*args, **kwargs):
+        start = _now_us()
+        try:
+            return original(*args, **kwargs)
+        finally:
+            record(label, start, _now_us() - start, category)
+    wrapper._traced = True
+    setattr(owner, attribute, wrapper)
+
+
+def events(category=None):
+    return [e for e in list(_events) if category is None or e["cat"] == category]
+
+
+def summary(limit=10):
+    """Die langsamsten Spans je Name: [(name, Anzahl, Mittel ms, Max ms)], absteigend nach Max."""
+    by_name = {}
+    for event in list(_events):
+        by_name.setdefault(event["name"], []).append(event["dur"] / 1000)
+    rows = [(name, len(d), sum(d) / len(d), max(d)) for name, d in by_name.items()]
+    rows.sort(key=lambda row: row[3], reverse=True)
+    return rows[:limit]
+
+
+def export_chrome_trace(filename):
+    """Schreibt alle Ereignisse als Chrome-Trace-JSON."""
+    with open(filename, 'w', encoding='utf-8') as f:
+        json.dump({"traceEvents": list(_events), "displayTimeUnit": "ms"}, f)
+    return filename
+
+
+class StallDetector:
+    """
+    Erkennt Blockaden der Tk-Hauptschleife: Ein Herzschlag wird alle 'interval'
+    ms eingeplant; kommt er mehr als 'threshold' ms zu spät, war die Schleife
+    blockiert und die Verzögerung wird als Ereignis 'stall' gespeichert.
+    """
+    def __init__(self, widget, interval=50, threshold=100):
+        self.widget = widget
+        self.interval = interval
+        self.threshold = threshold
+        self.stalls = 0
+        self.max_stall_ms = 0.0
+        self._expected = None
+
+    def start(self):
+        self._expected = time.perf_counter() + self.interval / 1000
+        self.widget.after(self.interval, self._beat)
+
+    def _beat(self):
+        now = time.perf_counter()
+        late_ms = (now - self._expected) * 1000
+        if late_ms > self.threshold:
+            self.stalls += 1
+            self.max_stall_ms = max(self.max_stall_ms, late_ms)
+            record("Hauptschleife blockiert", _now_us() - late_ms * 1000, late_ms * 1000, "stall")
+        self._expected = now + self.interval / 1000
+        self.widget.after(self.interval, self._beat)
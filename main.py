@@ -1,35 +1,63 @@
+import time
+_START_TIME = time.perf_counter()
+
+import os
+import sys
+import argparse
 import tkinter as tk
 from tkinter import ttk, messagebox
-import copy
-
-# Import für Drag-and-Drop-Funktionalität
-from tkinterdnd2 import TkinterDnD
 
 # Importiert die zentralen Komponenten aus den neuen Modulen
 import constants
-from data_manager import DataManager
+from lernapp.core import Store
+from lernapp.core import profiles, integrity
 from ui.start_frame import StartFrame
+from ui import custom_dialogs
 import utils # Import für get_readable_text_color
 
-class LernApp(TkinterDnD.Tk):
+# Module, deren Import beim Start vermieden werden soll (siehe --startup-report)
+DEFERRED_MODULES = ("matplotlib", "matplotlib.pyplot", "PIL.Image", "PIL.ImageGrab", "tkinterdnd2", "numpy")
+
+class LernApp(tk.Tk):
     """
     Hauptklasse der Anwendung. Dient als Controller, der die Frames verwaltet,
-    die Daten hält und das Theme anwendet.
+    die Daten hält und das Theme anwendet. Drag-and-Drop (tkinterdnd2) wird erst
+    geladen, wenn die erste Drop-Zone gebaut wird (siehe utils.enable_drag_and_drop).
     """
-    def __init__(self):
+    def __init__(self, profile=None):
         super().__init__()
         self.title("Lern-Anwendung")
         self.geometry("1200x800")
         self.protocol("WM_DELETE_WINDOW", self._on_close)
 
-        self.data_manager = DataManager(constants.DATA_FILE)
-        self.data = self.data_manager.load_data()
-
-        # Führt eine einmalige, sichere Datenmigration durch, falls nötig.
-        self._migrate_data_to_v2()
+        # Ein einziges Style-Objekt; apply_theme konfiguriert es nur noch um
+        self.style = ttk.Style(self)
+        self.style.theme_use('clam')
+        self.current_theme = tk.StringVar(value="light")
 
-        saved_theme = self.data.get("settings", {}).get("theme", "light")
-        self.current_theme = tk.StringVar(value=saved_theme)
+        # Die Datenhaltung und Lernlogik liegt im headless nutzbaren Kern
+        if profile is None:
+            profile = self._choose_profile()
+        migration_progress = custom_dialogs.StartupProgress(self, self, "Daten werden aktualisiert...")
+        try:
+            self.store = Store(constants.DATA_FILE, profile=profile, migration_progress=migration_progress)
+        except integrity.DataCorruptedError as e:
+            messagebox.showerror("Daten beschädigt", str(e))
+            self.destroy()
+            raise SystemExit(1)
+        finally:
+            migration_progress.close()
+        if self.store.data_manager.recovered_from:
+            messagebox.showwarning("Daten wiederhergestellt",
+                                   "Die Datendatei war beschädigt und wurde aus der Sicherung "
+                                   f"{self.store.data_manager.recovered_from} wiederhergestellt.")
+        if self.store.integrity_issues:
+            print(integrity.summarize(self.store.integrity_issues))
+            messagebox.showwarning("Datenprüfung", integrity.summarize(self.store.integrity_issues, limit=5)
+                                   + "\n\nDetails: python -m lernapp.core.integrity --all")
+        self._render_farm = None
+
+        self.current_theme.set(self.data.get("settings", {}).get("theme", "light"))
         self.current_theme.trace_add("write", self.apply_theme)
 
         self.container = ttk.Frame(self)
@@ -37,59 +65,66 @@ class LernApp(TkinterDnD.Tk):
 
         self.apply_theme()
         self.show_frame(StartFrame)
+        self.after(constants.EXTERNAL_CHANGE_POLL_MS, self._poll_external_changes)
+
+    def _choose_profile(self):
+        """Auswahl des Lernprofils beim Start; ohne Profile wird die Datendatei direkt verwendet."""
+        names = profiles.list_profiles()
+        if len(names) <= 1:
+            return names[0] if names else None
+        index = custom_dialogs.ask_choice_themed(self, "Lernprofil", "Wer lernt?", self, names)
+        return names[index] if index is not None else names[0]
+
+    def switch_profile(self, profile):
+        """Speichert das aktuelle Profil und lädt den Fortschritt eines anderen."""
+        self.data.setdefault("settings", {})["theme"] = self.current_theme.get()
+        self.store.save()
+        self.store.answer_log.close()
+        # Auch beim Wechsel kann die Datendatei noch zu migrieren sein (z.B. von einer älteren Instanz gespeichert)
+        migration_progress = custom_dialogs.StartupProgress(self, self, "Daten werden aktualisiert...")
+        try:
+            self.store = Store(constants.DATA_FILE, profile=profile, migration_progress=migration_progress)
+        finally:
+            migration_progress.close()
+        self.current_theme.set(self.data.get("settings", {}).get("theme", self.current_theme.get()))
+        self.show_frame(StartFrame)
 
-    def _migrate_data_to_v2(self):
-        """
-        Prüft, ob die Daten im alten Format sind und wandelt sie sicher in das neue
-        Format mit Bilderlisten um. Fügt eine Versionsnummer hinzu, um eine
-        erneute Ausführung zu verhindern.
-        """
-        settings = self.data.setdefault("settings", {})
-        if settings.get("data_version") == 2:
-            return
-
-        print("Führe Datenmigration zu v2 durch...")
-        migrated_data = copy.deepcopy(self.data)
-        needs_saving = False
-
-        for subject_id, subject_data in migrated_data.items():
-            if subject_id == "settings" or not isinstance(subject_data, dict):
-                continue
-            for set_id, set_data in subject_data.get("sets", {}).items():
-                if not isinstance(set_data, dict): continue
-                for task in set_data.get("tasks", []):
-                    if not isinstance(task, dict): continue
-
-                    # Migriert Aufgabenbilder
-                    if 'bilder_aufgabe' not in task and 'bild_aufgabe' in task:
-                        single_image = task.pop('bild_aufgabe', None)
-                        task['bilder_aufgabe'] = [single_image] if single_image else []
-                        needs_saving = True
-
-                    # Migriert Lösungsbilder in Unteraufgaben
-                    for subtask in task.get("unteraufgaben", []):
-                         if not isinstance(subtask, dict): continue
-                         if 'bilder_loesung' not in subtask and 'bild_loesung' in subtask:
-                            single_image = subtask.pop('bild_loesung')
-                            subtask['bilder_loesung'] = [single_image] if single_image else []
-                            needs_saving = True
-
-        if needs_saving:
-            migrated_data["settings"]["data_version"] = 2
-            self.data = migrated_data
-            self.data_manager.save_data(self.data)
-            print("Datenmigration abgeschlossen und gespeichert.")
-
+    def _poll_external_changes(self):
+        """Übernimmt Änderungen, die eine andere Instanz auf derselben Datendatei gespeichert hat."""
+        try:
+            merged = self.store.merge_external_changes()
+        except (OSError, ValueError) as e:
+            print(f"Änderungen einer anderen Instanz konnten nicht übernommen werden: {e}")
+            merged = 0
+        if merged:
+            print(f"{merged} Änderungen einer anderen Instanz übernommen.")
+            for frame in self.container.winfo_children():
+                if hasattr(frame, "refresh_view"):
+                    frame.refresh_view()
+        self.after(constants.EXTERNAL_CHANGE_POLL_MS, self._poll_external_changes)
+
+    @property
+    def data(self):
+        """Die Lernsammlung des Kerns (Fächer, Sets, Aufgaben und Settings)."""
+        return self.store.data
+
+    @property
+    def render_farm(self):
+        """Prozess-Pool für LaTeX-Formeln; wird beim ersten Rendern gestartet."""
+        if self._render_farm is None:
+            from lernapp.core.render_farm import RenderFarm
+            self._render_farm = RenderFarm()
+        return self._render_farm
 
     def apply_theme(self, *args):
-        """Wendet das ausgewählte Farbschema (Theme) auf die gesamte Anwendung an."""
+        """
+        Wendet das ausgewählte Farbschema (Theme) auf die gesamte Anwendung an.
+        Bestehende Widgets werden an Ort und Stelle umgefärbt, ohne die Seite neu aufzubauen.
+        """
         theme_name = self.current_theme.get()
         colors = constants.THEMES[theme_name]
         feedback_colors = constants.FEEDBACK_COLORS[theme_name]
 
-        self.style = ttk.Style(self)
-        self.style.theme_use('clam')
-
         self.configure(bg=colors["bg"])
         self.style.configure(".", background=colors["bg"], foreground=colors["fg"], fieldbackground=colors["text_bg"])
         self.style.configure("TFrame", background=colors["bg"])
@@ -122,13 +157,16 @@ class LernApp(TkinterDnD.Tk):
             self.style.configure("Good.TButton", background=feedback_colors['good'], foreground=utils.get_readable_text_color(feedback_colors['good']), padding=6, relief="flat")
             self.style.configure("Perfect.TButton", background=feedback_colors['perfect'], foreground=utils.get_readable_text_color(feedback_colors['perfect']), padding=6, relief="flat")
 
+        # Klassische tk-Widgets und eigene Zeichnungen folgen nicht dem ttk.Style
+        utils.restyle_widget_tree(self, colors)
+
 
     def _on_close(self):
         """Speichert Daten robust und beendet die Anwendung sauber."""
         try:
             print("Speichere Daten und beende Anwendung...")
             self.data.setdefault("settings", {})["theme"] = self.current_theme.get()
-            self.data_manager.save_data(self.data)
+            self.store.save()
         except Exception as e:
             print(f"Ein Fehler ist beim Speichern aufgetreten: {e}")
             messagebox.showwarning(
@@ -137,6 +175,9 @@ class LernApp(TkinterDnD.Tk):
             )
         finally:
             print("Anwendung wird beendet.")
+            self.store.answer_log.close()
+            if self._render_farm is not None:
+                self._render_farm.shutdown()
             self.destroy()
             self.quit()
 
@@ -149,7 +190,46 @@ class LernApp(TkinterDnD.Tk):
         frame.pack(fill="both", expand=True)
         return frame
 
+def print_startup_report(app):
+    """Gibt die Zeit bis zum ersten gezeichneten Fenster und die bereits geladenen schweren Module aus."""
+    app.update_idletasks()
+    elapsed = time.perf_counter() - _START_TIME
+    print(f"Zeit bis zum ersten Fenster: {elapsed * 1000:.0f} ms")
+    loaded = [name for name in DEFERRED_MODULES if name in sys.modules]
+    print(f"Beim Start geladene schwere Module: {', '.join(loaded) if loaded else 'keine'}")
+    print("Detaillierte Importzeiten: python -X importtime main.py 2> importtime.log")
+
 # --- Startpunkt der Anwendung ---
 if __name__ == "__main__":
-    app = LernApp()
+    parser = argparse.ArgumentParser(description="Lern-Anwendung")
+    parser.add_argument("--startup-report", action="store_true",
+                        help="Zeit bis zum ersten Fenster und geladene Module ausgeben")
+    parser.add_argument("--profile", action="store_true", default=bool(os.environ.get("LERNAPP_PROFILE")),
+                        help="Zeitmessung mit Profiler-Fenster; schreibt beim Beenden einen Chrome-Trace "
+                             f"({constants.TRACE_FILE}). Alternativ: Umgebungsvariable LERNAPP_PROFILE=1")
+    parser.add_argument("--stall-threshold", type=int, default=100,
+                        help="Ab dieser Verzögerung (ms) gilt die Hauptschleife als blockiert (mit --profile)")
+    parser.add_argument("--memory-diagnostics", action="store_true", default=bool(os.environ.get("LERNAPP_MEMORY")),
+                        help="Regelmäßiger Speicherbericht (tracemalloc, Widgets, Bilder, Diagramme) auf der Konsole. "
+                             "Alternativ: Umgebungsvariable LERNAPP_MEMORY=1")
+    parser.add_argument("--learner", default=None, help="Lernprofil, mit dem gestartet wird (ohne Auswahldialog)")
+    args = parser.parse_args()
+    if args.learner is not None:
+        # Ein Tippfehler würde sonst still ein neues, leeres Profil anlegen
+        profiles.check_cli_learner(parser, args.learner)
+
+    if args.profile:
+        from ui import profiler
+        profiler.install(LernApp)
+
+    app = LernApp(profile=args.learner)
+    if args.startup_report:
+        app.after_idle(print_startup_report, app)
+    if args.profile:
+        profiler.start(app, args.stall_threshold)
+    if args.memory_diagnostics:
+        from ui.memory_monitor import MemoryDiagnostics
+        MemoryDiagnostics(app).start()
     app.mainloop()
+    if args.profile:
+        profiler.export()
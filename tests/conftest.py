@@ -0,0 +1,45 @@
+import json
+import os
+import sys
+
+import pytest
+
+# constants.py liegt im Wurzelverzeichnis und wird dort importiert
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+SUBJECT_ID, SET_ID = "fach-1", "set-1"
+
+
+def make_task(task_id, name=None, tags=("Kinematik",)):
+    return {
+        "id": task_id, "name": name or f"Aufgabe {task_id}", "beschreibung": "",
+        "tags": list(tags), "bilder_aufgabe": [],
+        "unteraufgaben": [{"frage": "Frage", "loesung": "Lösung", "bilder_loesung": []}],
+        "history": [], "sm_data": {"status": "new", "next_review_at": 0, "consecutive_good": 0},
+    }
+
+
+def make_collection(task_count=3):
+    return {
+        SUBJECT_ID: {"name": "Mathe", "color": "#FFADAD", "sets": {
+            SET_ID: {"name": "Analysis", "color": "#FFADAD",
+                     "tasks": [make_task(f"t{i}") for i in range(1, task_count + 1)]},
+        }},
+        "settings": {"data_version": 2},
+    }
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """Alle relativen Pfade aus constants (Bilder, Sicherungen, Profile) landen im temporären Ordner."""
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def data_file(workdir):
+    filename = workdir / "lernkarten.json"
+    filename.write_text(json.dumps(make_collection()), encoding="utf-8")
+    return str(filename)
@@ -0,0 +1,81 @@
+import glob
+import json
+import os
+import subprocess
+import sys
+
+from conftest import ROOT, SET_ID, SUBJECT_ID
+from lernapp.core.store import Store
+
+CRASHING_SESSION = """
+import os, sys
+sys.path.insert(0, {root!r})
+from lernapp.core.store import Store
+store = Store("lernkarten.json")
+task = store.locator.get({subject!r}, {set!r}, "t1")
+store.record_answer({subject!r}, {set!r}, task, "good", now=1000.0)
+store.record_answer({subject!r}, {set!r}, task, "bad", now=2000.0)
+store.answer_log.sync()
+os._exit(1) # Absturz: weder speichern noch aufräumen
+"""
+
+
+def _history(store, task_id):
+    return [entry["timestamp"] for entry in store.locator.get(SUBJECT_ID, SET_ID, task_id)["history"]]
+
+
+def test_replay_after_crash(data_file, workdir):
+    code = CRASHING_SESSION.format(root=ROOT, subject=SUBJECT_ID, set=SET_ID)
+    subprocess.run([sys.executable, "-c", code], cwd=workdir, check=False)
+    assert glob.glob("antworten.log.*")
+
+    store = Store(data_file)
+    assert _history(store, "t1") == [1000.0, 2000.0]
+    # Beim Start gespeichert: Das verwaiste Protokoll ist übernommen und gelöscht
+    store.answer_log.close()
+    assert not glob.glob("antworten.log*")
+    assert _history(Store(data_file), "t1") == [1000.0, 2000.0]
+
+
+def test_closed_unsaved_log_is_replayed(data_file):
+    store = Store(data_file)
+    store.record_answer(SUBJECT_ID, SET_ID, store.locator.get(SUBJECT_ID, SET_ID, "t2"), "good", now=500.0)
+    store.answer_log.close()
+
+    assert _history(Store(data_file), "t2") == [500.0]
+
+
+def test_saved_answers_are_not_replayed_twice(data_file):
+    store = Store(data_file)
+    store.record_answer(SUBJECT_ID, SET_ID, store.locator.get(SUBJECT_ID, SET_ID, "t1"), "good", now=1000.0)
+    store.save()
+    # Ein liegengebliebenes Protokoll mit derselben, schon gespeicherten Antwort
+    entry = {"s": SUBJECT_ID, "set": SET_ID, "id": "t1", "q": "good", "ts": 1000.0, "sr": True}
+    with open("antworten.log.99-alt", "w", encoding="utf-8") as f:
+        f.write(json.dumps(entry) + "\n")
+
+    restarted = Store(data_file)
+    assert _history(restarted, "t1") == [1000.0]
+    assert not os.path.exists("antworten.log.99-alt")
+
+
+def test_truncated_last_line_is_ignored(data_file):
+    entry = {"s": SUBJECT_ID, "set": SET_ID, "id": "t3", "q": "ok", "ts": 700.0, "sr": True}
+    with open("antworten.log", "w", encoding="utf-8") as f:
+        f.write(json.dumps(entry) + "\n" + '{"s": "fach-1", "set": "se')
+
+    assert _history(Store(data_file), "t3") == [700.0]
+
+
+def test_save_keeps_the_log_of_another_running_instance(data_file):
+    first = Store(data_file)
+    first.record_answer(SUBJECT_ID, SET_ID, first.locator.get(SUBJECT_ID, SET_ID, "t1"), "good", now=1000.0)
+    second = Store(data_file)
+    second.record_answer(SUBJECT_ID, SET_ID, second.locator.get(SUBJECT_ID, SET_ID, "t2"), "bad", now=2000.0)
+    second.save()
+
+    # Die laufende erste Instanz wurde weder nachgespielt noch geleert
+    assert _history(second, "t1") == []
+    assert [entry["ts"] for entry in first.answer_log.entries()] == [1000.0]
+    first.save()
+    assert _history(Store(data_file), "t1") == [1000.0]
@@ -0,0 +1,68 @@
+import pytest
+
+from conftest import SET_ID, SUBJECT_ID
+from lernapp.core.store import Store
+
+TARGET_SET = "set-2"
+
+
+@pytest.fixture
+def store(data_file):
+    store = Store(data_file)
+    store.data[SUBJECT_ID]["sets"][TARGET_SET] = {"name": "Ziel", "tasks": []}
+    store.mark_changed(SUBJECT_ID, TARGET_SET)
+    return store
+
+
+def _ids(tasks):
+    return [task["id"] for task in tasks]
+
+
+def test_move_keeps_order_progress_and_indexes(store):
+    store.record_answer(SUBJECT_ID, SET_ID, store.locator.get(SUBJECT_ID, SET_ID, "t3"), "good", now=1000.0)
+    assert store.move_tasks(SUBJECT_ID, SET_ID, ["t3", "t1"], SUBJECT_ID, TARGET_SET) == 2
+
+    assert _ids(store.get_tasks(SUBJECT_ID, SET_ID)) == ["t2"]
+    assert _ids(store.get_tasks(SUBJECT_ID, TARGET_SET)) == ["t1", "t3"]
+    assert store.locator.get(SUBJECT_ID, SET_ID, "t1") is None
+    assert len(store.locator.get(SUBJECT_ID, TARGET_SET, "t3")["history"]) == 1
+    assert {(s, t["id"]) for _, s, t in store.tag_index.find_tasks("kinematik")} == {
+        (SET_ID, "t2"), (TARGET_SET, "t1"), (TARGET_SET, "t3")}
+    assert {(s, t["id"]) for _, s, t in store.due_queue.pull_due(now=float("inf"))} == {
+        (SET_ID, "t2"), (TARGET_SET, "t1"), (TARGET_SET, "t3")}
+    assert store.move_tasks(SUBJECT_ID, TARGET_SET, ["t1"], SUBJECT_ID, TARGET_SET) == 0
+
+
+def test_tags_are_added_and_removed_case_insensitively(store):
+    assert store.update_tags(SUBJECT_ID, SET_ID, ["t1", "t2"], add=[" Optik ", "optik", "KINEMATIK"]) == 2
+    assert store.locator.get(SUBJECT_ID, SET_ID, "t1")["tags"] == ["Kinematik", "Optik"]
+
+    store.update_tags(SUBJECT_ID, SET_ID, ["t1"], remove=["kinematik"])
+    assert store.locator.get(SUBJECT_ID, SET_ID, "t1")["tags"] == ["Optik"]
+    assert _ids(t for _, _, t in store.tag_index.find_tasks("Kinematik")) == ["t2", "t3"]
+
+
+def test_reset_and_delete_selected_tasks(store):
+    for task_id in ("t1", "t2"):
+        store.record_answer(SUBJECT_ID, SET_ID, store.locator.get(SUBJECT_ID, SET_ID, task_id), "good", now=1000.0)
+    assert store.reset_tasks_progress(SUBJECT_ID, SET_ID, ["t1"], now=5000.0) == 1
+    t1, t2 = store.get_tasks(SUBJECT_ID, SET_ID)[:2]
+    assert t1["history"] == [] and t1["sm_data"] == {"status": "new", "next_review_at": 5000.0, "consecutive_good": 0}
+    assert len(t2["history"]) == 1
+
+    assert store.delete_tasks(SUBJECT_ID, SET_ID, ["t2", "unbekannt"]) == 1
+    assert _ids(store.get_tasks(SUBJECT_ID, SET_ID)) == ["t1", "t3"]
+    assert store.due_queue.count_due(now=float("inf")) == 2
+
+
+def test_bulk_actions_survive_one_save(store, data_file):
+    store.move_tasks(SUBJECT_ID, SET_ID, ["t1"], SUBJECT_ID, TARGET_SET)
+    store.update_tags(SUBJECT_ID, TARGET_SET, ["t1"], add=["Neu"])
+    store.delete_tasks(SUBJECT_ID, SET_ID, ["t2"])
+    store.save()
+
+    reloaded = Store(data_file)
+    assert _ids(reloaded.get_tasks(SUBJECT_ID, SET_ID)) == ["t3"]
+    assert reloaded.get_tasks(SUBJECT_ID, TARGET_SET)[0]["tags"] == ["Kinematik", "Neu"]
+    assert _ids(t for _, _, t in reloaded.tag_index.find_tasks("neu")) == ["t1"]
+    assert reloaded.due_queue.count_due(now=float("inf")) == 2
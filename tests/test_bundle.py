@@ -0,0 +1,68 @@
+import os
+import zipfile
+
+from conftest import SET_ID, SUBJECT_ID
+from lernapp.core import bundle
+from lernapp.core.store import Store
+
+
+def _with_images(store, workdir):
+    (workdir / "images").mkdir(exist_ok=True)
+    (workdir / "images" / "a.png").write_bytes(b"png-a")
+    (workdir / "images" / "kopie.png").write_bytes(b"png-a") # gleicher Inhalt, anderer Name
+    tasks = store.get_tasks(SUBJECT_ID, SET_ID)
+    tasks[0]["bilder_aufgabe"] = ["images/a.png"]
+    tasks[1]["unteraufgaben"][0]["bilder_loesung"] = ["images/kopie.png", "images/fehlt.png"]
+    store.record_answer(SUBJECT_ID, SET_ID, tasks[2], "good", now=1000.0)
+
+
+def test_export_import_round_trip(data_file, workdir):
+    store = Store(data_file)
+    _with_images(store, workdir)
+    assert bundle.export_bundle(store.data, "mathe.zip", [(SUBJECT_ID, None)]) == 3
+
+    with zipfile.ZipFile("mathe.zip") as archive:
+        images = [name for name in archive.namelist() if name.startswith("images/")]
+        assert len(images) == 1 # inhaltsgleiche Bilder nur einmal, fehlende gar nicht
+
+    os.remove("images/a.png")
+    os.remove("images/kopie.png")
+    assert bundle.import_bundle(store, "mathe.zip") == 3
+    new_set_id = next(set_id for set_id in store.data[SUBJECT_ID]["sets"] if set_id != SET_ID)
+    imported = store.get_tasks(SUBJECT_ID, new_set_id)
+    assert [task["name"] for task in imported] == [task["name"] for task in store.get_tasks(SUBJECT_ID, SET_ID)]
+    assert {task["id"] for task in imported}.isdisjoint(task["id"] for task in store.get_tasks(SUBJECT_ID, SET_ID))
+    assert os.path.isfile(imported[0]["bilder_aufgabe"][0])
+    assert imported[1]["unteraufgaben"][0]["bilder_loesung"] == imported[0]["bilder_aufgabe"]
+    assert [entry["timestamp"] for entry in imported[2]["history"]] == [1000.0]
+
+    reloaded = Store(data_file)
+    assert [task["id"] for task in reloaded.get_tasks(SUBJECT_ID, new_set_id)] == [task["id"] for task in imported]
+
+
+def test_export_without_progress(data_file):
+    store = Store(data_file)
+    store.record_answer(SUBJECT_ID, SET_ID, store.get_tasks(SUBJECT_ID, SET_ID)[0], "good", now=1000.0)
+    bundle.export_bundle(store.data, "ohne.zip", [(SUBJECT_ID, SET_ID)], include_progress=False)
+
+    bundle.import_bundle(store, "ohne.zip")
+    new_set_id = next(set_id for set_id in store.data[SUBJECT_ID]["sets"] if set_id != SET_ID)
+    assert all(task["history"] == [] for task in store.get_tasks(SUBJECT_ID, new_set_id))
+
+    reloaded = Store(data_file)
+    assert len(reloaded.get_tasks(SUBJECT_ID, new_set_id)) == 3
+
+
+def test_snapshots_are_taken_per_batch(data_file):
+    store = Store(data_file)
+    items = bundle.iter_selection(store.data, [(SUBJECT_ID, SET_ID)], batch_size=2, snapshot=True)
+    assert next(items)[0] == "set"
+    first_batch = next(items)[1]
+    # Änderungen nach der Kopie eines Batches erreichen den Export nicht mehr
+    store.get_tasks(SUBJECT_ID, SET_ID)[0]["name"] = "Später geändert"
+    assert first_batch[0]["name"] == "Aufgabe t1"
+    assert len(first_batch) == 2 and [len(batch) for _, batch in items] == [1]
+
+    count = bundle.write_bundle("teil.zip", bundle.iter_selection(store.data, [(SUBJECT_ID, SET_ID)], snapshot=True),
+                                total=3)
+    assert count == 3
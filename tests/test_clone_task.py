@@ -0,0 +1,70 @@
+from conftest import SET_ID, SUBJECT_ID, make_task
+from lernapp.core.store import Store, clone_task
+
+
+def _answered_task():
+    task = make_task("t1")
+    task["history"] = [{"timestamp": 1000.0, "quality": "good"}]
+    task["sm_data"] = {"status": "good", "next_review_at": 2000.0, "consecutive_good": 1}
+    return task
+
+
+def test_clone_shares_content_and_copies_progress():
+    task = _answered_task()
+    clone = clone_task(task)
+
+    assert clone["id"] != task["id"]
+    assert clone["tags"] is task["tags"]
+    assert clone["unteraufgaben"] is task["unteraufgaben"]
+    assert clone["history"] == task["history"] and clone["history"] is not task["history"]
+    assert clone["history"][0] is not task["history"][0]
+    assert clone["sm_data"] == task["sm_data"] and clone["sm_data"] is not task["sm_data"]
+
+
+def test_clone_without_progress_starts_new():
+    clone = clone_task(_answered_task(), include_progress=False)
+    assert clone["history"] == [] and clone["sm_data"] == {}
+
+
+def test_progress_of_a_copy_evolves_separately(data_file):
+    store = Store(data_file)
+    original = store.locator.get(SUBJECT_ID, SET_ID, "t1")
+    store.copy_tasks(SUBJECT_ID, SET_ID, ["t1"], SUBJECT_ID, SET_ID)
+    copy = store.get_tasks(SUBJECT_ID, SET_ID)[-1]
+
+    store.record_answer(SUBJECT_ID, SET_ID, copy, "good", now=1000.0)
+    assert original["history"] == []
+    assert original["sm_data"]["status"] == "new"
+    assert copy["sm_data"] != original["sm_data"]
+
+
+def test_bulk_edit_replaces_shared_values(data_file):
+    store = Store(data_file)
+    original = store.locator.get(SUBJECT_ID, SET_ID, "t1")
+    new_set_id = store.duplicate_set(SUBJECT_ID, SET_ID)
+    copy = store.get_tasks(SUBJECT_ID, new_set_id)[0]
+    assert copy["tags"] is original["tags"]
+
+    store.update_tags(SUBJECT_ID, new_set_id, [copy["id"]], add=["Neu"], remove=["Kinematik"])
+    assert copy["tags"] == ["Neu"]
+    assert original["tags"] == ["Kinematik"]
+    assert [task["id"] for _, _, task in store.tag_index.find_tasks("Neu")] == [copy["id"]]
+    assert copy["id"] not in [task["id"] for _, _, task in store.tag_index.find_tasks("Kinematik")]
+
+
+def test_duplicates_survive_save_and_reload(data_file):
+    store = Store(data_file)
+    new_set_id = store.duplicate_set(SUBJECT_ID, SET_ID, include_progress=False)
+    store.save()
+
+    # Die Teilung gilt nur im Speicher: Die Datei enthält jede Kopie vollständig
+    with open(data_file, encoding="utf-8") as f:
+        assert f.read().count('"Aufgabe t1"') == 2
+    reloaded = Store(data_file)
+    copies = reloaded.get_tasks(SUBJECT_ID, new_set_id)
+    originals = reloaded.get_tasks(SUBJECT_ID, SET_ID)
+    assert len(copies) == len(originals)
+    assert {task["id"] for task in copies}.isdisjoint(task["id"] for task in originals)
+    assert copies[0]["unteraufgaben"] is not originals[0]["unteraufgaben"]
+    copies[0]["unteraufgaben"][0]["frage"] = "Geändert"
+    assert originals[0]["unteraufgaben"][0]["frage"] == "Frage"
@@ -0,0 +1,112 @@
+import json
+import os
+import sqlite3
+import zipfile
+
+import pytest
+
+from conftest import SET_ID, SUBJECT_ID
+from lernapp.core import importer
+from lernapp.core.store import Store
+
+
+def test_same_named_images_copied_in_parallel_stay_apart(data_file, workdir):
+    (workdir / "images").mkdir()
+    rows = ["frage,loesung,bilder"]
+    for i in range(120):
+        folder = workdir / "quelle" / f"ordner{i}"
+        folder.mkdir(parents=True)
+        (folder / "image.png").write_bytes(f"bild {i}".encode())
+        rows.append(f"Frage {i},Lösung {i},quelle/ordner{i}/image.png")
+    (workdir / "karten.csv").write_text("\n".join(rows), encoding="utf-8")
+
+    store = Store(data_file)
+    assert importer.import_file(store, "karten.csv", SUBJECT_ID, SET_ID, workers=8) == 120
+
+    imported = store.get_tasks(SUBJECT_ID, SET_ID)[3:]
+    paths = [task["bilder_aufgabe"][0] for task in imported]
+    assert len(set(paths)) == 120
+    for i, path in enumerate(paths):
+        assert os.path.basename(path).endswith("_image.png")
+        with open(path, "rb") as f:
+            assert f.read() == f"bild {i}".encode()
+
+
+def test_batches_are_committed_and_shared_images_copied_once(data_file, workdir):
+    (workdir / "images").mkdir()
+    (workdir / "bild.png").write_bytes(b"png")
+    rows = ["frage;loesung;tags;bilder"] + [f"Frage {i};Lösung {i};Optik, Neu;bild.png" for i in range(5)]
+    (workdir / "karten.csv").write_text("\n".join(rows), encoding="utf-8")
+    store = Store(data_file)
+    reports = []
+
+    assert importer.import_file(store, "karten.csv", SUBJECT_ID, SET_ID, batch_size=2,
+                                progress=reports.append) == 5
+    assert reports == [2, 4, 5]
+    assert len(os.listdir("images")) == 1
+
+    reloaded = Store(data_file)
+    imported = reloaded.get_tasks(SUBJECT_ID, SET_ID)[3:]
+    assert [task["unteraufgaben"][0]["frage"] for task in imported] == [f"Frage {i}" for i in range(5)]
+    assert imported[0]["tags"] == ["Optik", "Neu"] and imported[0]["layout"]
+    assert len(reloaded.tag_index.find_tasks("optik")) == 5
+    assert reloaded.due_queue.count_due(now=float("inf")) == 8
+
+
+def test_batches_are_saved_once_unless_the_interval_has_passed(data_file, workdir, monkeypatch):
+    rows = ["frage,loesung"] + [f"Frage {i},Lösung {i}" for i in range(5)]
+    (workdir / "karten.csv").write_text("\n".join(rows), encoding="utf-8")
+    store = Store(data_file)
+    saves = []
+    monkeypatch.setattr(store, "save", lambda: saves.append(len(store.get_tasks(SUBJECT_ID, SET_ID))))
+
+    importer.import_file(store, "karten.csv", SUBJECT_ID, SET_ID, batch_size=2)
+    assert saves == [8]
+    saves.clear()
+    importer.import_file(store, "karten.csv", SUBJECT_ID, SET_ID, batch_size=2, save_interval=0)
+    assert saves == [10, 12, 13, 13]
+
+
+def test_markdown_tasks_with_subtasks_and_images(workdir):
+    (workdir / "karten.md").write_text(
+        "Vorspann wird ignoriert\n"
+        "# Pendel\nEin Faden.\nTags: Mechanik; Schwingung\n![Skizze](skizze.png)\n"
+        "## Wie lang ist die Periode?\n---\n$T = 2\\pi\\sqrt{l/g}$\n![](loesung.png)\n"
+        "# Zweite\n## Frage\n", encoding="utf-8")
+
+    first, second = importer.read_records("karten.md")
+    assert first["name"] == "Pendel" and first["beschreibung"] == "Ein Faden."
+    assert first["tags"] == ["Mechanik", "Schwingung"]
+    assert first["bilder_aufgabe"] == [str(workdir / "skizze.png")]
+    assert first["unteraufgaben"] == [{"frage": "Wie lang ist die Periode?", "loesung": "$T = 2\\pi\\sqrt{l/g}$",
+                                       "bilder_loesung": [str(workdir / "loesung.png")]}]
+    assert second["unteraufgaben"][0]["loesung"] == ""
+
+
+def test_anki_notes_become_tasks_with_unpacked_media(data_file, workdir):
+    (workdir / "images").mkdir()
+    (workdir / "anki").mkdir()
+    connection = sqlite3.connect(workdir / "anki" / "collection.anki2")
+    connection.execute("CREATE TABLE notes (id INTEGER, flds TEXT, tags TEXT)")
+    connection.execute("INSERT INTO notes VALUES (1, ?, ?)",
+                       ("Was ist <b>\\(E\\)</b>?<br>Energie\x1f<img src=\"e.png\">[$]mc^2[/$]", " physik "))
+    connection.commit()
+    connection.close()
+    with zipfile.ZipFile("deck.apkg", "w") as archive:
+        archive.write(workdir / "anki" / "collection.anki2", "collection.anki2")
+        archive.writestr("media", json.dumps({"0": "e.png"}))
+        archive.writestr("0", b"png-e")
+
+    store = Store(data_file)
+    assert importer.import_file(store, "deck.apkg", SUBJECT_ID, SET_ID) == 1
+    task = store.get_tasks(SUBJECT_ID, SET_ID)[-1]
+    assert task["unteraufgaben"][0]["frage"] == "Was ist $E$?\nEnergie"
+    assert task["unteraufgaben"][0]["loesung"] == "$mc^2$"
+    assert task["tags"] == ["physik"]
+    with open(task["unteraufgaben"][0]["bilder_loesung"][0], "rb") as f:
+        assert f.read() == b"png-e"
+
+
+def test_unknown_formats_are_rejected(workdir):
+    with pytest.raises(ValueError):
+        importer.read_records("karten.xlsx")
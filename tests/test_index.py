@@ -0,0 +1,90 @@
+import heapq
+from collections import Counter
+
+from conftest import SET_ID, SUBJECT_ID, make_collection, make_task
+from lernapp.core.index import DueQueue, TagIndex, TaskLocator
+
+
+def _ids(found):
+    return sorted(task["id"] for _, _, task in found)
+
+
+def test_locator_follows_inserted_and_removed_tasks():
+    data = make_collection()
+    tasks = data[SUBJECT_ID]["sets"][SET_ID]["tasks"]
+    locator = TaskLocator(data)
+    assert locator.get(SUBJECT_ID, SET_ID, "t3") is tasks[2]
+
+    tasks.insert(0, make_task("t0")) # gemerkte Positionen sind jetzt verschoben
+    assert locator.get(SUBJECT_ID, SET_ID, "t3") is tasks[3]
+    del tasks[3]
+    assert locator.get(SUBJECT_ID, SET_ID, "t3") is None
+    assert locator.get(SUBJECT_ID, "fehlt", "t1") is None
+    assert locator.get("fehlt", SET_ID, "t1") is None
+
+
+def test_tag_index_is_built_once_and_case_insensitive():
+    data = make_collection()
+    data[SUBJECT_ID]["sets"][SET_ID]["tasks"][0]["tags"] = ["Optik", " kinematik "]
+    index = TagIndex(data)
+    assert index.all_tags() == ["kinematik", "optik"]
+    assert data["settings"]["tag_index"] is index.index
+
+    assert _ids(index.find_tasks("KINEMATIK")) == ["t1", "t2", "t3"]
+    assert _ids(index.find_tasks("optik, Kinematik")) == ["t1", "t2", "t3"] # jede Karte nur einmal
+    assert index.find_tasks(" , ") == []
+
+
+def test_tag_index_follows_edits_and_drops_stale_entries():
+    data = make_collection()
+    index = TagIndex(data)
+    tasks = data[SUBJECT_ID]["sets"][SET_ID]["tasks"]
+
+    index.update_task(SUBJECT_ID, SET_ID, "t1", tasks[0]["tags"], ["Optik"])
+    tasks[0]["tags"] = ["Optik"]
+    index.remove_task("t2", tasks[1]["tags"])
+    del tasks[1]
+    assert _ids(index.find_tasks("optik")) == ["t1"]
+    assert _ids(index.find_tasks("kinematik")) == ["t3"]
+
+    # Ohne Meldung an den Index geänderte Karten werden beim Suchen bereinigt
+    tasks[1]["tags"] = []
+    assert index.find_tasks("kinematik") == []
+    assert index.all_tags() == ["optik"]
+
+
+def _queue(task_count):
+    data = make_collection(task_count)
+    for i, task in enumerate(data[SUBJECT_ID]["sets"][SET_ID]["tasks"]):
+        task["sm_data"]["next_review_at"] = float(i)
+    return data, DueQueue(data)
+
+
+def test_pull_due_repushes_changed_cards_after_compaction(monkeypatch):
+    data, queue = _queue(100)
+    tasks = data[SUBJECT_ID]["sets"][SET_ID]["tasks"]
+    # Überholte, noch nicht fällige Einträge: das erste push im Abruf verdichtet den Heap
+    queue.heap.extend([5000.0, f"t{i % 100 + 1}", SUBJECT_ID, SET_ID] for i in range(300))
+    heapq.heapify(queue.heap)
+    for task in tasks[1:11]:
+        task["sm_data"]["next_review_at"] = 50.5 # ohne push geändert
+
+    pulled = queue.pull_due(limit=20, now=1000.0)
+
+    assert [task["id"] for _, _, task in pulled] == ["t1"] + [f"t{i}" for i in range(12, 31)]
+    assert max(Counter(entry[1] for entry in queue.heap if queue._is_current(entry)).values()) == 1
+    assert queue.count_due(now=1000.0) == 100
+    assert len(queue.pull_due(now=1000.0)) == 100
+
+
+def test_pull_due_returns_changed_cards_that_are_still_due():
+    data, queue = _queue(30)
+    tasks = data[SUBJECT_ID]["sets"][SET_ID]["tasks"]
+    for i, task in enumerate(tasks[1:11]):
+        task["sm_data"]["next_review_at"] = 500.0 + i # ohne push geändert, weiterhin fällig
+
+    pulled = queue.pull_due(limit=30, now=1000.0)
+
+    assert [task["id"] for _, _, task in pulled] == ["t1"] + [f"t{i}" for i in range(12, 31)] + [f"t{i}" for i in range(2, 12)]
+    assert max(Counter(entry[1] for entry in queue.heap if queue._is_current(entry)).values()) == 1
+    assert queue.count_due(now=1000.0) == 30
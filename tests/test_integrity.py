@@ -0,0 +1,112 @@
+import json
+import os
+import time
+
+import pytest
+
+from conftest import SET_ID, SUBJECT_ID, make_collection
+from lernapp.core import integrity
+from lernapp.core.store import DataManager, Store
+
+
+def _write(path, data, now):
+    integrity.write_json_atomic(str(path), data, snapshot=False)
+    return integrity.take_snapshot(str(path), now=now, min_interval=0)
+
+
+def _corrupt(path, content):
+    """Eine neue, kaputte Datei; die Sicherung ist ein Hardlink auf die alte und bleibt intakt."""
+    os.remove(path)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(content)
+
+
+def test_failed_write_keeps_the_old_file(workdir):
+    integrity.write_json_atomic("daten.json", {"a": 1})
+    with pytest.raises(TypeError):
+        integrity.write_json_atomic("daten.json", {"a": object()})
+
+    with open("daten.json", encoding="utf-8") as f:
+        assert json.load(f) == {"a": 1}
+    assert integrity.read_checksum("daten.json") == integrity.file_checksum("daten.json")
+    assert not os.path.exists("daten.json.tmp")
+
+
+def test_snapshots_are_rate_limited_and_rotated(workdir):
+    start = time.time()
+    integrity.write_json_atomic("anna-2.json", {}, snapshot=False)
+    for i in range(4):
+        _write(workdir / "anna.json", {"stand": i}, now=start + i * 60)
+    assert len(integrity.list_snapshots("anna.json")) == 4
+    assert integrity.take_snapshot("anna.json", now=start + 3 * 60 + 1, min_interval=600) is None
+
+    integrity.take_snapshot("anna.json", now=start + 3600, keep=2, min_interval=0)
+    snapshots = integrity.list_snapshots("anna.json")
+    assert len(snapshots) == 2
+    assert all(os.path.basename(path).startswith("anna-") for path in snapshots)
+    assert integrity.list_snapshots("anna-2.json") == []
+
+
+def test_corrupt_file_is_restored_from_the_newest_intact_snapshot(workdir):
+    _write(workdir / "daten.json", {"stand": 1}, now=time.time())
+    newest = _write(workdir / "daten.json", {"stand": 2}, now=time.time() + 60)
+    _corrupt("daten.json", '{"stand": ')
+    with open(newest, "a", encoding="utf-8") as f:
+        f.write(" ") # Prüfsumme stimmt nicht mehr
+
+    data, source = integrity.load_json("daten.json")
+    assert data == {"stand": 1}
+    assert source == integrity.list_snapshots("daten.json")[0]
+    assert integrity.read_checksum("daten.json") == integrity.file_checksum("daten.json")
+    corrupt = [name for name in os.listdir() if name.startswith("daten.json.defekt-")]
+    assert len(corrupt) == 1
+
+
+def test_same_named_files_in_different_directories_keep_their_own_snapshots(workdir):
+    (workdir / "a").mkdir()
+    (workdir / "b").mkdir()
+    file_a, file_b = str(workdir / "a" / "lernkarten.json"), str(workdir / "b" / "lernkarten.json")
+    DataManager(file_a).save_data({"fach": "A"})
+    DataManager(file_b).save_data({"fach": "B"})
+    assert not os.path.exists(workdir / "backups")
+    assert len(integrity.list_snapshots(file_a)) == len(integrity.list_snapshots(file_b)) == 1
+
+    _corrupt(file_b, '{"fach": ')
+    data_manager = DataManager(file_b)
+    assert data_manager.load_data() == {"fach": "B"}
+    assert os.path.dirname(data_manager.recovered_from) == str(workdir / "b" / "backups")
+
+
+def test_without_intact_snapshot_the_file_stays_untouched(workdir):
+    with open("daten.json", "w", encoding="utf-8") as f:
+        f.write("kaputt")
+    with pytest.raises(integrity.DataCorruptedError):
+        integrity.load_json("daten.json")
+    with open("daten.json", encoding="utf-8") as f:
+        assert f.read() == "kaputt"
+
+
+def test_store_recovers_snapshot_and_replays_answers(data_file):
+    store = Store(data_file)
+    store.save() # legt die erste Sicherung an
+    store.record_answer(SUBJECT_ID, SET_ID, store.locator.get(SUBJECT_ID, SET_ID, "t1"), "good", now=1000.0)
+    store.answer_log.close() # Absturz vor dem nächsten Speichern
+    with open(data_file, "rb") as f:
+        _corrupt(data_file, f.read(100).decode("utf-8"))
+
+    recovered = Store(data_file)
+    assert [task["id"] for task in recovered.get_tasks(SUBJECT_ID, SET_ID)] == ["t1", "t2", "t3"]
+    assert [entry["timestamp"] for entry in recovered.locator.get(SUBJECT_ID, SET_ID, "t1")["history"]] == [1000.0]
+
+
+def test_verify_reports_broken_entries(workdir):
+    data = make_collection()
+    tasks = data[SUBJECT_ID]["sets"][SET_ID]["tasks"]
+    tasks[1]["id"] = "t1"
+    tasks[2]["sm_data"] = {"status": "vergessen", "interval": "drei"}
+    tasks[2]["history"] = [{"timestamp": None}]
+    tasks[0]["bilder_aufgabe"] = ["", "images/fehlt.png"]
+
+    kinds = sorted(kind for kind, _, _ in integrity.verify(data))
+    assert kinds == ["bild", "id", "sm_data", "sm_data", "verlauf"]
+    assert integrity.verify(make_collection()) == []
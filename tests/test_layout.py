@@ -0,0 +1,40 @@
+from conftest import make_task
+from lernapp.core import layout, sync
+
+
+def test_parse_splits_lines_into_text_and_formula_runs():
+    assert layout.parse_layout("Es gilt $x^2$ und\nkein $ Abschluss$a") == [
+        [["t", "Es gilt "], ["f", "x^2"], ["t", " und"]],
+        [["t", "kein "], ["f", " Abschluss"], ["t", "a"]],
+    ]
+    assert layout.parse_layout("$a\nb$") == [[["t", "$a"]], [["t", "b$"]]]
+    assert layout.parse_layout("") == [[]]
+
+
+def test_rebuild_keeps_unchanged_texts_and_drops_stale_ones():
+    task = make_task("t1")
+    task["beschreibung"] = "Kraft $F = m a$"
+    cache = layout.build_task_layout(task)
+    question = cache[layout.content_hash("Frage")]
+
+    task["beschreibung"] = "Impuls $p = m v$"
+    cache = layout.build_task_layout(task)
+    assert cache[layout.content_hash("Frage")] is question
+    assert layout.content_hash("Kraft $F = m a$") not in cache
+    assert set(cache) == {layout.content_hash(text) for text in layout.task_texts(task)}
+    assert layout.formulas_in(task) == ["p = m v"]
+
+
+def test_cards_without_cache_are_laid_out_once():
+    task = make_task("t1")
+    lines = layout.layout_for(task, "Lösung $E$")
+    assert layout.layout_for(task, "Lösung $E$") is lines
+    assert task["layout"] == {layout.content_hash("Lösung $E$"): [[["t", "Lösung "], ["f", "E"]]]}
+
+
+def test_cache_does_not_count_as_a_content_change():
+    task = make_task("t1")
+    _, before, _ = sync.task_entry("fach", "set", task)
+    layout.build_task_layout(task)
+    _, after, _ = sync.task_entry("fach", "set", task)
+    assert before == after
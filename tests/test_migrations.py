@@ -0,0 +1,102 @@
+import json
+
+import pytest
+
+from conftest import SET_ID, SUBJECT_ID, make_collection
+from lernapp.core import migrations
+from lernapp.core.migrations import Migration
+from lernapp.core.store import Store
+
+
+class Interrupted(Exception):
+    pass
+
+
+def legacy_collection(set_count=3):
+    """Eine Sammlung der Schemaversion 1 mit Einzelbildern statt Bilderlisten."""
+    data = make_collection()
+    del data["settings"]["data_version"]
+    template = data[SUBJECT_ID]["sets"].pop(SET_ID)
+    for i in range(set_count):
+        tasks = []
+        for task in json.loads(json.dumps(template["tasks"])):
+            task["id"] = f"s{i}-{task['id']}"
+            del task["bilder_aufgabe"]
+            task["bild_aufgabe"] = "images/a.png"
+            for subtask in task["unteraufgaben"]:
+                del subtask["bilder_loesung"]
+                subtask["bild_loesung"] = ""
+            tasks.append(task)
+        data[SUBJECT_ID]["sets"][f"set-{i}"] = dict(template, tasks=tasks)
+    return data
+
+
+def test_images_become_lists():
+    data = legacy_collection(set_count=1)
+    assert migrations.migrate_data(data) == 1
+
+    task = data[SUBJECT_ID]["sets"]["set-0"]["tasks"][0]
+    assert task["bilder_aufgabe"] == ["images/a.png"] and "bild_aufgabe" not in task
+    assert task["unteraufgaben"][0]["bilder_loesung"] == []
+    assert migrations.data_version(data) == migrations.current_version()
+    assert "migration" not in data["settings"]
+    assert migrations.pending_steps(data) == []
+
+
+def test_steps_are_repeatable():
+    data = legacy_collection(set_count=1)
+    migrations.migrate_data(data)
+    migrated = json.loads(json.dumps(data))
+    for subject_id, set_id, set_data in migrations._sets(data):
+        migrations._images_as_lists(subject_id, set_id, set_data)
+    assert data == migrated
+
+
+@pytest.fixture
+def counting_step(monkeypatch):
+    """Ersetzt die registrierten Schritte durch einen, der die bearbeiteten Sets zählt."""
+    visited = []
+    monkeypatch.setattr(migrations, "MIGRATIONS", [
+        Migration(2, "Test", lambda subject_id, set_id, set_data: visited.append(set_id)),
+    ])
+    return visited
+
+
+def test_interrupted_migration_resumes_with_remaining_sets(counting_step):
+    data = legacy_collection(set_count=3)
+    saved = []
+
+    def checkpoint(current):
+        saved.append(json.loads(json.dumps(current)))
+        if len(saved) == 2:
+            raise Interrupted() # Absturz nach dem zweiten Zwischenstand
+
+    with pytest.raises(Interrupted):
+        migrations.migrate_data(data, checkpoint=checkpoint, checkpoint_interval=0)
+
+    resumed = saved[-1]
+    assert resumed["settings"]["migration"] == {"version": 2, "done": [[SUBJECT_ID, "set-0"], [SUBJECT_ID, "set-1"]]}
+    assert migrations.data_version(resumed) == migrations.LEGACY_VERSION
+
+    counting_step.clear()
+    migrations.migrate_data(resumed)
+    assert counting_step == ["set-2"]
+    assert migrations.data_version(resumed) == 2
+    assert "migration" not in resumed["settings"]
+
+
+def test_progress_counts_every_set(counting_step):
+    reports = []
+    migrations.migrate_data(legacy_collection(set_count=3), progress=lambda done, total: reports.append((done, total)))
+    assert reports == [(1, 3), (2, 3), (3, 3)]
+
+
+def test_store_migrates_and_saves_on_load(workdir):
+    with open("lernkarten.json", "w", encoding="utf-8") as f:
+        json.dump(legacy_collection(set_count=2), f)
+
+    Store("lernkarten.json")
+    with open("lernkarten.json", encoding="utf-8") as f:
+        saved = json.load(f)
+    assert migrations.data_version(saved) == migrations.current_version()
+    assert all("bilder_aufgabe" in task for set_data in saved[SUBJECT_ID]["sets"].values() for task in set_data["tasks"])
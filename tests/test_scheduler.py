@@ -0,0 +1,88 @@
+import pytest
+
+import constants
+from lernapp.core import scheduler
+from lernapp.core.scheduler import DAY, REPEAT_LATER, REPEAT_SOON
+
+NOW = 1_000_000.0
+
+
+def legacy_review(sm_data, quality, now):
+    """Die frühere Planung aus QuizFrame.update_task_spaced_repetition (Einfügen in die Sitzung als Rückgabe)."""
+    current_status = sm_data.get('status', 'new')
+    repeat = None
+    if quality == 'bad':
+        sm_data['status'] = 'bad'
+        sm_data['consecutive_good'] = 0
+        repeat = REPEAT_SOON
+    elif quality == 'ok':
+        sm_data['status'] = 'ok'
+        sm_data['consecutive_good'] = 0
+        repeat = REPEAT_LATER
+    elif quality == 'good':
+        if current_status == 'good':
+            sm_data['status'] = 'mastered'
+        else:
+            sm_data['status'] = 'good'
+            repeat = REPEAT_LATER
+    elif quality == 'perfect':
+        sm_data['status'] = 'perfect'
+    sm_data['next_review_at'] = now + constants.STATUS_INTERVALS.get(sm_data['status'], 30) * DAY
+    return repeat
+
+
+@pytest.mark.parametrize("qualities", [
+    ["good", "good", "good"], ["bad", "ok", "good", "perfect"], ["perfect", "good", "bad", "good", "good"],
+    ["ok", "ok", "bad", "bad"],
+])
+def test_classic_matches_the_former_quiz_logic(qualities):
+    legacy = {'status': 'new', 'consecutive_good': 0}
+    classic = {'status': 'new', 'consecutive_good': 0}
+    for step, quality in enumerate(qualities):
+        now = NOW + step * DAY
+        assert scheduler.ClassicScheduler().review(classic, quality, now) == legacy_review(legacy, quality, now)
+        assert {key: classic[key] for key in legacy} == legacy
+
+
+def test_sm2_grows_intervals_with_ease():
+    sm2 = scheduler.SM2Scheduler()
+    sm_data = {}
+    intervals = []
+    for step in range(3):
+        sm2.review(sm_data, "good", NOW + step * DAY)
+        intervals.append(sm_data["interval"])
+    assert intervals == [1, 6, 15]
+    assert sm_data["ease"] == 2.5
+
+    assert sm2.review(sm_data, "bad", NOW) == REPEAT_SOON
+    assert (sm_data["interval"], sm_data["reps"], sm_data["ease"]) == (0, 0, 1.96)
+    assert sm_data["next_review_at"] == NOW
+
+
+def test_fsrs_intervals_follow_stability_and_retention():
+    fsrs = scheduler.FSRSScheduler()
+    sm_data = {}
+    fsrs.review(sm_data, "good", NOW)
+    assert sm_data["stability"] == pytest.approx(fsrs.w[2])
+    assert sm_data["interval"] == 4
+
+    now, intervals = NOW, [sm_data["interval"]]
+    for _ in range(3):
+        now += sm_data["interval"] * DAY
+        fsrs.review(sm_data, "good", now)
+        intervals.append(sm_data["interval"])
+    assert intervals == sorted(intervals) and intervals[-1] > intervals[0]
+
+    assert fsrs.review(sm_data, "bad", now) == REPEAT_SOON
+    assert sm_data["next_review_at"] == now
+    stricter = scheduler.FSRSScheduler({"retention": 0.95})
+    assert stricter.next_interval(10.0) < fsrs.next_interval(10.0)
+
+
+def test_set_scheduler_and_subject_parameters():
+    settings = {"scheduler_params": {"sm2": {"initial_ease": 2.0}},
+                "subject_scheduler_params": {"fach-1": {"sm2": {"initial_ease": 3.0}}}}
+    assert isinstance(scheduler.scheduler_for_set({}), scheduler.ClassicScheduler)
+    assert isinstance(scheduler.get_scheduler("unbekannt"), scheduler.ClassicScheduler)
+    assert scheduler.scheduler_for_set({"scheduler": "sm2"}, settings).params == {"initial_ease": 2.0}
+    assert scheduler.scheduler_for_set({"scheduler": "sm2"}, settings, "fach-1").params == {"initial_ease": 3.0}
@@ -0,0 +1,59 @@
+import pytest
+
+from conftest import SET_ID, SUBJECT_ID
+from lernapp.core import sync
+from lernapp.core.store import Store
+
+
+@pytest.fixture
+def store(data_file):
+    return Store(data_file)
+
+
+def _no_full_walk(monkeypatch):
+    def fail(data):
+        raise AssertionError("Speichern darf nicht die ganze Sammlung durchlaufen")
+    monkeypatch.setattr(sync, "fingerprints", fail)
+
+
+def test_save_fingerprints_only_changed_entries(store, monkeypatch):
+    expected = sync.fingerprints(store.data)
+    _no_full_walk(monkeypatch)
+    store.record_answer(SUBJECT_ID, SET_ID, store.locator.get(SUBJECT_ID, SET_ID, "t2"), "good", now=1000.0)
+    store.data[SUBJECT_ID]["name"] = "Physik"
+    store.mark_changed(SUBJECT_ID)
+    store.save()
+
+    monkeypatch.undo()
+    assert store._saved_fingerprints == sync.fingerprints(store.data)
+    assert store._saved_fingerprints["task:t2"] != expected["task:t2"]
+    assert store._saved_fingerprints["task:t1"] == expected["task:t1"]
+
+
+def test_moved_tasks_keep_their_fingerprint(store):
+    store.data[SUBJECT_ID]["sets"]["set-2"] = {"name": "Ziel", "tasks": []}
+    store.mark_changed(SUBJECT_ID, "set-2")
+    store.move_tasks(SUBJECT_ID, SET_ID, ["t1"], SUBJECT_ID, "set-2")
+    store.save()
+    assert store._saved_fingerprints == sync.fingerprints(store.data)
+
+
+def test_deleting_a_set_prunes_queue_and_fingerprints(store, monkeypatch):
+    _no_full_walk(monkeypatch)
+    store.delete_set(SUBJECT_ID, SET_ID)
+    store.save()
+
+    assert store.due_queue.count_due(now=float("inf")) == 0
+    assert store.due_queue.pull_due(now=float("inf")) == []
+    assert list(store._saved_fingerprints) == [f"subject:{SUBJECT_ID}"]
+    assert store.tag_index.find_tasks("Kinematik") == []
+
+
+def test_deleting_a_subject_survives_reload(store, data_file):
+    store.delete_subject(SUBJECT_ID)
+    store.save()
+    assert store._saved_fingerprints == {}
+
+    reloaded = Store(data_file)
+    assert reloaded.subjects() == []
+    assert reloaded.due_queue.count_due(now=float("inf")) == 0
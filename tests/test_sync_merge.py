@@ -0,0 +1,162 @@
+import json
+import threading
+import urllib.error
+
+import pytest
+
+from conftest import SET_ID, SUBJECT_ID, make_collection
+from lernapp.core import sync
+from lernapp.core.store import Store
+from lernapp.core.sync_server import SyncServer
+
+
+@pytest.fixture
+def server(workdir):
+    (workdir / "server").mkdir()
+    server = SyncServer(("127.0.0.1", 0), str(workdir / "server" / "sync_server.json"))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server, f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+class Client:
+    """Eine Installation mit eigener Datendatei und eigenem Sync-Status."""
+    def __init__(self, directory, url, data, learner=None):
+        directory.mkdir()
+        self.filename = str(directory / "lernkarten.json")
+        with open(self.filename, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        self.state_file = str(directory / "sync_status.json")
+        self.url = url
+        self.store = Store(self.filename, answer_log_filename=str(directory / "antworten.log"), profile=learner)
+
+    def sync(self):
+        return sync.sync(self.store, self.url, sync.SyncState(self.state_file))
+
+    def task(self, task_id):
+        return self.store.locator.get(SUBJECT_ID, SET_ID, task_id)
+
+
+@pytest.fixture
+def clients(workdir, server):
+    _, url = server
+    first = Client(workdir / "a", url, make_collection())
+    second = Client(workdir / "b", url, {"settings": {"data_version": 2}})
+    first.sync()
+    second.sync()
+    return first, second
+
+
+def test_initial_sync_replicates_the_collection(clients):
+    first, second = clients
+    assert [task["id"] for task in second.store.get_tasks(SUBJECT_ID, SET_ID)] == ["t1", "t2", "t3"]
+    assert second.store.data[SUBJECT_ID]["name"] == "Mathe"
+
+
+def test_conflicting_edits_last_writer_wins(clients):
+    first, second = clients
+    first.task("t1")["name"] = "Von A"
+    second.task("t1")["name"] = "Von B"
+    first.sync()
+    second.sync() # B synchronisiert zuletzt und gewinnt
+    first.sync()
+
+    assert first.task("t1")["name"] == second.task("t1")["name"] == "Von B"
+
+
+def test_histories_are_united(clients):
+    first, second = clients
+    first.store.record_answer(SUBJECT_ID, SET_ID, first.task("t2"), "good", now=1000.0)
+    second.store.record_answer(SUBJECT_ID, SET_ID, second.task("t2"), "bad", now=2000.0)
+    for client in (first, second, first):
+        client.sync()
+
+    for client in (first, second):
+        assert [entry["timestamp"] for entry in client.task("t2")["history"]] == [1000.0, 2000.0]
+    # Die Lerndaten der jüngsten Wiederholung gewinnen
+    assert first.task("t2")["sm_data"] == second.task("t2")["sm_data"]
+    assert first.task("t2")["sm_data"]["status"] == "bad"
+
+
+def test_progress_stays_with_its_learner(workdir, server):
+    sync_server, url = server
+    anna = Client(workdir / "a", url, make_collection(), learner="Anna")
+    ben = Client(workdir / "b", url, {"settings": {"data_version": 2}}, learner="Ben")
+    anna.sync()
+    ben.sync()
+    anna.store.record_answer(SUBJECT_ID, SET_ID, anna.task("t2"), "good", now=1000.0)
+    ben.store.record_answer(SUBJECT_ID, SET_ID, ben.task("t2"), "bad", now=2000.0)
+    anna.task("t1")["name"] = "Von Anna"
+    for client in (anna, ben, anna):
+        client.sync()
+
+    assert ben.task("t1")["name"] == "Von Anna" # Inhalte gehen an alle
+    assert [entry["timestamp"] for entry in anna.task("t2")["history"]] == [1000.0]
+    assert [entry["timestamp"] for entry in ben.task("t2")["history"]] == [2000.0]
+    assert anna.task("t2")["sm_data"]["status"] != "bad"
+    assert sync_server.progress["Anna"]["t2"][1] == [[1000.0, "good"]]
+    assert sync_server.progress["Ben"]["t2"][1] == [[2000.0, "bad"]]
+    assert sync_server.store.locator.get(SUBJECT_ID, SET_ID, "t2")["history"] == []
+
+    # Eine weitere Installation mit Annas Profil erhält nur Annas Fortschritt
+    response = sync._request(f"{url}/sync", {"version": sync.SYNC_VERSION, "replica": "neu", "learner": "Anna",
+                                             "vector": {}, "changes": []})
+    progress = [change for change in response["changes"] if change["kind"] == "progress"]
+    assert progress and {change["learner"] for change in progress} == {"Anna"}
+
+
+def test_deletions_are_replicated(clients):
+    first, second = clients
+    first.store.delete_tasks(SUBJECT_ID, SET_ID, ["t3"])
+    first.store.save()
+    first.sync()
+    second.sync()
+
+    assert second.task("t3") is None
+    assert second.store.due_queue.count_due(now=float("inf")) == 2
+
+
+def test_version_vectors_send_only_new_changes(clients, server):
+    first, second = clients
+    first.task("t1")["name"] = "Geändert"
+    assert first.sync() == (1, 0)
+    second.task("t2")["name"] = "Auch geändert"
+    assert second.sync() == (1, 1)
+    assert first.sync() == (0, 1)
+    assert first.sync() == (0, 0)
+    assert second.sync() == (0, 0)
+
+    first_state = sync.SyncState(first.state_file)
+    second_state = sync.SyncState(second.state_file)
+    assert first_state.vector == {second_state.replica: second_state.counter}
+    assert second_state.vector == {first_state.replica: first_state.counter}
+    assert server[0].state.vector == {first_state.replica: first_state.counter,
+                                      second_state.replica: second_state.counter}
+
+
+def test_edits_during_the_exchange_are_sent_next_time(clients):
+    first, second = clients
+    sync_round = sync.SyncRound(first.store, first.url, sync.SyncState(first.state_file))
+    sync_round.collect()
+    first.task("t1")["name"] = "Während des Abgleichs"
+    sync_round.exchange()
+    assert sync_round.apply() == (0, 0)
+
+    assert first.sync() == (1, 0)
+    second.sync()
+    assert second.task("t1")["name"] == "Während des Abgleichs"
+
+
+def test_unknown_change_kinds_are_rejected(clients, server):
+    first, _ = clients
+    request = {"version": sync.SYNC_VERSION, "replica": "fremd", "vector": {},
+               "changes": [{"kind": "bogus", "id": "x", "n": 1, "o": "fremd", "t": 1.0}]}
+    with pytest.raises(urllib.error.HTTPError) as error:
+        sync._request(f"{first.url}/sync", request)
+    assert error.value.code == 400
+    assert "fremd" not in server[0].state.vector
+
+    with pytest.raises(ValueError):
+        sync.Merger(first.store, sync.SyncState(first.state_file)).apply({"kind": "bogus", "id": "x"})
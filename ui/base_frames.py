@@ -24,14 +24,14 @@ class BasePage(ttk.Frame):
         self.theme_button.pack(side='right', padx=5)
 
     def toggle_theme(self):
-        """Wechselt zwischen Light- und Dark-Mode."""
+        """Wechselt zwischen Light- und Dark-Mode, ohne die Seite neu aufzubauen."""
         new_theme = "dark" if self.controller.current_theme.get() == "light" else "light"
+        # Der Trace auf current_theme färbt alle bestehenden Widgets um (LernApp.apply_theme)
         self.controller.current_theme.set(new_theme)
 
-        # Speichert Argumente, um den Frame nach dem Theme-Wechsel neu zu erstellen
-        current_frame_class = self.__class__
-        current_args = getattr(self, "init_args", {})
-        self.controller.show_frame(current_frame_class, **current_args)
+    def on_theme_changed(self, colors):
+        theme_toggle_text = "Light Mode" if self.controller.current_theme.get() == "dark" else "Dark Mode"
+        self.theme_button.config(text=theme_toggle_text)
 
     def add_nav_button(self, text, command, side='left'):
         ttk.Button(self.nav_bar, text=text, command=command).pack(side=side, padx=5)
@@ -45,10 +45,10 @@ class BaseTileFrame(BasePage):
     def __init__(self, parent, controller, **kwargs):
         self.init_args = kwargs
         super().__init__(parent, controller)
-        bg_color = constants.THEMES[self.controller.current_theme.get()]["bg"]
+        colors = constants.THEMES[self.controller.current_theme.get()]
 
         # Canvas für scrollbaren Inhalt
-        self.canvas = tk.Canvas(self.content_frame, borderwidth=0, highlightthickness=0, bg=bg_color)
+        self.canvas = utils.theme_widget(tk.Canvas(self.content_frame, borderwidth=0, highlightthickness=0), colors, bg="bg")
         self.scrollbar = ttk.Scrollbar(self.content_frame, orient="vertical", command=self.canvas.yview)
         self.tiles_frame = ttk.Frame(self.canvas)
 
@@ -70,6 +70,8 @@ class BaseTileFrame(BasePage):
         for name, hex_code in constants.PASTEL_COLORS.items():
             color_menu.add_command(label=name, background=hex_code, command=lambda h=hex_code: self.change_item_color(item_id, item_type, h))
         menu.add_cascade(label="Farbe ändern", menu=color_menu)
+        menu.add_command(label="Duplizieren", command=lambda: self.duplicate_item(item_id, item_type))
+        menu.add_command(label="Exportieren...", command=lambda: self.export_item(item_id, item_type))
         menu.add_separator()
         menu.add_command(label="Löschen", command=lambda: self.delete_item(item_id, item_type), foreground="red")
         menu.tk_popup(event.x_root, event.y_root)
@@ -78,4 +80,6 @@ class BaseTileFrame(BasePage):
     def rename_item(self, item_id, item_type): pass
     def change_item_color(self, item_id, item_type, hex_code): pass
     def delete_item(self, item_id, item_type): pass
+    def duplicate_item(self, item_id, item_type): pass
+    def export_item(self, item_id, item_type): pass
     def refresh_view(self): pass
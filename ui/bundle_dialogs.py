@@ -0,0 +1,92 @@
+"""Dialoge zum Exportieren und Importieren von Lern-Bundles (siehe lernapp.core.bundle)."""
+import queue
+import re
+from tkinter import filedialog, messagebox
+
+from .custom_dialogs import ProgressDialog
+from lernapp.core import bundle
+
+FILETYPES = [("Lern-Bundle", "*.zip"), ("Alle Dateien", "*.*")]
+MAX_PENDING_BATCHES = 2
+FEED_MS = 20
+
+
+def export_dialog(parent, controller, selection, suggested_name):
+    """Fragt nach Zieldatei und Fortschritt und exportiert die Auswahl [(subject_id, set_id)]."""
+    filename = filedialog.asksaveasfilename(title="Als Bundle exportieren", defaultextension=".zip", filetypes=FILETYPES,
+                                            initialfile=re.sub(r'[\\/:*?"<>|]', "_", suggested_name) + ".zip")
+    if not filename: return
+    include_progress = messagebox.askyesno("Lernfortschritt", "Soll der Lernfortschritt (Verlauf und Fälligkeiten) "
+                                           "mitexportiert werden?", parent=parent)
+
+    def done(count, error):
+        if error:
+            messagebox.showerror("Export fehlgeschlagen", str(error), parent=parent)
+        else:
+            messagebox.showinfo("Export abgeschlossen", f"{count} Karten wurden exportiert.", parent=parent)
+
+    # Der Tk-Thread kopiert die Aufgaben batchweise, der Hintergrund-Thread schreibt sie.
+    # Es liegen höchstens MAX_PENDING_BATCHES Kopien gleichzeitig im Speicher.
+    batches = queue.Queue(maxsize=MAX_PENDING_BATCHES)
+    snapshots = bundle.iter_selection(controller.data, selection, snapshot=True)
+    total = bundle.count_tasks(controller.data, selection)
+    stopped = []
+
+    def feed():
+        while not stopped and not batches.full():
+            try:
+                item = next(snapshots, None)
+            except Exception as e: # z.B. während des Exports gelöschte Daten
+                item = e
+            batches.put(item)
+            if item is None or isinstance(item, Exception):
+                return
+        if not stopped:
+            parent.after(FEED_MS, feed)
+
+    def items():
+        while True:
+            item = batches.get()
+            if item is None:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+
+    def finished(count, error):
+        stopped.append(True)
+        done(count, error)
+
+    feed()
+    ProgressDialog(parent, controller, "Exportieren...",
+                   lambda progress: bundle.write_bundle(filename, items(), include_progress, total, progress),
+                   finished)
+
+
+def import_dialog(parent, controller, subject_id=None, on_finished=None):
+    """Importiert ein Bundle; ohne subject_id werden die Fächer des Bundles übernommen."""
+    filename = filedialog.askopenfilename(title="Bundle importieren", filetypes=FILETYPES)
+    if not filename: return
+
+    # Lesen und Entpacken im Hintergrund; jeder Batch wird im Tk-Thread übernommen
+    bundle_import = bundle.BundleImport(controller.store, subject_id)
+
+    def read(progress, put):
+        read_count = 0
+        for batch in bundle.read_bundle(filename):
+            put(batch)
+            read_count += len(batch[2])
+            progress(read_count)
+
+    def done(_, error):
+        controller.store.save() # Auch nach einem Fehler, damit die übernommenen Karten erhalten bleiben
+        if error:
+            messagebox.showerror("Import fehlgeschlagen", f"{error}\n\nBereits {bundle_import.imported} Karten wurden übernommen.",
+                                 parent=parent)
+        else:
+            messagebox.showinfo("Import abgeschlossen", f"{bundle_import.imported} Karten wurden importiert.", parent=parent)
+        if on_finished:
+            on_finished()
+
+    ProgressDialog(parent, controller, "Importieren...", read, done,
+                   on_item=lambda batch: bundle_import.commit(*batch))
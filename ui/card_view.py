@@ -0,0 +1,239 @@
+import tkinter as tk
+from tkinter import ttk, messagebox
+import os
+from PIL import Image, ImageTk
+
+import utils
+from lernapp.core import layout, render_farm
+
+# Abfrageintervall (ms) für Formeln, die noch in der RenderFarm gerendert werden
+FORMULA_POLL_MS = 30
+IMAGE_THUMBNAIL_SIZE = (450, 450)
+
+
+def show_image_popup(parent, path, theme_colors):
+    """Öffnet ein Bild in einem großen Popup-Fenster."""
+    popup = tk.Toplevel(parent)
+    popup.title(os.path.basename(path))
+    popup.configure(bg=theme_colors['bg'])
+    popup.bind("<Escape>", lambda e: popup.destroy())
+
+    close_button = ttk.Button(popup, text="X", command=popup.destroy, style="Danger.TButton")
+    close_button.pack(anchor="ne", padx=10, pady=10)
+
+    try:
+        img = Image.open(path)
+        screen_width = parent.winfo_screenwidth() * 0.8
+        screen_height = parent.winfo_screenheight() * 0.8
+        img.thumbnail((screen_width, screen_height), Image.Resampling.LANCZOS)
+        photo = ImageTk.PhotoImage(img)
+
+        img_label_popup = ttk.Label(popup, image=photo)
+        img_label_popup.image = photo # Referenz behalten
+        img_label_popup.pack(padx=20, pady=(0, 20), expand=True, fill="both")
+
+        popup.update_idletasks()
+        toplevel = parent.winfo_toplevel()
+        x = toplevel.winfo_x() + (toplevel.winfo_width() // 2) - (popup.winfo_width() // 2)
+        y = toplevel.winfo_y() + (toplevel.winfo_height() // 2) - (popup.winfo_height() // 2)
+        popup.geometry(f"+{int(x)}+{int(y)}")
+    except Exception as e:
+        popup.destroy()
+        messagebox.showerror("Fehler", f"Bild konnte nicht geladen werden:\n{e}")
+        return
+
+    popup.transient(parent.winfo_toplevel())
+    popup.grab_set()
+
+
+class CardView(ttk.Frame):
+    """
+    Zeigt eine ganze Karte (Aufgabe, Teilaufgaben, Lösungen, Bilder und Formeln)
+    in einem einzigen tk.Text an. Formeln und Bilder werden mit image_create
+    eingebettet, Lösungen über elide-Tags ein- und ausgeblendet. Die Anzahl der
+    Widgets ist damit unabhängig von der Länge der Karte.
+    Bei einem Theme-Wechsel werden nur die Formelbilder gegen die Variante für
+    das neue Theme getauscht; gerenderte Varianten bleiben im Cache.
+    """
+    def __init__(self, parent, controller, theme_colors):
+        super().__init__(parent)
+        self.controller = controller
+        self.theme_colors = theme_colors
+        self._photo_references = []
+        self._formula_photos = {} # (formula, style) -> PhotoImage, für beide Themes
+        self._embedded_formulas = [] # (image_name, formula)
+        self._pending_formulas = [] # (Marke oder image_name, formula, future, tags)
+        self._poll_id = None
+        self._image_count = 0
+        self.task, self.style = None, None
+
+        self.text = utils.theme_widget(tk.Text(self, wrap="word", borderwidth=0, highlightthickness=0, cursor="arrow",
+                                               padx=10, pady=5, font=("Helvetica", 10), spacing1=2, spacing3=2),
+                                       theme_colors, bg="bg", fg="fg")
+        scrollbar = ttk.Scrollbar(self, orient="vertical", command=self.text.yview)
+        self.text.configure(yscrollcommand=scrollbar.set)
+        scrollbar.pack(side="right", fill="y")
+        self.text.pack(side="left", fill="both", expand=True)
+
+        self.text.tag_configure("heading", font=("Helvetica", 12, "bold"), spacing1=10, spacing3=4)
+        self.text.tag_configure("subheading", font=("Helvetica", 11, "bold"), spacing1=10, spacing3=2, lmargin1=15)
+        self.text.tag_configure("subtask", lmargin1=15, lmargin2=15)
+        self.text.tag_configure("solution", lmargin1=30, lmargin2=30)
+        self.text.tag_configure("info", font=("Helvetica", 9, "italic"))
+        self.text.tag_configure("link", foreground="#3A7BD5", underline=True, lmargin1=15)
+        self.text.tag_bind("link", "<Enter>", lambda e: self.text.config(cursor="hand2"))
+        self.text.tag_bind("link", "<Leave>", lambda e: self.text.config(cursor="arrow"))
+        self.text.configure(state="disabled")
+
+    def destroy(self):
+        if self._poll_id is not None:
+            self.after_cancel(self._poll_id)
+            self._poll_id = None
+        super().destroy()
+
+    def show_task(self, task, style, info_text=""):
+        """Schreibt die komplette Karte in das Textfeld; alle Lösungen sind zunächst verborgen."""
+        self.task = task
+        self.style = style
+        self._photo_references.clear()
+        self._formula_photos.clear() # Nur die Formeln der angezeigten Karte behalten
+        self._embedded_formulas.clear()
+        self._pending_formulas.clear()
+
+        self.text.configure(state="normal")
+        self.text.delete("1.0", "end")
+
+        self._insert(task.get('name', 'Aufgabe') + "\n", ("heading",))
+        self._insert_content(task.get('beschreibung', ''), task.get('bilder_aufgabe', []), ())
+        if info_text:
+            self._insert(info_text + "\n", ("info",))
+
+        for i, subtask in enumerate(task.get("unteraufgaben", [])):
+            self._insert(f"Teilaufgabe {chr(97 + i)}\n", ("subheading",))
+            self._insert_content(subtask.get("frage", ''), [], ("subtask",))
+
+            toggle_tag = f"toggle_{i}"
+            self._insert("Lösung anzeigen\n", ("link", toggle_tag))
+            self.text.tag_bind(toggle_tag, "<Button-1>", lambda e, i=i: self.toggle_solution(i))
+
+            solution_tag = f"solution_{i}"
+            self.text.tag_configure(solution_tag, elide=True)
+            self._insert_content(subtask.get('loesung', ''), subtask.get('bilder_loesung', []), ("solution", solution_tag))
+
+        self.text.configure(state="disabled")
+        self.text.yview_moveto(0)
+        self._poll_formulas()
+
+    def on_theme_changed(self, colors):
+        """Tauscht alle Formelbilder gegen die Variante für das neue Theme."""
+        self.theme_colors = colors
+        if self.task is None: return
+        self.style = render_farm.style_for(colors['fg'], colors['bg'])
+        # Noch nicht eingefügte Formeln werden im neuen Stil angefordert
+        self._pending_formulas = [(target, formula, self.controller.render_farm.submit(formula, self.style), tags)
+                                  for target, formula, _, tags in self._pending_formulas]
+        for name, formula in self._embedded_formulas:
+            photo = self._formula_photos.get((formula, self.style))
+            if photo:
+                self.text.image_configure(name, image=photo)
+            else:
+                self._pending_formulas.append((name, formula, self.controller.render_farm.submit(formula, self.style), ()))
+        self._embedded_formulas = [(name, formula) for name, formula in self._embedded_formulas
+                                   if (formula, self.style) in self._formula_photos]
+        if self._poll_id is None:
+            self._poll_formulas()
+
+    def toggle_solution(self, subtask_index):
+        """Blendet die Lösung einer Teilaufgabe ein oder aus."""
+        solution_tag = f"solution_{subtask_index}"
+        hidden = str(self.text.tag_cget(solution_tag, "elide")) in ("1", "true")
+        self.text.tag_configure(solution_tag, elide=not hidden)
+
+    def _insert(self, text, tags):
+        self.text.insert("end", text, tags)
+
+    def _insert_content(self, text_content, image_paths, tags):
+        """Fügt Text und Formeln aus dem Layout der Karte sowie die Bilder ein."""
+        for line in layout.layout_for(self.task, text_content):
+            for kind, value in line:
+                if kind == layout.FORMULA:
+                    self._insert_formula(value, tags)
+                else:
+                    self._insert(value, tags)
+            self._insert("\n", tags)
+
+        for path in image_paths:
+            if path and os.path.exists(path):
+                self._insert_image(path, tags)
+
+    def _insert_formula(self, formula, tags):
+        """Bettet eine Formel ein; ist sie noch nicht gerendert, wird ihre Position markiert."""
+        future = self.controller.render_farm.submit(formula, self.style)
+        if future.done():
+            self._embed_formula(formula, future.result(), "end-1c", tags)
+            return
+        mark = f"formula_{len(self._pending_formulas)}_{self.text.index('end-1c')}"
+        self.text.mark_set(mark, "end-1c")
+        self.text.mark_gravity(mark, "left") # Bleibt vor dem danach eingefügten Text stehen
+        self._pending_formulas.append((mark, formula, future, tags))
+
+    def _formula_photo(self, formula, png):
+        """PhotoImage einer Formel im aktuellen Stil; bleibt für spätere Theme-Wechsel erhalten."""
+        key = (formula, self.style)
+        if key not in self._formula_photos:
+            latex_img = utils.png_to_image(png)
+            if not latex_img: return None
+            self._formula_photos[key] = ImageTk.PhotoImage(latex_img)
+        return self._formula_photos[key]
+
+    def _embed_formula(self, formula, png, index, tags):
+        photo = self._formula_photo(formula, png)
+        if not photo: return
+        name = self.text.image_create(index, image=photo, align="center")
+        for tag in tags:
+            self.text.tag_add(tag, name)
+        self._embedded_formulas.append((name, formula))
+
+    def _poll_formulas(self):
+        """Setzt fertig gerenderte Formeln an ihren markierten Positionen ein bzw. tauscht sie aus."""
+        self._poll_id = None
+        if not self._pending_formulas: return
+        still_pending = []
+        self.text.configure(state="normal")
+        for target, formula, future, tags in self._pending_formulas:
+            if not future.done():
+                still_pending.append((target, formula, future, tags))
+                continue
+            png = future.result() if future.exception() is None else None
+            if target in self.text.image_names():
+                # Bereits eingebettete Formel nach einem Theme-Wechsel
+                photo = self._formula_photo(formula, png)
+                if photo:
+                    self.text.image_configure(target, image=photo)
+                    self._embedded_formulas.append((target, formula))
+            else:
+                self._embed_formula(formula, png, target, tags)
+                self.text.mark_unset(target)
+        self.text.configure(state="disabled")
+        self._pending_formulas = still_pending
+        if still_pending:
+            self._poll_id = self.after(FORMULA_POLL_MS, self._poll_formulas)
+
+    def _insert_image(self, path, tags):
+        """Bettet ein Bild als Vorschau ein; ein Klick öffnet es in voller Größe."""
+        try:
+            img = Image.open(path)
+            img.thumbnail(IMAGE_THUMBNAIL_SIZE, Image.Resampling.LANCZOS)
+            photo = ImageTk.PhotoImage(img)
+        except Exception as e:
+            print(f"Fehler beim Laden des Bildes {path}: {e}")
+            self._insert("Bild konnte nicht geladen werden.\n", tags)
+            return
+        self._photo_references.append(photo)
+        self._image_count += 1
+        image_tag = f"image_{self._image_count}"
+        name = self.text.image_create("end-1c", image=photo, padx=5, pady=5)
+        for tag in tags + (image_tag,):
+            self.text.tag_add(tag, name)
+        self.text.tag_bind(image_tag, "<Button-1>", lambda e, p=path: show_image_popup(self, p, self.theme_colors))
+        self._insert("\n", tags)
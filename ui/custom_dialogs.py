@@ -1,3 +1,5 @@
+import queue
+import threading
 import tkinter as tk
 from tkinter import simpledialog, ttk
 import constants
@@ -7,9 +9,10 @@ class CustomAskString(simpledialog.Dialog):
     Ein benutzerdefiniertes Dialogfeld, das das askstring-Verhalten nachahmt,
     aber das Anwendungs-Theme respektiert.
     """
-    def __init__(self, parent, title, prompt, controller, **kwargs):
+    def __init__(self, parent, title, prompt, controller, initialvalue="", **kwargs):
         self.controller = controller
         self.prompt_text = prompt
+        self.initialvalue = initialvalue
         super().__init__(parent, title=title)
 
     def body(self, master):
@@ -24,6 +27,7 @@ class CustomAskString(simpledialog.Dialog):
         self.label = ttk.Label(master, text=self.prompt_text, justify=tk.LEFT)
         self.label.pack(pady=(10, 5), padx=10)
         self.entry = ttk.Entry(master, width=40)
+        self.entry.insert(0, self.initialvalue)
         self.entry.pack(pady=(0, 10), padx=10)
 
         return self.entry
@@ -47,7 +51,150 @@ class CustomAskString(simpledialog.Dialog):
         self.result = self.entry.get()
 
 # Eine Hilfsfunktion, um den neuen Dialog einfacher aufzurufen
-def ask_string_themed(parent, title, prompt, controller):
+def ask_string_themed(parent, title, prompt, controller, initialvalue=""):
     """Zeigt einen benutzerdefinierten Dialog an, der das App-Theme verwendet."""
-    dialog = CustomAskString(parent, title=title, prompt=prompt, controller=controller)
+    dialog = CustomAskString(parent, title=title, prompt=prompt, controller=controller, initialvalue=initialvalue)
     return dialog.result
+
+
+class CustomAskChoice(CustomAskString):
+    """Wie CustomAskString, aber mit einer Auswahlliste statt eines Eingabefelds."""
+    def __init__(self, parent, title, prompt, controller, choices):
+        self.choices = list(choices)
+        super().__init__(parent, title, prompt, controller)
+
+    def body(self, master):
+        super().body(master)
+        self.entry.destroy()
+        self.entry = ttk.Combobox(master, values=self.choices, state="readonly", width=50)
+        if self.choices:
+            self.entry.current(0)
+        self.entry.pack(pady=(0, 10), padx=10)
+        return self.entry
+
+    def apply(self):
+        self.result = self.entry.current() if self.entry.current() >= 0 else None
+
+def ask_choice_themed(parent, title, prompt, controller, choices):
+    """Lässt einen Eintrag aus 'choices' auswählen und gibt dessen Index zurück (oder None)."""
+    dialog = CustomAskChoice(parent, title=title, prompt=prompt, controller=controller, choices=choices)
+    return dialog.result
+
+
+class StartupProgress:
+    """
+    Fortschrittsanzeige für Arbeit im Tk-Thread, bevor die Hauptschleife läuft
+    (z.B. die Datenmigration beim Laden). Das Fenster erscheint erst beim ersten
+    Aufruf von progress(erledigt, gesamt) und wird dabei jeweils neu gezeichnet.
+    """
+    def __init__(self, parent, controller, title):
+        self.parent = parent
+        self.controller = controller
+        self.title = title
+        self.window = None
+
+    def __call__(self, done, total=0):
+        if self.window is None:
+            self.window = tk.Toplevel(self.parent)
+            self.window.title(self.title)
+            self.window.resizable(False, False)
+            self.window.configure(bg=constants.THEMES[self.controller.current_theme.get()]['bg'])
+            frame = ttk.Frame(self.window, padding=20)
+            frame.pack(fill="both", expand=True)
+            self.label = ttk.Label(frame, text="Bitte warten...")
+            self.label.pack(pady=(0, 10))
+            self.bar = ttk.Progressbar(frame, length=300, mode="determinate")
+            self.bar.pack()
+        self.bar.configure(maximum=max(total, 1), value=done)
+        self.label.config(text=f"{done} von {total}")
+        self.window.update()
+
+    def close(self):
+        if self.window is not None:
+            self.window.destroy()
+            self.window = None
+
+
+class ProgressDialog(tk.Toplevel):
+    """
+    Modales Fortschrittsfenster für lange Vorgänge. work(progress) läuft in einem
+    Hintergrund-Thread und meldet sich über progress(erledigt, gesamt); das Fenster
+    fragt den Stand per after() ab und ruft am Ende on_done(ergebnis, fehler)
+    im Tk-Thread auf.
+
+    Mit on_item wird work(progress, put) aufgerufen: Was der Thread mit put übergibt,
+    übernimmt on_item(element) im Tk-Thread, sodass nur dort die Sammlung geändert
+    wird. put blockiert, solange MAX_PENDING Elemente ausstehen.
+    """
+    POLL_MS = 100
+    MAX_PENDING = 4
+
+    def __init__(self, parent, controller, title, work, on_done, on_item=None):
+        super().__init__(parent)
+        self.title(title)
+        self.transient(parent)
+        self.resizable(False, False)
+        self.protocol("WM_DELETE_WINDOW", lambda: None) # Nicht abbrechbar
+        self.configure(bg=constants.THEMES[controller.current_theme.get()]['bg'])
+
+        frame = ttk.Frame(self, padding=20)
+        frame.pack(fill="both", expand=True)
+        self.label = ttk.Label(frame, text="Bitte warten...")
+        self.label.pack(pady=(0, 10))
+        self.bar = ttk.Progressbar(frame, length=300, mode="determinate")
+        self.bar.pack()
+
+        self.on_done = on_done
+        self.on_item = on_item
+        self._items = queue.Queue(maxsize=self.MAX_PENDING)
+        self._state = {"done": 0, "total": 0, "result": None, "error": None, "finished": False, "cancelled": False}
+        args = (self._progress, self._put) if on_item else (self._progress,)
+        threading.Thread(target=self._run, args=(work, args), daemon=True).start()
+        self.grab_set()
+        self.after(self.POLL_MS, self._poll)
+
+    def _progress(self, done, total=0):
+        self._state["done"], self._state["total"] = done, total
+
+    def _put(self, item):
+        while True:
+            if self._state["cancelled"]:
+                raise RuntimeError("Abgebrochen, da ein Zwischenergebnis nicht übernommen werden konnte.")
+            try:
+                self._items.put(item, timeout=self.POLL_MS / 1000)
+                return
+            except queue.Full:
+                continue
+
+    def _run(self, work, args):
+        try:
+            self._state["result"] = work(*args)
+        except Exception as e:
+            if self._state["error"] is None: # Der Fehler aus on_item hat Vorrang
+                self._state["error"] = e
+        self._state["finished"] = True
+
+    def _poll(self):
+        state = self._state
+        while not state["cancelled"]:
+            try:
+                item = self._items.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                self.on_item(item)
+            except Exception as e:
+                state["error"], state["cancelled"] = e, True
+        if state["total"]:
+            self.bar.configure(maximum=state["total"], value=state["done"])
+            self.label.config(text=f"{state['done']} von {state['total']}")
+        elif state["done"]:
+            self.bar.configure(mode="indeterminate")
+            self.bar.step()
+            self.label.config(text=f"{state['done']} erledigt")
+        if not state["finished"] or not (state["cancelled"] or self._items.empty()):
+            self.after(self.POLL_MS, self._poll)
+            return
+        self.grab_release()
+        self.destroy()
+        self.on_done(state["result"], state["error"])
@@ -4,14 +4,16 @@ import uuid
 import os
 import shutil
 import copy
+import time
 from collections import deque
 
-from tkinterdnd2 import DND_FILES
-from PIL import Image, ImageTk, ImageGrab
+from PIL import Image, ImageTk
 
 from .base_frames import BasePage
+from . import custom_dialogs
 import utils
 import constants
+from lernapp.core import layout
 
 # Prüft, ob ein Tool zum Zugriff auf die Zwischenablage für Bilder verfügbar ist
 CLIPBOARD_TOOL_AVAILABLE = shutil.which('xclip') or shutil.which('wl-paste')
@@ -76,7 +78,7 @@ class BaseTaskEditor(ttk.Frame):
         # Textfeld für die Aufgabenbeschreibung
         desc_frame = ttk.LabelFrame(parent, text="Aufgabenbeschreibung")
         desc_frame.pack(pady=10, padx=10, fill="x")
-        self.task_desc_text = tk.Text(desc_frame, height=4, wrap=tk.WORD, bg=colors["text_bg"], fg=colors["fg"], insertbackground=colors['fg'])
+        self.task_desc_text = utils.theme_widget(tk.Text(desc_frame, height=4, wrap=tk.WORD), colors, bg="text_bg", fg="fg", insertbackground="fg")
         self.task_desc_text.pack(pady=5, padx=5, fill="x", expand=True)
         self.task_desc_text.bind('<Control-v>', self._handle_paste_main) # Einfügen aus Zwischenablage
         self.task_desc_text.bind('<Control-a>', self._select_all) # Alles auswählen
@@ -90,10 +92,12 @@ class BaseTaskEditor(ttk.Frame):
 
         img_drop_frame_task = ttk.Frame(task_images_container)
         img_drop_frame_task.pack(fill="x", expand=True, padx=5, pady=5)
-        drop_zone_task = tk.Label(img_drop_frame_task, text="Bilder hierher ziehen oder auswählen...", relief="groove", borderwidth=2, padx=10, pady=10, background=colors["bg"], foreground=colors["fg"])
+        drop_zone_task = utils.theme_widget(tk.Label(img_drop_frame_task, text="Bilder hierher ziehen oder auswählen...", relief="groove", borderwidth=2, padx=10, pady=10), colors, background="bg", foreground="fg")
         drop_zone_task.pack(side="left", fill="x", expand=True)
-        drop_zone_task.drop_target_register(DND_FILES)
-        drop_zone_task.dnd_bind('<<Drop>>', self._on_drop_task_image)
+        dnd_files = utils.enable_drag_and_drop(self)
+        if dnd_files:
+            drop_zone_task.drop_target_register(dnd_files)
+            drop_zone_task.dnd_bind('<<Drop>>', self._on_drop_task_image)
         ttk.Button(img_drop_frame_task, text="...", command=self.select_task_image, width=4).pack(side="left", padx=10)
 
         # Eingabefeld für Tags
@@ -115,7 +119,7 @@ class BaseTaskEditor(ttk.Frame):
         colors = constants.THEMES[self.controller.current_theme.get()]
 
         # Container für eine einzelne Teilaufgabe
-        container = tk.Frame(self.subtasks_frame, bg=colors.get("subtask_bg", colors["bg"]), bd=1, relief="sunken")
+        container = utils.theme_widget(tk.Frame(self.subtasks_frame, bd=1, relief="sunken"), colors, bg="subtask_bg")
         container.pack(pady=5, fill="x", padx=5)
 
         label_text = f"Teilaufgabe {chr(97 + len(self.subtask_widgets))})"
@@ -127,11 +131,11 @@ class BaseTaskEditor(ttk.Frame):
         delete_subtask_button.place(relx=1.0, x=-5, y=-8, anchor="ne")
 
         # Eingabefelder für Frage und Lösung
-        q_text = tk.Text(frame, height=2, wrap=tk.WORD, bg=colors["text_bg"], fg=colors["fg"], insertbackground=colors['fg'])
+        q_text = utils.theme_widget(tk.Text(frame, height=2, wrap=tk.WORD), colors, bg="text_bg", fg="fg", insertbackground="fg")
         q_text.pack(fill="x", padx=5, pady=5)
         q_text.insert("1.0", subtask_data.get("frage", ""))
 
-        s_text = tk.Text(frame, height=2, wrap=tk.WORD, bg=colors["text_bg"], fg=colors["fg"], insertbackground=colors['fg'])
+        s_text = utils.theme_widget(tk.Text(frame, height=2, wrap=tk.WORD), colors, bg="text_bg", fg="fg", insertbackground="fg")
         s_text.pack(fill="x", padx=5, pady=5)
         s_text.insert("1.0", subtask_data.get("loesung", ""))
 
@@ -158,10 +162,12 @@ class BaseTaskEditor(ttk.Frame):
         # Drag-and-Drop für Lösungsbilder
         img_drop_frame_solution = ttk.Frame(solution_images_container)
         img_drop_frame_solution.pack(fill="x", expand=True, padx=5, pady=5)
-        drop_zone_solution = tk.Label(img_drop_frame_solution, text="Lösungsbilder hierher ziehen...", relief="groove", borderwidth=2, padx=10, pady=10, background=colors["bg"], foreground=colors["fg"])
+        drop_zone_solution = utils.theme_widget(tk.Label(img_drop_frame_solution, text="Lösungsbilder hierher ziehen...", relief="groove", borderwidth=2, padx=10, pady=10), colors, background="bg", foreground="fg")
         drop_zone_solution.pack(side="left", fill="x", expand=True)
-        drop_zone_solution.drop_target_register(DND_FILES)
-        drop_zone_solution.dnd_bind('<<Drop>>', lambda e, w=widgets: self._on_drop_solution_image(e, w))
+        dnd_files = utils.enable_drag_and_drop(self)
+        if dnd_files:
+            drop_zone_solution.drop_target_register(dnd_files)
+            drop_zone_solution.dnd_bind('<<Drop>>', lambda e, w=widgets: self._on_drop_solution_image(e, w))
         ttk.Button(img_drop_frame_solution, text="...", command=lambda w=widgets: self.select_solution_image(w), width=4).pack(side="left", padx=10)
 
 
@@ -301,6 +307,7 @@ class BaseTaskEditor(ttk.Frame):
         """Verarbeitet das Einfügen von Bildern in das Haupt-Beschreibungsfeld."""
         if not CLIPBOARD_TOOL_AVAILABLE: return
         try:
+            from PIL import ImageGrab # Wird erst beim ersten Einfügen geladen
             clipboard_content = ImageGrab.grabclipboard()
             if isinstance(clipboard_content, Image.Image): # Bild in der Zwischenablage
                 path = _save_pasted_image(clipboard_content)
@@ -317,6 +324,7 @@ class BaseTaskEditor(ttk.Frame):
         """Verarbeitet das Einfügen von Bildern in die Felder der Teilaufgaben."""
         if not CLIPBOARD_TOOL_AVAILABLE: return
         try:
+            from PIL import ImageGrab # Wird erst beim ersten Einfügen geladen
             clipboard_content = ImageGrab.grabclipboard()
             if isinstance(clipboard_content, Image.Image):
                 path = _save_pasted_image(clipboard_content)
@@ -341,14 +349,14 @@ class BaseTaskEditor(ttk.Frame):
         tags = [tag.strip() for tag in self.tags_entry.get().split(',') if tag.strip()]
 
         # Kopiert Bilder in den internen Speicher und speichert die neuen Pfade
-        task_images = [self.controller.data_manager.copy_image_to_datastore(p) for p in self._task_image_full_paths]
+        task_images = [self.controller.store.data_manager.copy_image_to_datastore(p) for p in self._task_image_full_paths]
 
         subtasks = []
         for widgets in self.subtask_widgets:
             q = widgets["question"].get("1.0", "end-1c").strip()
             if not q: continue # Überspringt leere Teilaufgaben
             s = widgets["solution"].get("1.0", "end-1c").strip()
-            imgs = [self.controller.data_manager.copy_image_to_datastore(p) for p in widgets['image_paths']]
+            imgs = [self.controller.store.data_manager.copy_image_to_datastore(p) for p in widgets['image_paths']]
             subtasks.append({"frage": q, "loesung": s, "bilder_loesung": imgs})
 
         return { "name": task_name, "beschreibung": task_desc, "tags": tags,
@@ -384,16 +392,25 @@ class EditSetFrame(BasePage):
         list_frame = ttk.Frame(left_frame)
         list_frame.pack(fill='both', expand=True, pady=5)
         ttk.Label(list_frame, text="Aufgaben", font=("Helvetica", 12, "bold")).pack()
-        self.task_listbox = tk.Listbox(list_frame, bg=colors["list_bg"], fg=colors["list_fg"], selectbackground=colors["button_bg"], font=("Helvetica", 10), selectforeground=utils.get_readable_text_color(colors["button_bg"]))
+        # Mehrfachauswahl mit Strg/Umschalt für Sammelaktionen; die Auswahl bleibt beim Fokuswechsel erhalten
+        self.task_listbox = utils.theme_widget(tk.Listbox(list_frame, font=("Helvetica", 10), selectmode=tk.EXTENDED,
+                                                          exportselection=False), colors,
+                                               bg="list_bg", fg="list_fg", selectbackground="button_bg",
+                                               selectforeground=lambda c: utils.get_readable_text_color(c["button_bg"]))
         self.task_listbox.pack(fill=tk.BOTH, expand=True)
         self.task_listbox.bind("<<ListboxSelect>>", self.on_task_select)
+        self.task_listbox.bind("<Control-a>", self._select_all_tasks)
         ttk.Button(left_frame, text="+ Neue Aufgabe erstellen", command=self.create_new_task).pack(fill='x', pady=5)
+        self.import_button = ttk.Button(left_frame, text="Importieren (CSV, Markdown, Anki)...", command=self.import_tasks)
+        self.import_button.pack(fill='x')
+        self.import_status = ttk.Label(left_frame, text="", font=("Helvetica", 9))
+        self.import_status.pack(fill='x')
 
         # --- RECHTE SPALTE (Scrollbarer Editor) ---
         editor_canvas_container = ttk.Frame(paned_window)
         paned_window.add(editor_canvas_container, weight=3)
 
-        self.editor_canvas = tk.Canvas(editor_canvas_container, borderwidth=0, highlightthickness=0, bg=colors['bg'])
+        self.editor_canvas = utils.theme_widget(tk.Canvas(editor_canvas_container, borderwidth=0, highlightthickness=0), colors, bg="bg")
         editor_scrollbar = ttk.Scrollbar(editor_canvas_container, orient="vertical", command=self.editor_canvas.yview)
         self.editor_container = ttk.Frame(self.editor_canvas) # Frame für den eigentlichen Editor-Inhalt
 
@@ -437,6 +454,10 @@ class EditSetFrame(BasePage):
         """Wird aufgerufen, wenn eine Aufgabe in der Liste ausgewählt wird."""
         indices = self.task_listbox.curselection()
         if not indices: return
+        if len(indices) > 1:
+            self.current_task_id = None
+            self.show_bulk_actions()
+            return
         task_data = self.tasks[indices[0]]
         self.current_task_id = task_data.get('id')
         if not self.current_task_id:
@@ -444,6 +465,82 @@ class EditSetFrame(BasePage):
             return
         self.load_editor(task_data)
 
+    def _select_all_tasks(self, event=None):
+        self.task_listbox.selection_set(0, tk.END)
+        self.on_task_select()
+        return "break"
+
+    def selected_task_ids(self):
+        return [self.tasks[i]['id'] for i in self.task_listbox.curselection() if self.tasks[i].get('id')]
+
+    def show_bulk_actions(self):
+        """Zeigt statt des Editors die Aktionen für alle ausgewählten Aufgaben."""
+        for widget in self.editor_container.winfo_children(): widget.destroy()
+        count = len(self.task_listbox.curselection())
+        frame = ttk.Frame(self.editor_container, padding=20)
+        frame.pack(fill="both", expand=True)
+        ttk.Label(frame, text=f"{count} Aufgaben ausgewählt", font=("Helvetica", 14, "bold")).pack(anchor="w", pady=(0, 15))
+        for text, command in (("Verschieben nach...", self.bulk_move), ("Kopieren nach...", self.bulk_copy),
+                              ("Tags hinzufügen...", self.bulk_add_tags), ("Tags entfernen...", self.bulk_remove_tags),
+                              ("Fortschritt zurücksetzen", self.bulk_reset_progress)):
+            ttk.Button(frame, text=text, command=command).pack(anchor="w", fill="x", pady=3)
+        ttk.Button(frame, text="Löschen", style="Danger.TButton", command=self.bulk_delete).pack(anchor="w", fill="x", pady=(15, 3))
+
+    def _finish_bulk_action(self):
+        """Jede Sammelaktion endet mit genau einem Speichern und einer Aktualisierung der Liste."""
+        self.controller.store.save()
+        self.refresh_task_list()
+        self.show_placeholder()
+
+    def _ask_target_set(self, title):
+        targets = [(sid, set_id, f"{sdata.get('name')} › {set_data.get('name')}")
+                   for sid, sdata in self.controller.store.subjects()
+                   for set_id, set_data in sdata.get("sets", {}).items()]
+        index = custom_dialogs.ask_choice_themed(self, title, "Ziel-Lernset:", self.controller, [t[2] for t in targets])
+        return None if index is None else targets[index][:2]
+
+    def bulk_move(self):
+        target = self._ask_target_set("Aufgaben verschieben")
+        if target is None: return
+        self.controller.store.move_tasks(self.subject_id, self.set_id, self.selected_task_ids(), *target)
+        self._finish_bulk_action()
+
+    def bulk_copy(self):
+        target = self._ask_target_set("Aufgaben kopieren")
+        if target is None: return
+        self.controller.store.copy_tasks(self.subject_id, self.set_id, self.selected_task_ids(), *target)
+        self._finish_bulk_action()
+
+    def _ask_tags(self, title):
+        answer = custom_dialogs.ask_string_themed(self, title, "Tags (mit Komma getrennt):", self.controller)
+        return [t.strip() for t in (answer or "").split(",") if t.strip()]
+
+    def bulk_add_tags(self):
+        tags = self._ask_tags("Tags hinzufügen")
+        if not tags: return
+        self.controller.store.update_tags(self.subject_id, self.set_id, self.selected_task_ids(), add=tags)
+        self._finish_bulk_action()
+
+    def bulk_remove_tags(self):
+        tags = self._ask_tags("Tags entfernen")
+        if not tags: return
+        self.controller.store.update_tags(self.subject_id, self.set_id, self.selected_task_ids(), remove=tags)
+        self._finish_bulk_action()
+
+    def bulk_reset_progress(self):
+        task_ids = self.selected_task_ids()
+        if messagebox.askyesno("Fortschritt zurücksetzen", f"Lernfortschritt von {len(task_ids)} Aufgaben zurücksetzen?",
+                               icon='warning', default='no'):
+            self.controller.store.reset_tasks_progress(self.subject_id, self.set_id, task_ids)
+            self._finish_bulk_action()
+
+    def bulk_delete(self):
+        task_ids = self.selected_task_ids()
+        if messagebox.askyesno("Löschen", f"Sollen {len(task_ids)} Aufgaben wirklich endgültig gelöscht werden?",
+                               icon='warning', default='no'):
+            self.controller.store.delete_tasks(self.subject_id, self.set_id, task_ids)
+            self._finish_bulk_action()
+
     def create_new_task(self):
         """Erstellt eine neue, leere Aufgabe und lädt sie im Editor."""
         new_task = {
@@ -452,13 +549,53 @@ class EditSetFrame(BasePage):
             "history": [], "sm_data": {} # Initialisiert leere Lerndaten
         }
         self.controller.data[self.subject_id]["sets"][self.set_id]["tasks"].append(new_task)
-        self.controller.data_manager.save_data(self.controller.data)
+        self.controller.store.due_queue.push(self.subject_id, self.set_id, new_task)
+        self.controller.store.mark_changed(self.subject_id, self.set_id, new_task["id"])
+        self.controller.store.save()
         self.refresh_task_list()
 
         self.task_listbox.selection_clear(0, tk.END)
         self.task_listbox.selection_set(tk.END) # Wählt die neue Aufgabe aus
         self.load_editor(new_task)
 
+    def import_tasks(self):
+        """
+        Importiert eine externe Datei in dieses Set. Jeder Batch wird in einem
+        eigenen after()-Schritt übernommen, damit die Oberfläche reagiert.
+        """
+        from lernapp.core import importer # zipfile, sqlite3 und csv erst beim ersten Import laden
+        path = filedialog.askopenfilename(title="Karten importieren", filetypes=[
+            ("Unterstützte Dateien", "*.csv *.tsv *.txt *.md *.markdown *.apkg"), ("Alle Dateien", "*.*")])
+        if not path: return
+        try:
+            batches = importer.prepare_batches(importer.read_records(path), self.controller.store.data_manager)
+        except importer.IMPORT_ERRORS as e:
+            messagebox.showerror("Import fehlgeschlagen", str(e))
+            return
+        self.import_button.state(["disabled"])
+        self._import_step(batches, 0, time.monotonic())
+
+    def _import_step(self, batches, imported, last_save):
+        from lernapp.core import importer
+        try:
+            tasks = next(batches, None)
+            if tasks is not None:
+                importer.commit_batch(self.controller.store, self.subject_id, self.set_id, tasks)
+        except importer.IMPORT_ERRORS as e:
+            tasks = None
+            messagebox.showerror("Import fehlgeschlagen", f"{e}\n\nBereits {imported} Karten wurden übernommen.")
+        if tasks is not None:
+            imported += len(tasks)
+            last_save = importer.save_due(self.controller.store, last_save)
+            self.import_status.config(text=f"{imported} Karten importiert...")
+            self.after(1, self._import_step, batches, imported, last_save)
+            return
+        batches.close()
+        self.controller.store.save()
+        self.import_status.config(text=f"{imported} Karten importiert.")
+        self.import_button.state(["!disabled"])
+        self.refresh_task_list()
+
     def load_editor(self, task_data):
         """Lädt den Editor für eine neue oder bestehende Aufgabe."""
         for widget in self.editor_container.winfo_children(): widget.destroy()
@@ -593,11 +730,17 @@ class EditSetFrame(BasePage):
                     updated_data['id'] = self.task_data['id']
                     updated_data['history'] = task.get('history', [])
                     updated_data['sm_data'] = task.get('sm_data', {})
+                    # Zerlegt die Texte einmal pro Änderung statt bei jeder Anzeige
+                    updated_data['layout'] = task.get('layout', {})
+                    layout.build_task_layout(updated_data)
+                    self.controller.store.tag_index.update_task(self.subject_id, self.set_id, updated_data['id'],
+                                                          task.get('tags', []), updated_data['tags'])
                     task_list[i] = updated_data
                     self.task_data = updated_data # Aktualisiert die lokale Kopie
+                    self.controller.store.mark_changed(self.subject_id, self.set_id, updated_data['id'])
                     break
 
-            self.controller.data_manager.save_data(self.controller.data)
+            self.controller.store.save()
 
             if is_autosave:
                 self.status_label.config(text="Gespeichert!")
@@ -611,8 +754,7 @@ class EditSetFrame(BasePage):
             if messagebox.askyesno("Löschen", "Soll diese Aufgabe wirklich endgültig gelöscht werden?", icon='warning', default='no'):
                 self.edit_set_frame.show_placeholder() # Zeigt Platzhalter im Editor-Bereich an
 
-                task_list = self.controller.data[self.subject_id]["sets"][self.set_id]["tasks"]
-                task_list[:] = [t for t in task_list if t.get('id') != self.task_data['id']]
-                self.controller.data_manager.save_data(self.controller.data)
+                self.controller.store.delete_tasks(self.subject_id, self.set_id, [self.task_data['id']])
+                self.controller.store.save()
 
                 self.edit_set_frame.refresh_task_list()
@@ -0,0 +1,89 @@
+"""
+Optionaler Profiler der Oberfläche (python main.py --profile).
+
+Hüllt die Stellen, an denen die Tk-Hauptschleife Zeit verbringt, in Spans
+(siehe lernapp.core.tracing), erkennt Blockaden der Hauptschleife und zeigt
+ein kleines Fenster mit den langsamsten Spans. Beim Beenden wird ein
+Chrome-Trace geschrieben. Ohne --profile wird dieses Modul nicht importiert.
+"""
+import sys
+import tkinter as tk
+
+import constants
+import utils
+from lernapp.core import tracing
+from lernapp.core.store import DataManager, Store
+
+OVERLAY_REFRESH_MS = 500
+
+# Methoden der Seiten, die erst beim ersten Anzeigen der Seite umhüllt werden,
+# damit --profile keine verzögerten Module (z.B. matplotlib) vorzeitig lädt
+FRAME_METHODS = {
+    "QuizFrame": ("load_next_question", "build_ui_for_current_question", "process_answer"),
+    "StatisticsFrame": ("create_plots", "update_plots"),
+    "EditSetFrame": ("TaskEditor.save_changes",),
+}
+
+
+def install(app_class):
+    """Schaltet die Messung ein und umhüllt die Methoden; vor dem Erzeugen der App aufrufen."""
+    tracing.enable()
+    tracing.instrument(DataManager, "save_data", "DataManager.save_data")
+    tracing.instrument(Store, "save", "Store.save")
+    tracing.instrument(utils, "render_latex", "render_latex")
+    tracing.instrument(app_class, "apply_theme", "LernApp.apply_theme")
+
+    show_frame = app_class.show_frame
+
+    def traced_show_frame(self, FrameClass, *args, **kwargs):
+        for path in FRAME_METHODS.get(FrameClass.__name__, ()):
+            *owners, method = path.split(".")
+            owner = FrameClass
+            for name in owners:
+                owner = getattr(owner, name)
+            tracing.instrument(owner, method, f"{FrameClass.__name__}.{path}")
+        if "ui.card_view" in sys.modules: # Wird mit der Quiz-Seite geladen
+            card_view = sys.modules["ui.card_view"].CardView
+            tracing.instrument(card_view, "show_task", "CardView.show_task")
+            tracing.instrument(card_view, "_embed_formula", "CardView._embed_formula")
+        with tracing.span(f"show_frame({FrameClass.__name__})"):
+            return show_frame(self, FrameClass, *args, **kwargs)
+    app_class.show_frame = traced_show_frame
+
+
+class ProfilerOverlay(tk.Toplevel):
+    """Kleines, immer sichtbares Fenster mit Blockaden und den langsamsten Spans."""
+    def __init__(self, app, stall_detector):
+        super().__init__(app)
+        self.title("Profiler")
+        self.attributes("-topmost", True)
+        self.resizable(False, False)
+        self.stall_detector = stall_detector
+        self.protocol("WM_DELETE_WINDOW", self.withdraw)
+        app.bind_all("<Control-Shift-P>", lambda e: self.deiconify())
+
+        self.label = tk.Label(self, justify="left", anchor="w", font=("Courier", 9), padx=8, pady=6)
+        utils.theme_widget(self.label, constants.THEMES[app.current_theme.get()], bg="text_bg", fg="fg")
+        self.label.pack(fill="both", expand=True)
+        self.refresh()
+
+    def refresh(self):
+        detector = self.stall_detector
+        lines = [f"Blockaden > {detector.threshold} ms: {detector.stalls} (max. {detector.max_stall_ms:.0f} ms)", ""]
+        lines.append(f"{'Span':<38}{'n':>5}{'Ø ms':>9}{'max ms':>9}")
+        for name, count, mean_ms, max_ms in tracing.summary():
+            lines.append(f"{name[:37]:<38}{count:>5}{mean_ms:>9.1f}{max_ms:>9.1f}")
+        self.label.config(text="\n".join(lines))
+        self.after(OVERLAY_REFRESH_MS, self.refresh)
+
+
+def start(app, stall_threshold_ms=100):
+    """Startet die Blockadeerkennung und das Overlay für eine laufende App."""
+    detector = tracing.StallDetector(app, threshold=stall_threshold_ms)
+    detector.start()
+    return ProfilerOverlay(app, detector)
+
+
+def export(filename=constants.TRACE_FILE):
+    tracing.export_chrome_trace(filename)
+    print(f"Trace nach {filename} geschrieben (chrome://tracing oder https://ui.perfetto.dev).")
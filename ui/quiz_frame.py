@@ -1,16 +1,12 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
-import os
-import re
-import time
 import random
 from collections import deque
-from PIL import Image, ImageTk
-import datetime
 
 from .base_frames import BasePage
-import utils
+from .card_view import CardView
 import constants # Importiert die zentrale Konstantendatei
+from lernapp.core import queue_builder, scheduler, render_farm, layout, session
 
 class ProgressIndicator(ttk.Frame):
     """Ein visueller Fortschrittsbalken, der den Lernstatus der Karten als Kreise anzeigt."""
@@ -24,6 +20,11 @@ class ProgressIndicator(ttk.Frame):
         self.canvas.pack(fill="x", expand=True, padx=5, pady=5)
         self.canvas.bind("<Configure>", self.update_progress)
 
+    def on_theme_changed(self, colors):
+        self.theme_colors = colors
+        self.canvas.config(bg=colors['bg'])
+        self.update_progress()
+
     def update_progress(self, event=None):
         """Zeichnet den Fortschrittsbalken basierend auf dem aktuellen Zustand der Aufgaben."""
         self.canvas.delete("all")
@@ -76,195 +77,101 @@ class ProgressIndicator(ttk.Frame):
             self.canvas.create_oval(x0, y0, x1, y1, fill=color, outline=outline_color, width=outline_width)
 
 
-class ImageGallery(ttk.Frame):
-    """Ein Widget zur Anzeige einer Bildergalerie mit Navigationsbuttons."""
-    def __init__(self, parent, image_paths, theme_colors):
-        super().__init__(parent)
-        self.image_paths = [path for path in image_paths if path and os.path.exists(path)]
-        self.theme_colors = theme_colors
-        self.current_image_index = 0
-        self._photo_references = [] # Wichtig, um Referenzen auf die Bilder zu halten
-
-        if not self.image_paths: return
-
-        self.image_label = ttk.Label(self, cursor="hand2")
-        self.image_label.pack(pady=5)
-        self.image_label.bind("<Button-1>", self.open_fullscreen_view)
-
-        nav_frame = ttk.Frame(self)
-        self.nav_frame = nav_frame
-        nav_frame.pack()
-
-        self.prev_button = ttk.Button(nav_frame, text="< Vor", command=self.show_previous_image)
-        self.prev_button.pack(side="left", padx=5)
-        self.status_label = ttk.Label(nav_frame, text="")
-        self.status_label.pack(side="left", padx=5)
-        self.next_button = ttk.Button(nav_frame, text="Nächstes >", command=self.show_next_image)
-        self.next_button.pack(side="left", padx=5)
-
-        self.show_image()
-
-    def open_fullscreen_view(self, event=None):
-        """Öffnet das aktuell angezeigte Bild in einem großen Popup-Fenster."""
-        if not self.image_paths: return
-        path = self.image_paths[self.current_image_index]
-
-        popup = tk.Toplevel(self)
-        popup.title(os.path.basename(path))
-        popup.configure(bg=self.theme_colors['bg'])
-        popup.bind("<Escape>", lambda e: popup.destroy())
-
-        close_button = ttk.Button(popup, text="X", command=popup.destroy, style="Danger.TButton")
-        close_button.pack(anchor="ne", padx=10, pady=10)
-
-        try:
-            img = Image.open(path)
-            screen_width = self.winfo_screenwidth() * 0.8
-            screen_height = self.winfo_screenheight() * 0.8
-            img.thumbnail((screen_width, screen_height), Image.Resampling.LANCZOS)
-            photo = ImageTk.PhotoImage(img)
-
-            img_label_popup = ttk.Label(popup, image=photo)
-            img_label_popup.image = photo # Referenz behalten
-            img_label_popup.pack(padx=20, pady=(0, 20), expand=True, fill="both")
-
-            popup.update_idletasks()
-            x = self.winfo_toplevel().winfo_x() + (self.winfo_toplevel().winfo_width() // 2) - (popup.winfo_width() // 2)
-            y = self.winfo_toplevel().winfo_y() + (self.winfo_toplevel().winfo_height() // 2) - (popup.winfo_height() // 2)
-            popup.geometry(f"+{int(x)}+{int(y)}")
-        except Exception as e:
-            popup.destroy()
-            messagebox.showerror("Fehler", f"Bild konnte nicht geladen werden:\n{e}")
-
-        popup.transient(self.winfo_toplevel())
-        popup.grab_set()
-
-    def show_image(self):
-        """Zeigt das Bild am aktuellen Index in der Galerie an."""
-        if not self.image_paths: return
-        path = self.image_paths[self.current_image_index]
-        try:
-            img = Image.open(path)
-            img.thumbnail((450, 450), Image.Resampling.LANCZOS)
-            photo = ImageTk.PhotoImage(img)
-            self._photo_references.append(photo)
-            self.image_label.config(image=photo)
-            self.update_status()
-        except Exception as e:
-            print(f"Fehler beim Laden des Bildes {path}: {e}")
-            self.image_label.config(text="Bild konnte nicht geladen werden.")
-
-    def update_status(self):
-        """Aktualisiert die Statusanzeige (z.B. 'Bild 1 / 3') und die Navigationsbuttons."""
-        total_images = len(self.image_paths)
-        if total_images > 1:
-            self.status_label.config(text=f"Bild {self.current_image_index + 1} / {total_images}")
-            self.nav_frame.pack() # Zeigt Navigation nur bei mehreren Bildern
-        else:
-            self.nav_frame.pack_forget()
-
-        self.prev_button.config(state="normal" if self.current_image_index > 0 else "disabled")
-        self.next_button.config(state="normal" if self.current_image_index < len(self.image_paths) - 1 else "disabled")
-
-    def show_previous_image(self):
-        if self.current_image_index > 0:
-            self.current_image_index -= 1
-            self.show_image()
-
-    def show_next_image(self):
-        if self.current_image_index < len(self.image_paths) - 1:
-            self.current_image_index += 1
-            self.show_image()
-
-
 class QuizFrame(BasePage):
     """
     Der Lernmodus. Implementiert einen sequenziellen Modus und
-    einen Modus mit Spaced Repetition.
+    einen Modus mit Spaced Repetition. Die Karten stammen entweder aus einem
+    Lernset, aus allen Sets mit passenden Tags (tag_query) oder aus der globalen
+    Warteschlange aller fälligen Karten (review_due).
+    Nach jeder Antwort wird ein Checkpoint der Sitzung geschrieben; mit
+    checkpoint=... wird eine unterbrochene Sitzung ohne Neuberechnung fortgesetzt.
     """
-    def __init__(self, parent, controller, subject_id, set_id, mode, session_size=None):
-        self.init_args = {"subject_id": subject_id, "set_id": set_id, "mode": mode, "session_size": session_size}
+    def __init__(self, parent, controller, subject_id=None, set_id=None, mode='sequential', session_size=None, tag_query=None, review_due=False, checkpoint=None):
+        if checkpoint is not None:
+            options = checkpoint["options"]
+            subject_id, set_id, mode = options["subject_id"], options["set_id"], options["mode"]
+            session_size, tag_query, review_due = options["session_size"], options["tag_query"], options["review_due"]
+        self.init_args = {"subject_id": subject_id, "set_id": set_id, "mode": mode, "session_size": session_size,
+                          "tag_query": tag_query, "review_due": review_due}
         super().__init__(parent, controller)
         self.subject_id, self.set_id, self.mode = subject_id, set_id, mode
-        self._photo_references, self.current_task = [], None
+        self.tag_query, self.review_due = tag_query, review_due
+        self.current_task = None
 
-        self.all_tasks = self.controller.data[subject_id]["sets"][set_id].get("tasks", [])
+        if checkpoint is not None:
+            located_tasks, queue, self.current_task = session.restore_checkpoint(self.controller.store, checkpoint)
+        else:
+            # Merkt sich für jede Karte ihr Fach und Set, um Ergebnisse zurückzuschreiben
+            located_tasks = queue_builder.collect_session_tasks(self.controller.store, subject_id, set_id,
+                                                                tag_query, review_due, session_size)
+        self.all_tasks = [task for _, _, task in located_tasks]
+        self.task_locations = {task.get('id'): (sid, set_) for sid, set_, task in located_tasks}
 
         # Wählt die Lernstrategie basierend auf dem 'mode' Parameter
-        if self.mode == 'sequential':
+        if checkpoint is not None:
+            self.task_queue = deque(queue)
+        elif self.mode == 'sequential' or review_due:
+            # Die globale Warteschlange liefert die Karten bereits nach Fälligkeit sortiert
             self.task_queue = deque(self.all_tasks)
-            self.set_nav_title("Lernmodus: Sequenziell")
         else: # 'spaced_repetition'
             self.task_queue = self._build_spaced_repetition_queue(session_size)
+
+        if self.mode == 'sequential':
+            self.set_nav_title("Lernmodus: Sequenziell")
+        elif review_due:
+            self.set_nav_title("Lernmodus: Alle fälligen Karten")
+        else:
             self.set_nav_title("Lernmodus: Spaced Repetition")
 
         self.add_nav_button("← Beenden & Speichern", self.finish_quiz)
-        self.load_next_question()
+        if self.current_task is not None:
+            self.build_ui_for_current_question()
+        else:
+            self.load_next_question()
 
     def _build_spaced_repetition_queue(self, session_size=None):
-        """Erstellt eine priorisierte Warteschlange nur mit zu lernenden Karten."""
-        now = time.time()
-        # Stellt sicher, dass alle Karten die notwendigen Lerndaten haben
-        for task in self.all_tasks:
-            task.setdefault('sm_data', {'status': 'new', 'next_review_at': now, 'consecutive_good': 0})
-
-        # Filtert Karten, die fällig und noch nicht gemeistert sind
-        due_tasks = [t for t in self.all_tasks if t['sm_data']['next_review_at'] <= now and t['sm_data']['status'] not in ['mastered', 'perfect']]
+        """Erstellt eine priorisierte Warteschlange nur mit fälligen Karten."""
+        return deque(queue_builder.build_spaced_repetition_queue(self.all_tasks, session_size))
 
-        if not due_tasks: return deque()
-
-        # Sortiert fällige Karten nach ihrem Status (neue/schlechte zuerst)
-        due_tasks.sort(key=lambda t: constants.STATUS_INTERVALS.get(t['sm_data']['status'], 0))
-
-        # Begrenzt die Sitzungsgröße, falls angegeben
-        return deque(due_tasks[:session_size] if session_size else due_tasks)
-
-    def _display_content(self, parent, text_content, image_paths):
-        """Rendert Text, LaTeX-Formeln und Bilder in einem Frame."""
-        colors = constants.THEMES[self.controller.current_theme.get()]
-        text_frame = ttk.Frame(parent)
-        text_frame.pack(fill="x", anchor='nw', padx=5, pady=5)
-        # Teilt den Text in regulären Text und LaTeX-Teile ($...$)
-        parts = re.split(r'(\$.*?\$)', text_content)
-        current_line_frame = ttk.Frame(text_frame)
-        current_line_frame.pack(fill="x", anchor='nw')
-
-        for part in parts:
-            if part.startswith('$') and part.endswith('$'): # LaTeX-Formel
-                formula = part[1:-1]
-                bg_color = text_frame.cget('bg')
-                latex_img = utils.render_latex(formula, fg=colors['fg'], bg=bg_color)
-                if latex_img:
-                    photo = ImageTk.PhotoImage(latex_img)
-                    self._photo_references.append(photo)
-                    ttk.Label(current_line_frame, image=photo, background=bg_color).pack(side="left", anchor='nw', pady=2)
-            elif part: # Regulärer Text
-                sub_parts = part.split('\n')
-                for i, sub_part in enumerate(sub_parts):
-                    if sub_part:
-                        ttk.Label(current_line_frame, text=sub_part, wraplength=750, justify=tk.LEFT).pack(side="left", anchor='nw')
-                    if i < len(sub_parts) - 1: # Nach einem Zeilenumbruch eine neue Zeile beginnen
-                        current_line_frame = ttk.Frame(text_frame)
-                        current_line_frame.pack(fill="x", anchor='w')
-        if image_paths:
-            gallery = ImageGallery(parent, image_paths, colors)
-            gallery.pack(pady=5)
+    def _submit_formulas(self, task):
+        """Gibt alle Formeln einer Karte an die RenderFarm, damit sie parallel gerendert werden."""
+        if not task: return
+        style = render_farm.theme_style(self.controller.current_theme.get())
+        for formula in layout.formulas_in(task):
+            self.controller.render_farm.submit(formula, style)
 
     def load_next_question(self):
         """Lädt die nächste Frage aus der Warteschlange."""
-        self._photo_references.clear()
         if not self.task_queue:
             messagebox.showinfo("Fertig!", "Alle Aufgaben für diese Lernsitzung gemeistert!")
             self.finish_quiz()
             return
         self.current_task = self.task_queue.popleft()
+        self._save_checkpoint()
         self.build_ui_for_current_question()
 
+    def _save_checkpoint(self):
+        """Sichert Karten, Reihenfolge der Warteschlange und aktuelle Karte (nur IDs)."""
+        located = [(*self.task_locations[task.get('id')], task.get('id')) for task in self.all_tasks
+                   if task.get('id') in self.task_locations]
+        checkpoint = session.build_checkpoint(self.init_args, located,
+                                              [task.get('id') for task in self.task_queue], self.current_task.get('id'),
+                                              self.controller.store.instance_id)
+        try:
+            session.save_checkpoint(checkpoint, self.controller.store.session_file)
+        except OSError as e:
+            print(f"Sitzungs-Checkpoint konnte nicht gespeichert werden: {e}")
+
     def build_ui_for_current_question(self):
         """Baut die Benutzeroberfläche für die aktuell geladene Frage."""
         for widget in self.content_frame.winfo_children(): widget.destroy()
         if not self.current_task: return
 
+        # Formeln der aktuellen und der nächsten Karte vorab rendern lassen
+        self._submit_formulas(self.current_task)
+        if self.task_queue:
+            self._submit_formulas(self.task_queue[0])
+
         colors = constants.THEMES[self.controller.current_theme.get()]
 
         # Erstellt die Liste der Aufgaben für den Fortschrittsbalken
@@ -275,50 +182,22 @@ class QuizFrame(BasePage):
         self.progress_indicator = ProgressIndicator(self.content_frame, display_tasks, colors, current_task_id=self.current_task.get('id'))
         self.progress_indicator.pack(fill="x", pady=(0, 10))
 
-        # Haupt-Canvas für scrollbaren Inhalt
-        self.main_canvas = tk.Canvas(self.content_frame, borderwidth=0, highlightthickness=0, bg=colors['bg'])
-        scrollbar = ttk.Scrollbar(self.content_frame, orient="vertical", command=self.main_canvas.yview)
-        main_frame = ttk.Frame(self.main_canvas)
-        self.main_canvas.configure(yscrollcommand=scrollbar.set)
-        scrollbar.pack(side="right", fill="y")
-        self.main_canvas.pack(side="left", fill="both", expand=True)
-        canvas_window = self.main_canvas.create_window((0, 0), window=main_frame, anchor="nw")
-
-        main_frame.bind("<Configure>", lambda e: self.main_canvas.configure(scrollregion=self.main_canvas.bbox("all")))
-        self.main_canvas.bind("<Configure>", lambda e: self.main_canvas.itemconfig(canvas_window, width=e.width))
-        utils.bind_mouse_scroll(self, self.main_canvas)
-
-        # Zeigt die Hauptaufgabe an
-        task_frame = ttk.LabelFrame(main_frame, text=self.current_task.get('name', 'Aufgabe'))
-        task_frame.pack(fill="x", pady=10, padx=5)
-        image_paths_task = self.current_task.get('bilder_aufgabe', [])
-        self._display_content(task_frame, self.current_task['beschreibung'], image_paths_task)
-
-        # Zeigt Tags und Status an
-        info_frame = ttk.Frame(task_frame)
-        info_frame.pack(fill='x', anchor='w', padx=5, pady=5)
+        # Die ganze Karte wird in ein einziges Textfeld geschrieben
+        self.card_view = CardView(self.content_frame, self.controller, colors)
+        self.feedback_frame = ttk.Frame(self.content_frame)
+        self.feedback_frame.pack(side="bottom", pady=10)
+        self.card_view.pack(fill="both", expand=True)
+
+        # Tags und Status
+        info_parts = []
         tags = self.current_task.get('tags', [])
-        if tags: ttk.Label(info_frame, text=f"Tags: {', '.join(tags)}", font=("Helvetica", 9, "italic")).pack(side='left')
+        if tags: info_parts.append(f"Tags: {', '.join(tags)}")
         if self.mode == 'spaced_repetition':
             status = self.current_task.get('sm_data', {}).get('status', 'new')
-            ttk.Label(info_frame, text=f"  Status: {status.capitalize()}", font=("Helvetica", 9, "italic")).pack(side='left', padx=10)
-
-        self.subtask_solution_widgets = {}
-
-        # Zeigt die Teilaufgaben an
-        for i, subtask in enumerate(self.current_task.get("unteraufgaben", [])):
-            sub_frame = ttk.LabelFrame(main_frame, text=f"Teilaufgabe {chr(97 + i)}")
-            sub_frame.pack(fill="x", padx=10, pady=5)
-            self._display_content(sub_frame, subtask["frage"], [])
-
-            action_frame = ttk.Frame(sub_frame)
-            action_frame.pack(fill="x", padx=10, pady=5)
-
-            self.subtask_solution_widgets[i] = {"container": None}
-            ttk.Button(action_frame, text="Lösung anzeigen", command=lambda s=subtask, sf=sub_frame, i=i: self.toggle_solution(s, sf, i)).pack(side="left")
+            info_parts.append(f"Status: {status.capitalize()}")
 
-        self.feedback_frame = ttk.Frame(main_frame)
-        self.feedback_frame.pack(pady=10)
+        style = render_farm.theme_style(self.controller.current_theme.get())
+        self.card_view.show_task(self.current_task, style, "    ".join(info_parts))
         self.show_feedback_buttons()
 
     def show_feedback_buttons(self):
@@ -334,82 +213,43 @@ class QuizFrame(BasePage):
         self.perfect_button = ttk.Button(self.feedback_frame, text="😎 Perfekt", style="Perfect.TButton", command=lambda: self.process_answer('perfect'))
         self.perfect_button.pack(side="left", padx=5)
 
-    def toggle_solution(self, subtask, parent_frame, subtask_index):
+    def toggle_solution(self, subtask_index):
         """Zeigt die Lösung für eine Teilaufgabe an oder verbirgt sie."""
-        widgets = self.subtask_solution_widgets[subtask_index]
-
-        if widgets.get("container") and widgets["container"].winfo_exists():
-            widgets["container"].destroy()
-            widgets["container"] = None
-        else:
-            container = ttk.LabelFrame(parent_frame, text="Lösung")
-            container.pack(fill="x", pady=5)
-            image_paths_solution = subtask.get('bilder_loesung', [])
-            self._display_content(container, subtask['loesung'], image_paths_solution)
-
-            utils.bind_mouse_scroll(container, self.main_canvas)
-            widgets["container"] = container
-
-        self.update() # Wichtig, damit die Scrollregion korrekt berechnet wird
-        self.main_canvas.configure(scrollregion=self.main_canvas.bbox("all"))
+        self.card_view.toggle_solution(subtask_index)
 
     def process_answer(self, quality):
-        """Verarbeitet die Antwort des Benutzers."""
-        self.save_performance(quality)
-        if self.mode == 'spaced_repetition':
-            self.update_task_spaced_repetition(quality)
+        """
+        Verarbeitet die Antwort des Benutzers. Die Antwort wird nur an das
+        Antwortprotokoll angehängt; gespeichert wird die Sammlung am Ende der Sitzung.
+        """
+        task_id = self.current_task.get('id') if self.current_task else None
+        location = self.task_locations.get(task_id)
+        if task_id and location:
+            scheduled = self.mode == 'spaced_repetition'
+            repeat = self.controller.store.record_answer(location[0], location[1], self.current_task, quality, scheduled)
+            if scheduled:
+                self.requeue_task(repeat)
         self.load_next_question()
 
-    def update_task_spaced_repetition(self, quality):
-        """Aktualisiert den Status und das nächste Review-Datum für eine Karte."""
-        task_id = self.current_task.get('id')
-        if not task_id: return
-
-        for task in self.all_tasks:
-            if task.get('id') == task_id:
-                sm_data = task.setdefault('sm_data', {'status': 'new', 'consecutive_good': 0})
-                current_status = sm_data.get('status', 'new')
-
-                if quality == 'bad':
-                    sm_data['status'] = 'bad'
-                    sm_data['consecutive_good'] = 0
-                    # Fügt die Karte zur Wiederholung weiter hinten in die Warteschlange ein
-                    if len(self.task_queue) >= 2:
-                        self.task_queue.insert(2, self.current_task)
-                    else:
-                        self.task_queue.append(self.current_task)
-                elif quality == 'ok':
-                    sm_data['status'] = 'ok'
-                    sm_data['consecutive_good'] = 0
-                    self.task_queue.append(self.current_task) # Wiederholt die Karte am Ende der Session
-                elif quality == 'good':
-                    if current_status == 'good':
-                        sm_data['status'] = 'mastered'
-                    else:
-                        sm_data['status'] = 'good'
-                        self.task_queue.append(self.current_task)
-                elif quality == 'perfect':
-                    sm_data['status'] = 'perfect'
-
-                # Berechnet das nächste Fälligkeitsdatum
-                interval_days = constants.STATUS_INTERVALS.get(sm_data['status'], 30)
-                next_review_date = datetime.datetime.now() + datetime.timedelta(days=interval_days)
-                sm_data['next_review_at'] = next_review_date.timestamp()
-                break
-
-    def save_performance(self, quality):
-        """Speichert die Leistung für die allgemeine Statistik."""
-        if not self.current_task or not self.current_task.get('id'): return
-
-        for task in self.all_tasks:
-            if task.get('id') == self.current_task.get('id'):
-                history_entry = { "timestamp": time.time(), "quality": quality }
-                task.setdefault('history', []).append(history_entry)
-                break
+    def requeue_task(self, repeat):
+        """Plant die aktuelle Karte je nach Wunsch des Schedulers erneut in dieser Sitzung ein."""
+        if repeat == scheduler.REPEAT_SOON:
+            # Fügt die Karte zur Wiederholung weiter hinten in die Warteschlange ein
+            if len(self.task_queue) >= 2:
+                self.task_queue.insert(2, self.current_task)
+            else:
+                self.task_queue.append(self.current_task)
+        elif repeat == scheduler.REPEAT_LATER:
+            self.task_queue.append(self.current_task) # Wiederholt die Karte am Ende der Session
 
     def finish_quiz(self):
-        """Beendet den Lernmodus und kehrt zur Lernset-Auswahl zurück."""
-        self.controller.data_manager.save_data(self.controller.data)
+        """Beendet den Lernmodus, übernimmt alle protokollierten Antworten und kehrt zur Lernset-Auswahl zurück."""
+        self.controller.store.save()
+        session.clear_checkpoint(self.controller.store.session_file, self.controller.store.instance_id)
         self.current_task = None
+        if self.tag_query or self.review_due:
+            from .start_frame import StartFrame
+            self.controller.show_frame(StartFrame)
+            return
         from .set_select_frame import SetSelectFrame
         self.controller.show_frame(SetSelectFrame, subject_id=self.subject_id)
@@ -1,19 +1,16 @@
 import tkinter as tk
 from tkinter import ttk, simpledialog, messagebox
 import uuid
-import time
 from functools import partial
 
 # Relative Importe aus dem ui-Paket
 from .base_frames import BasePage
-from .edit_set_frame import EditSetFrame
-from .quiz_frame import QuizFrame
-from .statistics_frame import StatisticsFrame
 from . import custom_dialogs
 
 # Absolute Importe
 import utils
 import constants
+from lernapp.core import queue_builder, scheduler
 
 class SetSelectFrame(BasePage):
     """Zeigt die Lernsets als Kacheln links und die Statistiken rechts an."""
@@ -31,6 +28,7 @@ class SetSelectFrame(BasePage):
         self.set_nav_title(f"Lernsets in: {self.subject_data['name']}")
         self.add_nav_button("← Zurück zu den Fächern", self.go_to_start_frame)
         self.add_nav_button("Neues Lernset", self.create_set_popup)
+        self.add_nav_button("Bundle importieren", self.import_bundle)
 
         # Geteilte Ansicht
         paned_window = ttk.PanedWindow(self.content_frame, orient=tk.HORIZONTAL)
@@ -41,7 +39,8 @@ class SetSelectFrame(BasePage):
         paned_window.add(left_frame, weight=1)
 
         # Canvas für scrollbare Kacheln
-        self.canvas = tk.Canvas(left_frame, borderwidth=0, highlightthickness=0, bg=constants.THEMES[controller.current_theme.get()]["bg"])
+        self.canvas = utils.theme_widget(tk.Canvas(left_frame, borderwidth=0, highlightthickness=0),
+                                         constants.THEMES[controller.current_theme.get()], bg="bg")
         self.scrollbar = ttk.Scrollbar(left_frame, orient="vertical", command=self.canvas.yview)
         self.tiles_frame = ttk.Frame(self.canvas)
 
@@ -99,7 +98,7 @@ class SetSelectFrame(BasePage):
         utils.bind_mouse_scroll(self.tiles_frame, self.canvas)
 
     def load_statistics_for_set(self, set_id):
-        """Lädt die Statistik-Ansicht für das ausgewählte Set auf der rechten Seite."""
+        """Lädt die Statistik-Ansicht (und damit matplotlib) erst bei Auswahl eines Sets."""
         from .statistics_frame import StatisticsFrame
         for widget in self.statistics_container.winfo_children():
             widget.destroy()
@@ -121,26 +120,54 @@ class SetSelectFrame(BasePage):
         for name, hex_code in constants.PASTEL_COLORS.items():
             color_menu.add_command(label=name, background=hex_code, command=lambda h=hex_code: self.change_item_color(set_id, h))
         menu.add_cascade(label="Farbe ändern", menu=color_menu)
+        scheduler_menu = tk.Menu(menu, tearoff=0)
+        current_scheduler = self.subject_data["sets"][set_id].get("scheduler", scheduler.DEFAULT_SCHEDULER)
+        for name, scheduler_class in scheduler.SCHEDULERS.items():
+            label = ("✓ " if name == current_scheduler else "   ") + scheduler_class.label
+            scheduler_menu.add_command(label=label, command=lambda n=name: self.change_scheduler(set_id, n))
+        menu.add_cascade(label="Lernalgorithmus", menu=scheduler_menu)
+        menu.add_command(label="Duplizieren", command=lambda: self.duplicate_set(set_id))
+        menu.add_command(label="Exportieren...", command=lambda: self.export_set(set_id))
         menu.add_separator()
         menu.add_command(label="Fortschritt zurücksetzen", command=lambda: self._reset_set_progress(set_id))
         menu.add_separator()
         menu.add_command(label="Löschen", command=lambda: self.delete_item(set_id), foreground="red")
         menu.tk_popup(event.x_root, event.y_root)
 
+    def import_bundle(self):
+        """Importiert alle Sets eines Bundles in dieses Fach."""
+        from .bundle_dialogs import import_dialog
+        import_dialog(self, self.controller, self.subject_id, on_finished=self.refresh_view)
+
+    def duplicate_set(self, set_id):
+        """Dupliziert ein Set in diesem Fach; Karteninhalte und Bilder werden geteilt."""
+        include_progress = messagebox.askyesno("Lernset duplizieren", "Soll der Lernfortschritt übernommen werden?\n\n"
+                                               "Bei 'Nein' beginnt die Kopie mit neuen Karten.")
+        self.controller.store.duplicate_set(self.subject_id, set_id, include_progress=include_progress)
+        self.controller.store.save()
+        self.refresh_view()
+
+    def export_set(self, set_id):
+        from .bundle_dialogs import export_dialog
+        export_dialog(self, self.controller, [(self.subject_id, set_id)], self.subject_data["sets"][set_id].get("name", "Set"))
+
     def create_set_popup(self):
         name = custom_dialogs.ask_string_themed(self, "Neues Lernset", "Name für das neue Lernset:", self.controller)
         if name:
             new_id = str(uuid.uuid4())
             self.subject_data["sets"][new_id] = {"name": name, "color": constants.DEFAULT_COLOR, "tasks": []}
-            self.controller.data_manager.save_data(self.controller.data)
+            self.controller.store.mark_changed(self.subject_id, new_id)
+            self.controller.store.save()
             self.refresh_view()
 
     def _start_quiz(self, popup, set_id, mode, session_size=None):
+        from .quiz_frame import QuizFrame
         popup.destroy()
         callback = partial(self.controller.show_frame, QuizFrame, subject_id=self.subject_id, set_id=set_id, mode=mode, session_size=session_size)
         self.after(20, callback)
 
     def _edit_set(self, set_id):
+        from .edit_set_frame import EditSetFrame
         callback = partial(self.controller.show_frame, EditSetFrame, subject_id=self.subject_id, set_id=set_id)
         self.after(20, callback)
 
@@ -151,14 +178,8 @@ class SetSelectFrame(BasePage):
         """Zeigt einen Dialog zur Auswahl der Sitzungsgröße."""
         tasks = self.subject_data["sets"][set_id].get("tasks", [])
 
-        # KORREKTUR: Initialisiert die Lern-Daten, bevor sie verwendet werden.
-        now = time.time()
-        for task in tasks:
-            sm_data = task.setdefault('sm_data', {})
-            sm_data.setdefault('status', 'new')
-            sm_data.setdefault('next_review_at', now)
-
-        due_tasks = [t for t in tasks if t['sm_data']['next_review_at'] <= now and t['sm_data']['status'] not in ['mastered', 'perfect']]
+        # Initialisiert die Lern-Daten, bevor sie verwendet werden.
+        due_tasks = queue_builder.due_tasks(tasks)
         num_due_tasks = len(due_tasks)
 
         if num_due_tasks == 0:
@@ -209,14 +230,8 @@ class SetSelectFrame(BasePage):
         set_name = self.subject_data["sets"][set_id]["name"]
         message = f"Möchtest du wirklich den gesamten Lernfortschritt für das Set '{set_name}' zurücksetzen?"
         if messagebox.askyesno("Fortschritt zurücksetzen", message, icon='warning', default='no'):
-            now = time.time()
-            tasks_to_reset = self.subject_data["sets"][set_id].get("tasks", [])
-            for task in tasks_to_reset:
-                task['history'] = []
-                task.setdefault('sm_data', {})['status'] = 'new'
-                task['sm_data']['next_review_at'] = now
-                task['sm_data']['consecutive_good'] = 0
-            self.controller.data_manager.save_data(self.controller.data)
+            self.controller.store.reset_set_progress(self.subject_id, set_id)
+            self.controller.store.save()
             messagebox.showinfo("Erfolg", f"Der Fortschritt für '{set_name}' wurde zurückgesetzt.")
             self.load_statistics_for_set(set_id)
 
@@ -226,18 +241,26 @@ class SetSelectFrame(BasePage):
         new_name = custom_dialogs.ask_string_themed(self, "Umbenennen", f"Neuer Name für '{old_name}':", self.controller)
         if new_name:
             self.subject_data["sets"][set_id]["name"] = new_name
-            self.controller.data_manager.save_data(self.controller.data)
+            self.controller.store.mark_changed(self.subject_id, set_id)
+            self.controller.store.save()
             self.after(10, self.refresh_view)
 
     def change_item_color(self, set_id, hex_code):
         self.subject_data["sets"][set_id]["color"] = hex_code
-        self.controller.data_manager.save_data(self.controller.data)
+        self.controller.store.mark_changed(self.subject_id, set_id)
+        self.controller.store.save()
         self.after(10, self.refresh_view)
 
+    def change_scheduler(self, set_id, scheduler_name):
+        """Wählt den Lernalgorithmus für ein Set und berechnet alle Fälligkeiten neu."""
+        self.controller.store.change_scheduler(self.subject_id, set_id, scheduler_name)
+        self.controller.store.save()
+        self.load_statistics_for_set(set_id)
+
     def delete_item(self, set_id):
         name = self.subject_data["sets"][set_id]["name"]
         if messagebox.askyesno("Löschen", f"Soll das Lernset '{name}' wirklich gelöscht werden?", icon='warning', default='no'):
-            del self.subject_data["sets"][set_id]
-            self.controller.data_manager.save_data(self.controller.data)
+            self.controller.store.delete_set(self.subject_id, set_id)
+            self.controller.store.save()
             self.after(10, self.refresh_view)
             self.after(10, self.show_placeholder)
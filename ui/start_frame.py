@@ -1,5 +1,6 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
+import os
 import uuid
 
 # Relative Importe aus dem ui-Paket
@@ -11,6 +12,7 @@ from . import custom_dialogs
 # Absolute Importe für Dateien außerhalb des ui-Pakets
 import utils
 import constants
+from lernapp.core import session, profiles, sync
 
 class StartFrame(BaseTileFrame):
     """Startseite, die alle Fächer als Kacheln anzeigt."""
@@ -18,8 +20,95 @@ class StartFrame(BaseTileFrame):
         super().__init__(parent, controller)
         self.set_nav_title("Meine Fächer")
         self.add_nav_button("Neues Fach", self.create_subject_popup)
+        self.add_nav_button("Nach Tags lernen", self.start_tag_session_popup)
+        self.add_nav_button("Alle fälligen lernen", self.start_due_review_popup)
+        self.add_nav_button("Bundle importieren", self.import_bundle)
+        self.add_nav_button("Synchronisieren", self.synchronize)
+        profile = controller.store.profile
+        self.add_nav_button(f"Profil: {profile}" if profile else "Profile", self.choose_profile, side='right')
+        # Eine unterbrochene Sitzung kann direkt fortgesetzt werden
+        if os.path.exists(controller.store.session_file):
+            self.add_nav_button("Sitzung fortsetzen", self.resume_session)
         self.refresh_view()
 
+    def resume_session(self):
+        """Setzt die zuletzt unterbrochene Lernsitzung an der gespeicherten Stelle fort."""
+        from .quiz_frame import QuizFrame
+        checkpoint = session.load_checkpoint(self.controller.store.session_file)
+        if checkpoint is None or not checkpoint.get("tasks"):
+            session.clear_checkpoint(self.controller.store.session_file)
+            messagebox.showinfo("Keine Sitzung", "Es gibt keine unterbrochene Lernsitzung.")
+            return
+        self.after(20, lambda: self.controller.show_frame(QuizFrame, checkpoint=checkpoint))
+
+    def choose_profile(self):
+        """Wechselt das Lernprofil oder legt ein neues an (die Karteninhalte bleiben gemeinsam)."""
+        names = profiles.list_profiles()
+        new_entry = "Neues Profil anlegen..."
+        index = custom_dialogs.ask_choice_themed(self, "Lernprofil", "Profil wählen:", self.controller, names + [new_entry])
+        if index is None:
+            return
+        if index < len(names):
+            if names[index] != self.controller.store.profile:
+                self.controller.switch_profile(names[index])
+            return
+        name = custom_dialogs.ask_string_themed(self, "Neues Profil", "Wie heißt das neue Profil?", self.controller)
+        if not name:
+            return
+        if not names:
+            messagebox.showinfo("Erstes Profil", "Das erste Profil übernimmt den bisherigen Lernfortschritt.")
+        try:
+            self.controller.store.create_profile(name)
+        except ValueError as e:
+            messagebox.showerror("Profil anlegen", str(e))
+            return
+        self.controller.switch_profile(name.strip())
+
+    def synchronize(self):
+        """Gleicht die Sammlung mit dem Sync-Dienst eines anderen Rechners ab."""
+        settings = self.controller.store.settings
+        url = custom_dialogs.ask_string_themed(self, "Synchronisieren", "Adresse des Sync-Dienstes:", self.controller,
+                                               initialvalue=settings.get("sync_url", f"http://localhost:{sync.DEFAULT_PORT}"))
+        if not url:
+            return
+        settings["sync_url"] = url.strip()
+
+        # Nur der Netzwerkaustausch läuft im Hintergrund; Store-Zugriffe bleiben im Tk-Thread
+        sync_round = sync.SyncRound(self.controller.store, settings["sync_url"])
+        sync_round.collect()
+
+        def done(result, error):
+            if error:
+                messagebox.showerror("Synchronisieren fehlgeschlagen", str(error), parent=self)
+                return
+            try:
+                sent, received = sync_round.apply()
+            except Exception as e:
+                messagebox.showerror("Synchronisieren fehlgeschlagen", str(e), parent=self)
+                return
+            messagebox.showinfo("Synchronisiert", f"{sent} Änderungen gesendet, {received} empfangen.", parent=self)
+            self.refresh_view()
+
+        custom_dialogs.ProgressDialog(self, self.controller, "Synchronisieren...", sync_round.exchange, done)
+
+    def import_bundle(self):
+        """Importiert die Fächer eines Bundles (gleichnamige Fächer werden ergänzt)."""
+        from .bundle_dialogs import import_dialog
+        import_dialog(self, self.controller, on_finished=self.refresh_view)
+
+    def duplicate_item(self, item_id, item_type):
+        """Dupliziert ein Fach mit allen Sets; Karteninhalte und Bilder werden geteilt."""
+        include_progress = messagebox.askyesno("Fach duplizieren", "Soll der Lernfortschritt übernommen werden?\n\n"
+                                               "Bei 'Nein' beginnt die Kopie mit neuen Karten.")
+        self.controller.store.duplicate_subject(item_id, include_progress=include_progress)
+        self.controller.store.save()
+        self.refresh_view()
+
+    def export_item(self, item_id, item_type):
+        """Exportiert ein Fach mit allen Sets als Bundle."""
+        from .bundle_dialogs import export_dialog
+        export_dialog(self, self.controller, [(item_id, None)], self.controller.data[item_id].get("name", "Fach"))
+
     def _go_to_set_select(self, subject_id):
         """Navigiert sicher zum SetSelectFrame, um zirkuläre Imports zu vermeiden."""
         # Der Import geschieht erst hier, wenn er wirklich benötigt wird.
@@ -72,28 +161,117 @@ class StartFrame(BaseTileFrame):
         if name:
             new_id = str(uuid.uuid4())
             self.controller.data[new_id] = {"name": name, "color": constants.DEFAULT_COLOR, "sets": {}}
-            self.controller.data_manager.save_data(self.controller.data)
+            self.controller.store.mark_changed(new_id)
+            self.controller.store.save()
             self.refresh_view()
             
+    def start_tag_session_popup(self):
+        """Fragt nach Tags und startet eine Lernsitzung über alle Sets mit passenden Karten."""
+        known_tags = self.controller.store.tag_index.all_tags()
+        prompt = "Welche Tags sollen gelernt werden? (mit Komma getrennt)"
+        if known_tags:
+            prompt += f"\n\nBekannte Tags: {', '.join(known_tags[:15])}"
+        query = custom_dialogs.ask_string_themed(self, "Nach Tags lernen", prompt, self.controller)
+        if not query or not query.strip():
+            return
+
+        num_tasks = len(self.controller.store.tag_index.find_tasks(query))
+        if num_tasks == 0:
+            messagebox.showinfo("Keine Karten", f"Es gibt keine Karten mit den Tags '{query}'.")
+            return
+
+        popup = tk.Toplevel(self)
+        popup.title("Lernmodus wählen")
+        popup.transient(self)
+
+        content_frame = ttk.Frame(popup, padding=20)
+        content_frame.pack(expand=True, fill='both')
+        ttk.Label(content_frame, text=f"{num_tasks} Karten mit den Tags '{query}'").pack(pady=(0, 10))
+        ttk.Button(content_frame, text="Sequenziell lernen",
+                   command=lambda: self._start_tag_quiz(popup, query, 'sequential')).pack(pady=5, fill='x')
+        ttk.Button(content_frame, text="Spaced Repetition",
+                   command=lambda: self._start_tag_quiz(popup, query, 'spaced_repetition')).pack(pady=5, fill='x')
+
+        popup.update_idletasks()
+        x = self.winfo_toplevel().winfo_x() + (self.winfo_toplevel().winfo_width() // 2) - (popup.winfo_width() // 2)
+        y = self.winfo_toplevel().winfo_y() + (self.winfo_toplevel().winfo_height() // 2) - (popup.winfo_height() // 2)
+        popup.geometry(f"+{x}+{y}")
+        popup.grab_set()
+
+    def _start_tag_quiz(self, popup, query, mode):
+        """Startet den Quiz-Frame mit den Karten der Tag-Anfrage."""
+        from .quiz_frame import QuizFrame
+        popup.destroy()
+        self.after(20, lambda: self.controller.show_frame(QuizFrame, mode=mode, tag_query=query))
+
+    def start_due_review_popup(self):
+        """Zeigt einen Dialog zur Auswahl der Sitzungsgröße für alle fälligen Karten."""
+        num_due_tasks = self.controller.store.due_queue.count_due()
+        if num_due_tasks == 0:
+            messagebox.showinfo("Keine Karten fällig", "Super! Es stehen aktuell keine Karten zur Wiederholung an.")
+            return
+
+        prompt = tk.Toplevel(self)
+        prompt.title("Sitzungsgröße")
+        prompt.transient(self)
+
+        bg_color = constants.THEMES[self.controller.current_theme.get()]["bg"]
+        prompt.config(bg=bg_color)
+
+        ttk.Label(prompt, text=f"Wie viele der {num_due_tasks} fälligen Karten aus allen Fächern möchtest du lernen?", padding=15).pack()
+
+        slider_var = tk.IntVar(value=min(20, num_due_tasks))
+
+        value_frame = ttk.Frame(prompt, padding=(0,0,0,10))
+        value_frame.pack()
+        value_label = ttk.Label(value_frame, text=f"{slider_var.get()}", font=("Helvetica", 14, "bold"))
+        value_label.pack()
+
+        def update_label(value):
+            value_label.config(text=f"{int(float(value))}")
+
+        slider = ttk.Scale(prompt, from_=1, to=num_due_tasks, variable=slider_var, command=update_label, orient='horizontal')
+        slider.pack(fill='x', expand=True, padx=20)
+        if num_due_tasks == 1: slider.config(state="disabled")
+
+        btn_frame = ttk.Frame(prompt, padding=10)
+        btn_frame.pack()
+
+        def start():
+            from .quiz_frame import QuizFrame
+            session_size = slider_var.get()
+            prompt.destroy()
+            self.after(20, lambda: self.controller.show_frame(QuizFrame, mode='spaced_repetition', session_size=session_size, review_due=True))
+
+        ttk.Button(btn_frame, text="Lernsitzung starten", command=start).pack(pady=5)
+
+        prompt.update_idletasks()
+        x = self.winfo_toplevel().winfo_x() + (self.winfo_toplevel().winfo_width() // 2) - (prompt.winfo_width() // 2)
+        y = self.winfo_toplevel().winfo_y() + (self.winfo_toplevel().winfo_height() // 2) - (prompt.winfo_height() // 2)
+        prompt.geometry(f"+{x}+{y}")
+        prompt.grab_set()
+
     def rename_item(self, sid, item_type):
         """Benennt ein Fach um."""
         old_name = self.controller.data[sid]["name"]
         new_name = custom_dialogs.ask_string_themed(self, "Umbenennen", f"Neuer Name für '{old_name}':", self.controller)
         if new_name:
             self.controller.data[sid]["name"] = new_name
-            self.controller.data_manager.save_data(self.controller.data)
+            self.controller.store.mark_changed(sid)
+            self.controller.store.save()
             self.after(10, self.refresh_view)
             
     def change_item_color(self, sid, item_type, hex_code):
         """Ändert die Farbe eines Faches."""
         self.controller.data[sid]["color"] = hex_code
-        self.controller.data_manager.save_data(self.controller.data)
+        self.controller.store.mark_changed(sid)
+        self.controller.store.save()
         self.after(10, self.refresh_view)
         
     def delete_item(self, sid, item_type):
         """Löscht ein Fach und alle zugehörigen Inhalte."""
         name = self.controller.data[sid]["name"]
         if messagebox.askyesno("Löschen", f"Soll das Fach '{name}' und alle zugehörigen Inhalte wirklich gelöscht werden?", icon='warning', default='no'):
-            del self.controller.data[sid]
-            self.controller.data_manager.save_data(self.controller.data)
+            self.controller.store.delete_subject(sid)
+            self.controller.store.save()
             self.after(10, self.refresh_view)
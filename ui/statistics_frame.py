@@ -1,11 +1,11 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
+import matplotlib
+matplotlib.use("TkAgg")
 import matplotlib.pyplot as plt
 from matplotlib.figure import Figure
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 from matplotlib.ticker import MaxNLocator
-import time
-from collections import Counter
 from functools import partial
 
 # Relative Importe
@@ -15,6 +15,7 @@ from .edit_set_frame import EditSetFrame
 
 # Absolute Importe
 import constants
+from lernapp.core import queue_builder, statistics
 
 class StatisticsFrame(ttk.Frame):
     """
@@ -42,14 +43,36 @@ class StatisticsFrame(ttk.Frame):
         ttk.Button(action_frame, text="Bearbeiten", command=self._edit_set).pack(side="left", padx=5)
         ttk.Button(action_frame, text="Fortschritt zurücksetzen", style="Danger.TButton", command=self._reset_set_progress).pack(side="left", padx=5)
 
+        # Auswahl des Prognosezeitraums für die Wiederholungslast
+        self.forecast_days = tk.IntVar(value=30)
+        for days in (90, 30):
+            ttk.Radiobutton(action_frame, text=f"{days} Tage", value=days, variable=self.forecast_days,
+                            command=self.update_plots).pack(side="right", padx=5)
+        ttk.Label(action_frame, text="Prognose:").pack(side="right", padx=5)
+
         ttk.Separator(self, orient='horizontal').pack(fill='x', pady=10)
 
         # --- Container für die Diagramme ---
         self.plot_container = ttk.Frame(self)
         self.plot_container.pack(fill='both', expand=True)
 
+        self.fig = None
+        self.canvas = None
         self.update_plots()
 
+    def destroy(self):
+        self._release_figure()
+        super().destroy()
+
+    def _release_figure(self):
+        """Gibt das alte Diagramm frei, damit Figure und Canvas nicht bis zum nächsten GC-Lauf leben."""
+        if self.canvas is not None:
+            self.canvas.get_tk_widget().destroy()
+            self.canvas = None
+        if self.fig is not None:
+            self.fig.clear()
+            self.fig = None
+
     def _start_quiz(self, popup, mode, session_size=None):
         """Startet den Quiz-Frame mit den gewählten Optionen."""
         if popup:
@@ -89,15 +112,8 @@ class StatisticsFrame(ttk.Frame):
 
     def _show_session_size_prompt(self, parent_popup):
         """Zeigt einen Dialog zur Auswahl der Sitzungsgröße für Spaced Repetition."""
-        now = time.time()
-        # Stellt sicher, dass alle Karten die notwendigen Lerndaten haben
-        for task in self.tasks:
-            sm_data = task.setdefault('sm_data', {})
-            sm_data.setdefault('status', 'new')
-            sm_data.setdefault('next_review_at', now)
-
         # Filtert nur die fälligen Karten heraus
-        due_tasks = [t for t in self.tasks if t['sm_data']['next_review_at'] <= now and t['sm_data']['status'] not in ['mastered', 'perfect']]
+        due_tasks = queue_builder.due_tasks(self.tasks)
         num_due_tasks = len(due_tasks)
 
         if num_due_tasks == 0:
@@ -145,8 +161,13 @@ class StatisticsFrame(ttk.Frame):
         prompt.geometry(f"+{x}+{y}")
         prompt.grab_set()
 
+    def on_theme_changed(self, colors):
+        """Diagramme werden mit den Farben des neuen Themes neu gezeichnet."""
+        self.update_plots()
+
     def update_plots(self):
         """Aktualisiert die Diagramme."""
+        self._release_figure()
         for widget in self.plot_container.winfo_children():
             widget.destroy()
 
@@ -161,13 +182,8 @@ class StatisticsFrame(ttk.Frame):
         set_name = self.controller.data[self.subject_id]["sets"][self.set_id]["name"]
         message = f"Möchtest du wirklich den gesamten Lernfortschritt für das Set '{set_name}' zurücksetzen?"
         if messagebox.askyesno("Fortschritt zurücksetzen", message, icon='warning', default='no'):
-            now = time.time()
-            for task in self.tasks:
-                task['history'] = []
-                task.setdefault('sm_data', {})['status'] = 'new'
-                task['sm_data']['next_review_at'] = now
-                task['sm_data']['consecutive_good'] = 0
-            self.controller.data_manager.save_data(self.controller.data)
+            self.controller.store.reset_set_progress(self.subject_id, self.set_id)
+            self.controller.store.save()
             self.update_plots() # Zeichnet die Diagramme neu
 
     def create_plots(self, parent, tasks):
@@ -176,60 +192,73 @@ class StatisticsFrame(ttk.Frame):
         theme_name = self.controller.current_theme.get()
         text_color = theme['fg']
 
-        plt.style.use('seaborn-v0_8-darkgrid' if theme_name == 'dark' else 'seaborn-v0_8-whitegrid')
-
-        status_counts = Counter(t.get('sm_data', {}).get('status', 'new') for t in tasks)
-        labels = list(status_counts.keys())
-        sizes = list(status_counts.values())
-        pie_colors = [constants.STATUS_COLORS.get(status, 'grey') for status in labels]
-
-        self.fig = Figure(figsize=(12, 6), facecolor=theme['bg'])
-        gs = self.fig.add_gridspec(1, 2, width_ratios=[1, 1.5])
-        ax1 = self.fig.add_subplot(gs[0])
-        ax2 = self.fig.add_subplot(gs[1])
-
-        # --- Kuchendiagramm: Lernstatus ---
-        # Erstellt das Diagramm und erhält Referenzen auf die Text-Objekte
-        patches, texts, autotexts = ax1.pie(sizes, labels=labels, colors=pie_colors,
-                                           autopct='%1.1f%%', startangle=90)
-
-        # KORREKTUR: Setzt die Farben für äußere und innere Beschriftungen getrennt
-        plt.setp(texts, color=text_color) # Äußere Labels (new, ok, etc.)
-        plt.setp(autotexts, color='black', weight='bold') # Innere Prozentzahlen
-
-        ax1.axis('equal')
-        ax1.set_title('Aktueller Lernstatus', color=text_color)
-
-        # --- Liniendiagramm: Lernverlauf ---
-        history_data = []
-        for task in tasks:
-            history_data.extend(task.get('history', []))
-        history_data.sort(key=lambda x: x.get('timestamp', 0))
-
-        if history_data:
-            attempts = range(1, len(history_data) + 1)
-            quality_map = {'bad': 0, 'ok': 1, 'good': 2, 'perfect': 3}
-            quality_scores = [quality_map.get(d.get('quality'), 0) for d in history_data]
-
-            ax2.set_facecolor(theme['card_bg'])
-            ax2.plot(attempts, quality_scores, marker='o', linestyle='-', color='tab:green')
-            ax2.set_xlabel('Lernsitzung (Versuch Nr.)', color=text_color)
-            ax2.set_ylabel('Bewertungsqualität', color=text_color)
-            ax2.tick_params(axis='y', colors=text_color)
-            ax2.tick_params(axis='x', colors=text_color)
-            for spine in ax2.spines.values(): spine.set_color(text_color)
-            ax2.set_yticks(list(quality_map.values()), labels=list(quality_map.keys()))
-            ax2.xaxis.set_major_locator(MaxNLocator(integer=True))
-        else:
-            ax2.text(0.5, 0.5, 'Keine Verlaufsdaten für dieses Set.', ha='center', va='center', color=text_color)
-            ax2.set_yticks([])
-            ax2.set_xticks([])
-            ax2.set_facecolor(theme['bg'])
-            for spine in ax2.spines.values(): spine.set_visible(False)
-
-        ax2.set_title("Fortschritt über die Zeit", color=text_color)
-        self.fig.tight_layout(pad=3.0)
-
-        canvas = FigureCanvasTkAgg(self.fig, parent)
-        canvas.draw()
-        canvas.get_tk_widget().pack(side=tk.TOP, fill=tk.BOTH, expand=True)
+        # Der Stil gilt nur innerhalb des Kontexts und verändert den globalen pyplot-Zustand nicht
+        with plt.style.context('seaborn-v0_8-darkgrid' if theme_name == 'dark' else 'seaborn-v0_8-whitegrid'):
+            status_counts = statistics.status_counts(tasks)
+            labels = list(status_counts.keys())
+            sizes = list(status_counts.values())
+            pie_colors = [constants.STATUS_COLORS.get(status, 'grey') for status in labels]
+
+            self.fig = Figure(figsize=(12, 8), facecolor=theme['bg'])
+            gs = self.fig.add_gridspec(2, 2, width_ratios=[1, 1.5], height_ratios=[1.4, 1])
+            ax1 = self.fig.add_subplot(gs[0, 0])
+            ax2 = self.fig.add_subplot(gs[0, 1])
+            ax3 = self.fig.add_subplot(gs[1, :])
+
+            # --- Kuchendiagramm: Lernstatus ---
+            # Erstellt das Diagramm und erhält Referenzen auf die Text-Objekte
+            patches, texts, autotexts = ax1.pie(sizes, labels=labels, colors=pie_colors,
+                                               autopct='%1.1f%%', startangle=90)
+
+            # KORREKTUR: Setzt die Farben für äußere und innere Beschriftungen getrennt
+            plt.setp(texts, color=text_color) # Äußere Labels (new, ok, etc.)
+            plt.setp(autotexts, color='black', weight='bold') # Innere Prozentzahlen
+
+            ax1.axis('equal')
+            ax1.set_title('Aktueller Lernstatus', color=text_color)
+
+            # --- Liniendiagramm: Lernverlauf ---
+            quality_scores = statistics.quality_history(tasks)
+
+            if quality_scores:
+                attempts = range(1, len(quality_scores) + 1)
+                quality_map = statistics.QUALITY_SCORES
+
+                ax2.set_facecolor(theme['card_bg'])
+                ax2.plot(attempts, quality_scores, marker='o', linestyle='-', color='tab:green')
+                ax2.set_xlabel('Lernsitzung (Versuch Nr.)', color=text_color)
+                ax2.set_ylabel('Bewertungsqualität', color=text_color)
+                ax2.tick_params(axis='y', colors=text_color)
+                ax2.tick_params(axis='x', colors=text_color)
+                for spine in ax2.spines.values(): spine.set_color(text_color)
+                ax2.set_yticks(list(quality_map.values()), labels=list(quality_map.keys()))
+                ax2.xaxis.set_major_locator(MaxNLocator(integer=True))
+            else:
+                ax2.text(0.5, 0.5, 'Keine Verlaufsdaten für dieses Set.', ha='center', va='center', color=text_color)
+                ax2.set_yticks([])
+                ax2.set_xticks([])
+                ax2.set_facecolor(theme['bg'])
+                for spine in ax2.spines.values(): spine.set_visible(False)
+
+            ax2.set_title("Fortschritt über die Zeit", color=text_color)
+
+            # --- Balkendiagramm: Prognose der Wiederholungen pro Tag ---
+            days = self.forecast_days.get()
+            workload = statistics.workload_forecast(self.controller.data, self.subject_id, self.set_id, days=days)
+
+            ax3.set_facecolor(theme['card_bg'])
+            ax3.bar(range(days), workload, color='tab:blue')
+            ax3.set_xlabel('Tage ab heute', color=text_color)
+            ax3.set_ylabel('Fällige Karten', color=text_color)
+            ax3.tick_params(axis='y', colors=text_color)
+            ax3.tick_params(axis='x', colors=text_color)
+            for spine in ax3.spines.values(): spine.set_color(text_color)
+            ax3.xaxis.set_major_locator(MaxNLocator(integer=True))
+            ax3.yaxis.set_major_locator(MaxNLocator(integer=True))
+            ax3.set_title(f"Erwartete Wiederholungen in den nächsten {days} Tagen", color=text_color)
+
+            self.fig.tight_layout(pad=3.0)
+
+        self.canvas = FigureCanvasTkAgg(self.fig, parent)
+        self.canvas.draw()
+        self.canvas.get_tk_widget().pack(side=tk.TOP, fill=tk.BOTH, expand=True)
@@ -1,30 +1,74 @@
 import io
-import matplotlib
-matplotlib.use("TkAgg")
-from matplotlib.figure import Figure
-import matplotlib.pyplot as plt
-from PIL import Image
+import weakref
 
-# Ein Set, um bereits gebundene Widgets zu speichern und Doppelungen zu vermeiden.
-_already_bound = set()
+# Schwere Bibliotheken (matplotlib, PIL, tkinterdnd2) werden erst bei der ersten
+# Verwendung importiert, damit die Startseite ohne sie auskommt.
+
+# Bereits gebundene Widgets, um Doppelungen zu vermeiden. Schwache Referenzen,
+# damit zerstörte Widgets nicht für die ganze Laufzeit festgehalten werden.
+_already_bound = weakref.WeakSet()
 
 def render_latex(formula, fontsize=12, dpi=300, fg='black', bg='white'):
-    """Rendert eine LaTeX-Formel in ein Pillow-Bildobjekt."""
-    try:
-        # Ersetzungen für eine bessere Kompatibilität
-        formula = formula.replace('\\le', '\\leq').replace('\\ge', '\\geq').replace('\\implies', '\\Rightarrow').replace('\\text', '\\mathrm')
-        fig = Figure(figsize=(4, 1), dpi=dpi, facecolor=bg)
-        fig.text(0, 0, f"${formula}$", usetex=False, fontsize=fontsize, color=fg)
-
-        buf = io.BytesIO()
-        fig.savefig(buf, format='png', transparent=False, bbox_inches='tight', pad_inches=0.05, facecolor=bg)
-        plt.close(fig) # Wichtig: Schließt die Figur, um Speicherlecks zu vermeiden
-        buf.seek(0)
-        img = Image.open(buf)
-        return img
-    except Exception as e:
-        print(f"Fehler beim Rendern von LaTeX: {formula}\n{e}")
+    """
+    Rendert eine LaTeX-Formel synchron im aufrufenden Thread in ein Pillow-Bildobjekt.
+    Die Oberfläche rendert über controller.render_farm in Worker-Prozessen.
+    """
+    from lernapp.core.render_farm import render_png
+    return png_to_image(render_png(formula, fontsize=fontsize, dpi=dpi, fg=fg, bg=bg))
+
+def png_to_image(png):
+    """Wandelt PNG-Bytes (z.B. aus der RenderFarm) in ein Pillow-Bildobjekt um."""
+    if not png:
         return None
+    from PIL import Image
+    return Image.open(io.BytesIO(png))
+
+def enable_drag_and_drop(widget):
+    """
+    Lädt tkinterdnd2 und die tkdnd-Erweiterung in den laufenden Tcl-Interpreter,
+    sobald die erste Drop-Zone gebaut wird. Gibt die DnD-Typkonstante für
+    Dateien zurück oder None, wenn Drag-and-Drop nicht verfügbar ist.
+    """
+    root = widget._root()
+    if not hasattr(root, "_dnd_files"):
+        try:
+            # Der Import erweitert tkinter.BaseWidget um drop_target_register und dnd_bind
+            from tkinterdnd2 import TkinterDnD, DND_FILES
+            TkinterDnD._require(root)
+            root._dnd_files = DND_FILES
+        except (ImportError, RuntimeError) as e:
+            print(f"Drag-and-Drop ist nicht verfügbar: {e}")
+            root._dnd_files = None
+    return root._dnd_files
+
+def theme_widget(widget, colors, **roles):
+    """
+    Färbt ein klassisches tk-Widget (ttk-Widgets folgen dem ttk.Style) mit den
+    Theme-Farben ein und merkt sich, welche Option welche Farbrolle hat, damit
+    restyle_widget_tree es bei einem Theme-Wechsel umfärben kann.
+    Eine Rolle ist ein Schlüssel aus constants.THEMES oder eine Funktion colors -> Farbe.
+    """
+    widget._theme_roles = roles
+    widget.configure(**_colors_for_roles(roles, colors))
+    return widget
+
+def _colors_for_roles(roles, colors):
+    return {option: role(colors) if callable(role) else colors[role] for option, role in roles.items()}
+
+def restyle_widget_tree(widget, colors):
+    """
+    Wendet ein neues Theme auf alle bestehenden Widgets an: tk-Widgets mit
+    Farbrollen werden umgefärbt, Widgets mit einer Methode on_theme_changed(colors)
+    (z.B. Canvas-Zeichnungen, Formeln, Diagramme) aktualisieren sich selbst.
+    """
+    roles = getattr(widget, "_theme_roles", None)
+    if roles:
+        widget.configure(**_colors_for_roles(roles, colors))
+    on_theme_changed = getattr(widget, "on_theme_changed", None)
+    if on_theme_changed:
+        on_theme_changed(colors)
+    for child in widget.winfo_children():
+        restyle_widget_tree(child, colors)
 
 def get_readable_text_color(hex_bg_color):
     """Wählt Schwarz oder Weiß als Textfarbe für beste Lesbarkeit."""